@@ -1,13 +1,17 @@
 import streamlit as st
-from services.gcs_service import GCSService
+from services.registry import get_gcs_service
+from services.prefetcher import NextUp
 from auth.auth_manager import AuthManager
 from components.ui_components import UIComponents
 from utils.session_manager import SessionManager
 from config.prompts import UI_MESSAGES
-from config.settings import get_sentences_key
+from utils.metrics import start_exporters
 
-# Initialize services
-gcs_service = GCSService()
+# Start metric exporters (no-op unless metrics are enabled)
+start_exporters()
+
+# Get shared services
+gcs_service = get_gcs_service()
 auth_manager = AuthManager(gcs_service)
 ui_components = UIComponents()
 
@@ -37,19 +41,19 @@ else:
             ui_components.render_welcome_screen()
             st.stop()
         else:
-            # Get or load sentences for the selected unit
-            sentences = SessionManager.get_cached_sentences(selected_unit)
-            if sentences is None:
-                sentences = gcs_service.load_sentences_for_unit(selected_unit)
-                if sentences:
-                    SessionManager.cache_sentences(selected_unit, sentences)
-                else:
-                    st.stop()
+            # Restore stored progress of the unit on first visit
+            SessionManager.ensure_unit_loaded(auth_manager.get_user_email(), selected_unit)
+            
+            # Load sentences for the selected unit (served from the shared cache)
+            sentences = gcs_service.load_sentences_for_unit(selected_unit)
+            if not sentences:
+                st.stop()
             
             # Create sentence labels with completion status
-            sentence_labels = ui_components.create_sentence_labels(
+            sentence_labels = SessionManager.get_sentence_labels(
+                selected_unit, 
                 sentences, 
-                SessionManager.is_sentence_completed
+                ui_components.create_sentence_labels
             )
             
             # Get current selection
@@ -64,9 +68,22 @@ else:
             
             # Run the lesson for selected sentence
             selected_sentence = sentences[selected_index]
+            sentence_pack = gcs_service.load_sentence_pack(selected_unit)
+            
+            # The next sentence and unit are prefetched once this sentence is finished
+            next_sentence = sentences[selected_index + 1] if selected_index + 1 < len(sentences) else None
+            unit_position = unit_names.index(selected_unit) if selected_unit in unit_names else len(unit_names)
+            next_up = NextUp(
+                sentence=next_sentence,
+                reference=sentence_pack.get(next_sentence) if sentence_pack and next_sentence else None,
+                unit=unit_names[unit_position + 1] if unit_position + 1 < len(unit_names) else None
+            )
             run_farsi_sentences_app(
                 auth_manager.get_user_name(), 
-                sentence=selected_sentence
+                sentence=selected_sentence,
+                user_id=auth_manager.get_user_email(),
+                reference=sentence_pack.get(selected_sentence) if sentence_pack else None,
+                next_up=next_up
             )
     else:
         auth_manager.show_access_denied_screen()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Process-wide cache of the allowed-users list.
+"""
+import threading
+import time
+import streamlit as st
+from typing import FrozenSet, Optional
+from services.gcs_service import GCSService
+from config.settings import ALLOWED_USERS_FILE, ADMIN_PREFIX, ALLOWED_USERS_CACHE_TTL
+
+class AllowlistCache:
+    """Keeps the normalized allowed-users set in memory for all sessions."""
+
+    def __init__(self, ttl_seconds: float = ALLOWED_USERS_CACHE_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._users: Optional[FrozenSet[str]] = None
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def normalize(email: str) -> str:
+        """
+        Normalize an email address for comparison.
+
+        Args:
+            email: Raw email address
+
+        Returns:
+            Stripped, case-folded email address
+        """
+        return email.strip().casefold()
+
+    def is_allowed(self, email: str, gcs_service: GCSService) -> bool:
+        """
+        Check if an email address is on the allowlist.
+
+        Args:
+            email: Email address to check
+            gcs_service: Service used to revalidate a stale allowlist
+
+        Returns:
+            True if the user is allowed, False otherwise
+        """
+        if not self._is_fresh():
+            with self._lock:
+                if not self._is_fresh():
+                    self._revalidate(gcs_service)
+
+        users = self._users
+        return self.normalize(email) in users if users else False
+
+    def refresh(self, gcs_service: GCSService):
+        """
+        Revalidate the allowlist now, ignoring the TTL.
+
+        Args:
+            gcs_service: Service used to fetch the allowlist
+        """
+        with self._lock:
+            self._revalidate(gcs_service)
+
+    def clear(self):
+        """Forget the cached allowlist so the next check downloads it again."""
+        with self._lock:
+            self._users = None
+            self._generation = None
+            self._checked_at = 0.0
+
+    def _is_fresh(self) -> bool:
+        """Check if the cached allowlist is loaded and within its TTL."""
+        return self._users is not None and time.monotonic() - self._checked_at < self.ttl_seconds
+
+    def _revalidate(self, gcs_service: GCSService):
+        """Download the allowlist unless its blob generation is unchanged."""
+        blob_path = gcs_service.get_blob_path(ALLOWED_USERS_FILE, sentences_dir=ADMIN_PREFIX)
+        try:
+            content, generation = gcs_service.download_text_if_modified(blob_path, self._generation)
+        except Exception as e:
+            if self._users is None:
+                st.error(f"Error reading '{ALLOWED_USERS_FILE}' from GCS: {e}")
+                return
+            # Keep serving the last known allowlist and retry after the next TTL
+            self._checked_at = time.monotonic()
+            return
+
+        if content is not None:
+            self._users = frozenset(
+                self.normalize(line) for line in content.splitlines() if line.strip()
+            )
+            self._generation = generation
+        self._checked_at = time.monotonic()
+
+_allowlist_cache = AllowlistCache()
+
+def get_allowlist_cache() -> AllowlistCache:
+    """Get the allowlist cache shared by all sessions of this process."""
+    return _allowlist_cache
@@ -4,7 +4,10 @@ Authentication and user management for the Farsi learning app.
 import streamlit as st
 from typing import Optional
 from services.gcs_service import GCSService
-from config.settings import ALLOWED_USERS_FILE, ADMIN_PREFIX
+from auth.allowlist_cache import get_allowlist_cache
+from services.registry import get_chat_sessions, get_prefetcher
+from utils.session_manager import SessionManager
+from utils.metrics import timed
 from config.prompts import UI_MESSAGES
 
 class AuthManager:
@@ -35,6 +38,7 @@ class AuthManager:
             return st.user.get("given_name", "Student")
         return "Student"
     
+    @timed("auth_check")
     def is_user_authorized(self) -> bool:
         """Check if the current user is authorized to access the app."""
         if not self.is_user_logged_in():
@@ -44,12 +48,11 @@ class AuthManager:
         if not user_email:
             return False
         
-        allowed_users = self.gcs_service.load_sentences_for_unit(
-            ALLOWED_USERS_FILE, 
-            sentences_dir=ADMIN_PREFIX
-        )
-        
-        return user_email in allowed_users if allowed_users else False
+        return get_allowlist_cache().is_allowed(user_email, self.gcs_service)
+    
+    def refresh_allowed_users(self):
+        """Reload the allowed-users list now instead of waiting for the cache TTL."""
+        get_allowlist_cache().refresh(self.gcs_service)
     
     def show_access_denied_screen(self):
         """Display access denied message."""
@@ -61,7 +64,8 @@ class AuthManager:
     
     def reset_session(self):
         """Reset the user's session data."""
-        # Clear all message-related session state
-        for key in list(st.session_state.keys()):
-            if key.startswith("messages_"):
-                del st.session_state[key]
\ No newline at end of file
+        user_email = self.get_user_email()
+        SessionManager.clear_progress(user_email)
+        if user_email:
+            get_prefetcher().cancel_user(user_email)
+            get_chat_sessions().evict_user(user_email)
\ No newline at end of file
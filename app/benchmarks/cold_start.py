@@ -0,0 +1,84 @@
+"""
+Measure the cold-start cost of the login screen.
+
+Every run starts a fresh Python process, imports the modules app.py needs
+and renders the login screen once through AppTest, as on a cold instance.
+Reports import time, first-paint time and which heavy SDKs were loaded.
+
+Usage (from the app directory):
+    python -m benchmarks.cold_start [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SDKs that should not be needed before a user has logged in
+HEAVY_MODULES = ["google.cloud.storage", "google.genai", "google.auth.transport.requests"]
+
+CHILD_SCRIPT = """
+import json, sys, time
+started_at = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+streamlit_loaded_at = time.perf_counter()
+import auth.auth_manager, components.ui_components, services.registry, utils.session_manager
+app_loaded_at = time.perf_counter()
+auth.auth_manager.AuthManager.is_user_logged_in = lambda manager: False  # AppTest has no login state
+app = AppTest.from_file({app!r}, default_timeout=60)
+app.run()
+painted_at = time.perf_counter()
+print(json.dumps({{
+    "streamlit_import_s": streamlit_loaded_at - started_at,
+    "app_import_s": app_loaded_at - streamlit_loaded_at,
+    "first_paint_s": painted_at - app_loaded_at,
+    "login_screen": len(app.button) > 0 and not app.exception,
+    "heavy_modules": [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+def measure_once() -> Dict[str, Any]:
+    """
+    Render the login screen in a fresh interpreter.
+
+    Returns:
+        Timings in seconds and the heavy modules that were imported
+    """
+    code = CHILD_SCRIPT.format(app=os.path.join(APP_DIR, "app.py"), heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    runs: List[Dict[str, Any]] = [measure_once() for _ in range(args.runs)]
+    summary = {
+        name: round(statistics.median(run[name] for run in runs) * 1000, 1)
+        for name in ("streamlit_import_s", "app_import_s", "first_paint_s")
+    }
+    heavy = sorted({module for run in runs for module in run["heavy_modules"]})
+    print(f"Median over {args.runs} cold starts:")
+    print(f"  streamlit import: {summary['streamlit_import_s']} ms")
+    print(f"  app modules import: {summary['app_import_s']} ms")
+    print(f"  login screen first paint: {summary['first_paint_s']} ms")
+    print(f"  login screen rendered: {all(run['login_screen'] for run in runs)}")
+    print(f"  heavy SDKs loaded: {', '.join(heavy) or 'none'}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"median_ms": summary, "heavy_modules": heavy, "runs": runs}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
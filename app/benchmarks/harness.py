@@ -0,0 +1,370 @@
+"""
+Headless harness running scripted student sessions against app.py.
+
+The app runs unmodified under Streamlit's AppTest. Storage and Gemini are
+replaced by the in-process fakes in testing/, and login is simulated by a
+session-state entry instead of st.user.
+"""
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest import mock
+import streamlit as st
+from streamlit.runtime.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner
+from streamlit.testing.v1.util import patch_config_options
+from auth.auth_manager import AuthManager
+from auth.allowlist_cache import get_allowlist_cache
+from services import registry
+from services.gcs_service import GCSService
+from services.ai_service import AIService
+from testing.fake_genai import FakeGenaiClient
+from testing.fake_storage import FakeStorageClient
+from tools.build_unit_manifest import build_manifest
+from config.settings import ADMIN_PREFIX, ALLOWED_USERS_FILE, SENTENCES_PREFIX
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Session-state entry holding the simulated login
+BENCHMARK_USER_KEY = "benchmark_user"
+
+# Modules whose json.loads calls are counted as app work
+APP_PACKAGES = {"app", "farsi_sentences", "auth", "components", "config", "models", "services", "utils", "__main__"}
+
+DEFAULT_UNITS = {
+    "Lektion 1": [
+        "Dieses Buch gehört dem Bruder meiner Freundin.",
+        "Ich trinke jeden Morgen einen Tee.",
+        "Wir wohnen seit zwei Jahren in Berlin."
+    ],
+    "Lektion 2": [
+        "Morgen fahre ich mit dem Zug nach Hamburg.",
+        "Kannst du mir bitte helfen?"
+    ]
+}
+
+class BenchmarkError(Exception):
+    """Raised when the app fails while a scripted session runs."""
+
+@dataclass
+class RerunSample:
+    """Wall time of one scripted interaction, including reruns it triggers."""
+    step: str
+    seconds: float
+
+class BenchmarkEnvironment:
+    """
+    Installs fake backends and simulated login for the duration of a benchmark.
+
+    Use as a context manager; the original services are restored on exit.
+    """
+
+    def __init__(
+        self,
+        units: Optional[Dict[str, List[str]]] = None,
+        users: Optional[List[str]] = None,
+        storage_latency: Callable[[], float] = lambda: 0.0,
+        ai_latency: Callable[[], float] = lambda: 0.0,
+        manifest: bool = True
+    ):
+        self.units = units or DEFAULT_UNITS
+        self.users = users or []
+        self.manifest = manifest
+        self.storage_latency = storage_latency
+        self.ai_latency = ai_latency
+        self.storage: Optional[FakeStorageClient] = None
+        self.genai: Optional[FakeGenaiClient] = None
+        self.json_parses = 0
+        self._patched: Dict[str, Any] = {}
+
+    def __enter__(self) -> "BenchmarkEnvironment":
+        objects = {
+            f"{SENTENCES_PREFIX}{unit}.txt": "\n".join(sentences)
+            for unit, sentences in self.units.items()
+        }
+        objects[f"{ADMIN_PREFIX}{ALLOWED_USERS_FILE}.txt"] = "\n".join(self.users)
+        self.storage = FakeStorageClient(objects, latency=self.storage_latency)
+        if self.manifest:
+            # Built ahead like in a deployment, so its calls are not counted
+            build_manifest(GCSService(client=self.storage))
+            self.storage.calls.clear()
+        self.genai = FakeGenaiClient(latency=self.ai_latency)
+
+        registry.clear_instances()
+        registry.set_instance("gcs_service", GCSService(client=self.storage))
+        registry.set_instance("ai_service", AIService(chat_sessions=registry.get_chat_sessions(), client=self.genai))
+        get_allowlist_cache().clear()
+
+        self._patch(AuthManager, "is_user_logged_in", lambda manager: BENCHMARK_USER_KEY in st.session_state)
+        self._patch(AuthManager, "get_user_email", lambda manager: _benchmark_user().get("email"))
+        self._patch(AuthManager, "get_user_name", lambda manager: _benchmark_user().get("name", "Student"))
+        self._patch(AuthManager, "logout", lambda manager: st.session_state.pop(BENCHMARK_USER_KEY, None))
+        self._patch(json, "loads", self._counting(json.loads))
+        return self
+
+    def __exit__(self, *exc_info):
+        for (owner, name), original in self._patched.items():
+            setattr(owner, name, original)
+        self._patched.clear()
+        registry.clear_instances()
+        get_allowlist_cache().clear()
+
+    def add_user(self, email: str):
+        """Put a user on the fake allowlist."""
+        self.users.append(email)
+        self.storage.put(f"{ADMIN_PREFIX}{ALLOWED_USERS_FILE}.txt", "\n".join(self.users))
+        get_allowlist_cache().clear()
+
+    def backend_calls(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the backend call counters.
+
+        Returns:
+            Call counts per method of the fake storage and Gemini clients
+        """
+        return {"storage": dict(self.storage.calls), "genai": dict(self.genai.calls)}
+
+    def _patch(self, owner: Any, name: str, replacement: Any):
+        """Replace an attribute until the environment exits."""
+        self._patched.setdefault((owner, name), getattr(owner, name))
+        setattr(owner, name, replacement)
+
+    def _counting(self, loads: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap json.loads to count the calls made by app code."""
+        def counted_loads(*args: Any, **kwargs: Any) -> Any:
+            caller = sys._getframe(1).f_globals.get("__name__", "")
+            if caller.split(".")[0] in APP_PACKAGES:
+                self.json_parses += 1
+            return loads(*args, **kwargs)
+        return counted_loads
+
+def _benchmark_user() -> Dict[str, str]:
+    """Get the simulated login of the running session."""
+    return st.session_state.get(BENCHMARK_USER_KEY) or {}
+
+class StudentSession:
+    """One simulated browser session driving the app through AppTest."""
+
+    def __init__(
+        self,
+        email: str,
+        name: str = "Student",
+        timeout: float = 60,
+        think_time: Callable[[], float] = lambda: 0.0
+    ):
+        self.app = AppTest.from_file(APP_SCRIPT, default_timeout=timeout)
+        self.app.session_state[BENCHMARK_USER_KEY] = {"email": email, "name": name}
+        self.email = email
+        self.think_time = think_time
+        self.samples: List[RerunSample] = []
+
+    def open(self):
+        """Load the app as a logged-in student."""
+        self._timed("open", self.app.run)
+
+    def pick_unit(self, unit: str):
+        """Select a unit in the sidebar."""
+        self._timed("pick_unit", lambda: self.app.sidebar.selectbox[0].select(unit).run())
+
+    def pick_sentence(self, index: int):
+        """Select a sentence of the current unit in the sidebar."""
+        radio = self.app.sidebar.radio[0]
+        self._timed("pick_sentence", lambda: radio.set_value(radio.options[index]).run())
+
+    def send(self, text: str):
+        """Send a chat message and wait for the reply."""
+        self._timed("chat_turn", lambda: self.app.chat_input[0].set_value(text).run())
+
+    def reset(self):
+        """Press the reset button."""
+        self._timed("reset", lambda: self.app.sidebar.button[0].click().run())
+
+    def _timed(self, step: str, action: Callable[[], Any]):
+        """Run an interaction, record its wall time and fail on app errors."""
+        pause = self.think_time()
+        if pause:
+            time.sleep(pause)
+        # A student reads the reply before acting, which gives prefetches time to finish
+        registry.get_prefetcher().wait_idle(self.email, timeout=self.app.default_timeout)
+        started_at = time.perf_counter()
+        action()
+        self.samples.append(RerunSample(step, time.perf_counter() - started_at))
+        if self.app.exception:
+            raise BenchmarkError(f"{step}: {self.app.exception[0].value}")
+
+def classroom_session(session: StudentSession, unit: str = "Lektion 1"):
+    """
+    Script a typical lesson: log in, pick a unit, chat until two sentences
+    are finished, then reset.
+
+    Args:
+        session: Session to drive
+        unit: Unit to practice
+    """
+    session.open()
+    session.pick_unit(unit)
+    session.send("Was heißt 'Bruder' auf Persisch?")
+    session.send("این کتاب مال برادر دوستم است.")
+    session.pick_sentence(1)
+    session.send("من هر روز صبح چای می‌نوشم.")
+    session.reset()
+
+def grammar_questions(session: StudentSession, unit: str = "Lektion 1", questions: int = 40):
+    """
+    Script a student who asks many questions about one sentence, so the
+    chat history grows long.
+
+    Args:
+        session: Session to drive
+        unit: Unit to practice
+        questions: Number of chat turns
+    """
+    session.open()
+    session.pick_unit(unit)
+    for index in range(questions):
+        session.send(f"Frage {index + 1}: Warum steht das Verb am Ende?")
+
+SCENARIOS: Dict[str, Callable[[StudentSession], None]] = {
+    "classroom_session": classroom_session,
+    "grammar_questions": grammar_questions
+}
+
+@contextlib.contextmanager
+def concurrent_sessions() -> Iterator[None]:
+    """
+    Let several StudentSessions run at the same time.
+
+    AppTest installs a mock Streamlit runtime for the duration of each run
+    and removes it afterwards, which breaks runs still in progress in other
+    threads. While this context is active a shared mock runtime stands in
+    whenever no run has installed its own. Runs also share one script cache,
+    like the sessions of a real server, instead of compiling app.py per run.
+    It is filled up front because concurrent compiles are not thread-safe.
+    """
+    shared_runtime = mock.MagicMock(spec=Runtime)
+    shared_cache = ScriptCache()
+    original_instance, original_exists = Runtime.__dict__["instance"], Runtime.__dict__["exists"]
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared_runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    try:
+        # Each run would set and restore the global appTest option, which
+        # turns it off under other runs; set it once for all of them instead
+        with patch_config_options({"global.appTest": True}), \
+                mock.patch.object(app_test, "patch_config_options", lambda options: contextlib.nullcontext()), \
+                mock.patch.object(local_script_runner, "ScriptCache", lambda: shared_cache):
+            shared_cache.get_bytecode(APP_SCRIPT)
+            yield
+    finally:
+        Runtime.instance = original_instance
+        Runtime.exists = original_exists
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile by nearest rank."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize_samples(samples: List[RerunSample]) -> Dict[str, Dict[str, float]]:
+    """
+    Aggregate rerun wall times per step.
+
+    Args:
+        samples: Samples of all sessions
+
+    Returns:
+        Mean, median, p95 and max in milliseconds per step
+    """
+    by_step: Dict[str, List[float]] = {}
+    for sample in samples:
+        by_step.setdefault(sample.step, []).append(sample.seconds * 1000)
+    return {
+        step: {
+            "mean": round(statistics.fmean(values), 2),
+            "p50": round(percentile(values, 0.5), 2),
+            "p95": round(percentile(values, 0.95), 2),
+            "max": round(max(values), 2)
+        }
+        for step, values in by_step.items()
+    }
+
+def run_benchmark(
+    scenario: str,
+    sessions: int,
+    storage_latency: float = 0.0,
+    ai_latency: float = 0.0,
+    manifest: bool = True
+) -> Dict[str, Any]:
+    """
+    Run a scenario several times and collect its costs.
+
+    Every session uses a new student, so the first session pays for the cold
+    app caches and later ones show the warm path. Python imports are warmed
+    up by an unmeasured session first. Memory is measured in one
+    extra traced session so that tracing does not distort the timings.
+
+    Args:
+        scenario: Name of a scenario in SCENARIOS
+        sessions: Number of timed sessions
+        storage_latency: Simulated seconds per storage call
+        ai_latency: Simulated seconds per Gemini call
+        manifest: Whether the fake bucket has a unit manifest
+
+    Returns:
+        Metrics with rerun times, per-session call and parse counts and memory
+    """
+    script = SCENARIOS[scenario]
+    # Warm up imports in a throwaway environment; app caches start cold again below
+    with BenchmarkEnvironment(users=["warmup@example.com"], manifest=manifest):
+        script(StudentSession("warmup@example.com"))
+
+    with BenchmarkEnvironment(
+        storage_latency=lambda: storage_latency,
+        ai_latency=lambda: ai_latency,
+        manifest=manifest
+    ) as env:
+        samples: List[RerunSample] = []
+        for index in range(sessions):
+            email = f"student{index}@example.com"
+            env.add_user(email)
+            session = StudentSession(email)
+            script(session)
+            samples.extend(session.samples)
+        calls = env.backend_calls()
+        json_parses = env.json_parses
+
+        env.add_user("traced@example.com")
+        tracemalloc.start()
+        try:
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            traced = StudentSession("traced@example.com")
+            script(traced)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "scenario": scenario,
+        "sessions": sessions,
+        "storage_latency": storage_latency,
+        "ai_latency": ai_latency,
+        "manifest": manifest,
+        "metrics": {
+            "rerun_ms": summarize_samples(samples),
+            "calls_per_session": {
+                backend: {name: round(count / sessions, 2) for name, count in sorted(counts.items())}
+                for backend, counts in calls.items()
+            },
+            "json_parses_per_session": round(json_parses / sessions, 2),
+            "memory_kb": {
+                "retained_per_session": round((current - baseline) / 1024, 1),
+                "peak_per_session": round((peak - baseline) / 1024, 1)
+            }
+        }
+    }
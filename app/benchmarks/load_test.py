@@ -0,0 +1,240 @@
+"""
+Find how many simultaneous students one app instance can serve.
+
+For each class size N, N scripted students run concurrently against app.py
+in this process, like sessions of one Streamlit server. Login is stubbed,
+Gemini replies after a log-normally distributed delay and storage is the
+in-memory fake. Reports throughput, rerun latency percentiles, threads, CPU
+and RSS growth per class size, and the largest class that met the latency
+target, as a starting point for Cloud Run's --concurrency and --cpu.
+
+Usage (from the app directory):
+    python -m benchmarks.load_test --students 1 5 10 20 40 [--ai-median 1.5] [--think-time 2] [--output load.json]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from services import registry
+from benchmarks.harness import (
+    SCENARIOS,
+    BenchmarkEnvironment,
+    RerunSample,
+    StudentSession,
+    concurrent_sessions,
+    percentile
+)
+
+MONITOR_INTERVAL = 0.2  # seconds between thread and memory samples
+
+def current_rss_mb() -> float:
+    """Get the resident memory of this process in MiB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Peak instead of current memory where /proc is unavailable
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if os.uname().sysname == "Darwin" else peak / 2 ** 10
+
+class ResourceMonitor:
+    """Samples thread count and RSS on a background thread."""
+
+    def __init__(self, interval: float = MONITOR_INTERVAL):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_rss_mb = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="load-monitor", daemon=True)
+
+    def __enter__(self) -> "ResourceMonitor":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss_mb = max(self.peak_rss_mb, current_rss_mb())
+
+def latency_summary(seconds: List[float]) -> Dict[str, Optional[float]]:
+    """Summarize latencies in milliseconds."""
+    if not seconds:
+        return {"count": 0, "p50": None, "p90": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(seconds),
+        **{name: round(percentile(seconds, fraction) * 1000, 1) for name, fraction in (
+            ("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99)
+        )},
+        "max": round(max(seconds) * 1000, 1)
+    }
+
+def run_level(
+    students: int,
+    scenario: str,
+    ai_median: float,
+    ai_sigma: float,
+    storage_latency: float,
+    think_time: float,
+    ramp_up: float
+) -> Dict[str, Any]:
+    """
+    Run one class size.
+
+    Args:
+        students: Number of concurrent students
+        scenario: Name of a scenario in SCENARIOS
+        ai_median: Median Gemini latency in seconds
+        ai_sigma: Shape of the log-normal Gemini latency
+        storage_latency: Seconds per storage call
+        think_time: Mean seconds a student pauses before each interaction
+        ramp_up: Seconds over which the students' starts are spread
+
+    Returns:
+        Throughput, latency, thread, CPU and memory figures of this level
+    """
+    script = SCENARIOS[scenario]
+    emails = [f"student{index}@example.com" for index in range(students)]
+    samples: List[RerunSample] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def student(email: str):
+        time.sleep(random.uniform(0, ramp_up))
+        session = StudentSession(email, think_time=lambda: random.uniform(0.5, 1.5) * think_time)
+        try:
+            script(session)
+        except Exception as e:
+            with lock:
+                errors.append(f"{email}: {e}")
+        with lock:
+            samples.extend(session.samples)
+
+    with BenchmarkEnvironment(
+        users=list(emails),
+        storage_latency=lambda: storage_latency,
+        ai_latency=lambda: random.lognormvariate(math.log(ai_median), ai_sigma) if ai_median else 0.0
+    ) as env, concurrent_sessions():
+        rss_before = current_rss_mb()
+        cpu_before = time.process_time()
+        started_at = time.perf_counter()
+        with ResourceMonitor() as monitor:
+            threads = [threading.Thread(target=student, args=(email,)) for email in emails]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        duration = time.perf_counter() - started_at
+        cpu_seconds = time.process_time() - cpu_before
+        calls = env.backend_calls()
+        governor = registry.get_ai_service().governor.get_stats()
+
+    chat_turns = [sample.seconds for sample in samples if sample.step == "chat_turn"]
+    interactions = [sample.seconds for sample in samples if sample.step != "chat_turn"]
+    return {
+        "students": students,
+        "duration_s": round(duration, 2),
+        "reruns": len(samples),
+        "throughput_reruns_per_s": round(len(samples) / duration, 2),
+        "errors": len(errors),
+        "error_examples": errors[:3],
+        "interaction_ms": latency_summary(interactions),
+        "chat_turn_ms": latency_summary(chat_turns),
+        "peak_threads": monitor.peak_threads,
+        "cpu_cores_used": round(cpu_seconds / duration, 2),
+        "rss_growth_mb": round(current_rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(monitor.peak_rss_mb, 1),
+        "backend_calls": calls,
+        "gemini_queue": {
+            name: round(governor[name], 3)
+            for name in ("avg_wait_seconds", "max_wait_seconds", "max_queued", "busy", "over_quota")
+        }
+    }
+
+def recommend(levels: List[Dict[str, Any]], slo_ms: float) -> Optional[Dict[str, Any]]:
+    """
+    Pick the largest class size that met the latency target without errors.
+
+    Args:
+        levels: Results of run_level, by increasing class size
+        slo_ms: Target p95 latency of non-chat interactions
+
+    Returns:
+        The chosen level, or None if even the smallest missed the target
+    """
+    chosen = None
+    for level in levels:
+        p95 = level["interaction_ms"]["p95"]
+        if level["errors"] or p95 is None or p95 > slo_ms:
+            break
+        chosen = level
+    return chosen
+
+def print_report(levels: List[Dict[str, Any]], slo_ms: float):
+    """Print the results as a table with a recommendation."""
+    print(
+        f"{'students':>8}{'rerun/s':>9}{'int p50':>9}{'int p95':>9}{'int p99':>9}"
+        f"{'chat p50':>10}{'chat p95':>10}{'q wait':>8}{'busy':>6}{'threads':>9}{'cpu':>6}{'rss +MB':>9}{'errors':>8}"
+    )
+    for level in levels:
+        interaction, chat = level["interaction_ms"], level["chat_turn_ms"]
+        print(
+            f"{level['students']:>8}{level['throughput_reruns_per_s']:>9}"
+            f"{interaction['p50'] or '-':>9}{interaction['p95'] or '-':>9}{interaction['p99'] or '-':>9}"
+            f"{chat['p50'] or '-':>10}{chat['p95'] or '-':>10}"
+            f"{level['gemini_queue']['max_wait_seconds']:>8}{level['gemini_queue']['busy']:>6}"
+            f"{level['peak_threads']:>9}{level['cpu_cores_used']:>6}{level['rss_growth_mb']:>9}{level['errors']:>8}"
+        )
+    chosen = recommend(levels, slo_ms)
+    if chosen is None:
+        print(f"No class size kept the interaction p95 under {slo_ms:.0f} ms.")
+        return
+    print(
+        f"Largest class within {slo_ms:.0f} ms interaction p95: {chosen['students']} students "
+        f"(--concurrency), using {chosen['cpu_cores_used']} CPU cores and {chosen['peak_rss_mb']} MB peak RSS."
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, nargs="+", default=[1, 5, 10, 20, 40])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="classroom_session")
+    parser.add_argument("--ai-median", type=float, default=1.5, help="Median Gemini latency in seconds")
+    parser.add_argument("--ai-sigma", type=float, default=0.5, help="Spread of the log-normal Gemini latency")
+    parser.add_argument("--storage-latency", type=float, default=0.02, help="Seconds per storage call")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean pause before each interaction")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="Seconds over which students join")
+    parser.add_argument("--slo", type=float, default=500, help="Target p95 of non-chat interactions in ms")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Warm up imports so the first level does not pay for them
+    with BenchmarkEnvironment(users=["warmup@example.com"]):
+        SCENARIOS[args.scenario](StudentSession("warmup@example.com"))
+
+    levels = []
+    for students in sorted(args.students):
+        print(f"Running {students} concurrent students...", flush=True)
+        levels.append(run_level(
+            students,
+            args.scenario,
+            args.ai_median,
+            args.ai_sigma,
+            args.storage_latency,
+            args.think_time,
+            args.ramp_up
+        ))
+    print_report(levels, args.slo)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "levels": levels}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Measure what one interaction costs and compare it against a stored baseline.
+
+Runs scripted sessions headlessly against fake storage and Gemini backends
+and reports rerun wall time, backend calls, JSON parses and memory per
+session. Fails if a metric got worse than the baseline's thresholds allow.
+
+Usage (from the app directory):
+    python -m benchmarks.run_benchmarks [--scenario classroom_session] [--sessions 5] [--update-baseline]
+"""
+import argparse
+import json
+import os
+from typing import Any, Dict, List
+from benchmarks.harness import SCENARIOS, run_benchmark
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Allowed regressions, stored with each baseline so they can be tuned per scenario
+DEFAULT_THRESHOLDS = {
+    "time_ratio": 1.25,  # rerun times may grow by 25%
+    "time_slack_ms": 5.0,  # ...plus this much, so tiny steps don't flap
+    "memory_ratio": 1.2,
+    "count_slack": 0  # backend calls and JSON parses may not grow at all
+}
+
+def flatten(metrics: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flatten nested metrics to dotted keys."""
+    flat = {}
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+def find_regressions(result: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Compare a result against a baseline.
+
+    Args:
+        result: Output of run_benchmark
+        baseline: Stored baseline with metrics and thresholds
+
+    Returns:
+        Descriptions of the metrics that regressed
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    current = flatten(result["metrics"])
+    regressions = []
+    for name, expected in flatten(baseline["metrics"]).items():
+        actual = current.get(name)
+        if actual is None or name.endswith((".p95", ".max")):
+            continue  # tails of a few samples per step are too noisy to gate on
+        if name.startswith("rerun_ms."):
+            limit = expected * thresholds["time_ratio"] + thresholds["time_slack_ms"]
+        elif name.startswith("memory_kb."):
+            limit = max(expected, 0) * thresholds["memory_ratio"]
+        else:
+            limit = expected + thresholds["count_slack"]
+        if actual > limit:
+            regressions.append(f"{name}: {actual} > {limit:.2f} (baseline {expected})")
+    for name in current.keys() - flatten(baseline["metrics"]).keys():
+        if not name.startswith(("rerun_ms.", "memory_kb.")):
+            regressions.append(f"{name}: {current[name]} (not in baseline)")
+    return regressions
+
+def print_report(result: Dict[str, Any]):
+    """Print a result as a readable table."""
+    metrics = result["metrics"]
+    print(f"Scenario {result['scenario']}: {result['sessions']} sessions")
+    print(f"{'step':<15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for step, times in metrics["rerun_ms"].items():
+        print(f"{step:<15}{times['mean']:>10}{times['p50']:>10}{times['p95']:>10}{times['max']:>10}")
+    for backend, counts in metrics["calls_per_session"].items():
+        calls = ", ".join(f"{name}={count}" for name, count in counts.items()) or "none"
+        print(f"{backend} calls per session: {calls}")
+    print(f"JSON parses per session: {metrics['json_parses_per_session']}")
+    memory = metrics["memory_kb"]
+    print(f"Memory per session: {memory['retained_per_session']} KiB retained, {memory['peak_per_session']} KiB peak")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="classroom_session")
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--storage-latency", type=float, default=0.0, help="Seconds per storage call")
+    parser.add_argument("--ai-latency", type=float, default=0.0, help="Seconds per Gemini call")
+    parser.add_argument("--no-manifest", action="store_true", help="Run without a unit manifest in the bucket")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the result as the new baseline")
+    parser.add_argument("--output", help="Also write the result to this JSON file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.scenario, args.sessions, args.storage_latency, args.ai_latency, not args.no_manifest)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.scenario}.json")
+    if args.update_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({**result, "thresholds": DEFAULT_THRESHOLDS}, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+        return
+
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --update-baseline to create one")
+        return
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    settings = ("sessions", "storage_latency", "ai_latency", "manifest")
+    if any(baseline.get(name) != result[name] for name in settings):
+        print("Note: the baseline was recorded with different settings: " + ", ".join(
+            f"{name}={baseline.get(name)}" for name in settings
+        ))
+    regressions = find_regressions(result, baseline)
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        raise SystemExit(1)
+    print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
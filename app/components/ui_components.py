@@ -1,9 +1,30 @@
 """
 Reusable UI components for the Streamlit app.
 """
+import functools
+import itertools
 import streamlit as st
-from typing import List
+from typing import Iterable, List, Sequence, Set, Tuple
+from models.chat_message import ChatMessage
 from config.prompts import UI_MESSAGES
+from config.settings import CHAT_HISTORY_WINDOW, CHAT_HISTORY_PAGE, CHAT_TRANSCRIPT_CACHE_SIZE
+
+@functools.lru_cache(maxsize=CHAT_TRANSCRIPT_CACHE_SIZE)
+def format_transcript(entries: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Format earlier messages as one markdown block.
+
+    Past messages never change, so the block is built once and reused on
+    every rerun until more messages are revealed.
+
+    Args:
+        entries: (role, text) pairs in chat order
+
+    Returns:
+        Markdown transcript with a speaker label per message
+    """
+    labels = {"user": UI_MESSAGES["history_user_label"], "assistant": UI_MESSAGES["history_assistant_label"]}
+    return "\n\n---\n\n".join(f"**{labels.get(role, role)}:**\n\n{text}" for role, text in entries)
 
 class UIComponents:
     """Collection of reusable UI components."""
@@ -81,20 +102,20 @@ class UIComponents:
         return sentence_labels.index(selected_label)
     
     @staticmethod
-    def create_sentence_labels(sentences: List[str], completion_checker) -> List[str]:
+    def create_sentence_labels(sentences: List[str], completed_sentences: Set[str]) -> List[str]:
         """
         Create sentence labels with completion status.
         
         Args:
             sentences: List of sentences
-            completion_checker: Function to check if sentence is completed
+            completed_sentences: Set of completed sentences
             
         Returns:
             List of formatted sentence labels
         """
         sentence_labels = []
         for i, sentence in enumerate(sentences):
-            is_finished = completion_checker(sentence)
+            is_finished = sentence in completed_sentences
             emoji = UI_MESSAGES["completed_emoji"] if is_finished else UI_MESSAGES["pending_emoji"]
             label = f"{UI_MESSAGES['sentence_prefix']} {i+1} {emoji}"
             sentence_labels.append(label)
@@ -112,6 +133,55 @@ class UIComponents:
         st.header(UI_MESSAGES["ai_teacher_header"])
         st.markdown(f"**{sentence}**")
     
+    @staticmethod
+    def render_chat_history(messages: Sequence[ChatMessage], state_key: str):
+        """
+        Render the most recent messages, with earlier ones shown on demand.
+        
+        Only the last CHAT_HISTORY_WINDOW messages are rendered as chat
+        bubbles, so rerun time and payload stay flat as a conversation grows.
+        A button reveals earlier messages CHAT_HISTORY_PAGE at a time.
+        
+        Args:
+            messages: Chat history in order
+            state_key: Session key holding the number of revealed earlier messages
+        """
+        window_start = max(0, len(messages) - CHAT_HISTORY_WINDOW)
+        revealed = min(st.session_state.get(state_key, 0), window_start)
+        hidden = window_start - revealed
+        if hidden > 0:
+            st.button(
+                UI_MESSAGES["show_earlier"].format(count=hidden),
+                key=f"show_earlier_{state_key}",
+                on_click=UIComponents._reveal_earlier,
+                args=(state_key, revealed + CHAT_HISTORY_PAGE)
+            )
+        if revealed:
+            earlier = messages[window_start - revealed:window_start]
+            with st.container(border=True):
+                st.markdown(format_transcript(tuple((message.role, message.text) for message in earlier)))
+        for message in messages[window_start:]:
+            with st.chat_message(message.role):
+                st.markdown(message.text)
+    
+    @staticmethod
+    def _reveal_earlier(state_key: str, revealed: int):
+        """Store the new number of revealed messages before the rerun renders them."""
+        st.session_state[state_key] = revealed
+    
+    @staticmethod
+    def render_streamed_reply(chunks: Iterable[str]):
+        """
+        Render a reply progressively, with a spinner until the first text arrives.
+        
+        Args:
+            chunks: Iterable of text fragments
+        """
+        stream = iter(chunks)
+        with st.spinner(UI_MESSAGES["waiting_response"]):
+            first_chunk = next(stream, "")
+        st.write_stream(itertools.chain([first_chunk], stream))
+    
     @staticmethod
     def render_completion_message():
         """Render the lesson completion message."""
@@ -127,6 +197,16 @@ class UIComponents:
         """
         st.error(message)
     
+    @staticmethod
+    def show_busy_message(message: str):
+        """
+        Show a notice that the service is busy, which is not an error.
+        
+        Args:
+            message: Notice to display
+        """
+        st.info(message)
+    
     @staticmethod
     def show_balloons():
         """Show celebration balloons."""
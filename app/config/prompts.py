@@ -1,24 +1,14 @@
 """
 Prompts and system instructions for the Farsi teaching application.
 """
+from typing import Any, Dict, Optional
 
-def get_system_prompt(student_name: str, sentence: str) -> str:
-    """
-    Generate the system prompt for the Farsi teaching AI.
-    
-    Args:
-        student_name: Name of the student
-        sentence: The sentence to be translated
-        
-    Returns:
-        Formatted system prompt string
-    """
-    return f"""You are a motivating teacher who helps students learn the Persian (Farsi) language.
-Your student's name is {student_name}.
+# Instructions shared by every lesson; kept free of per-student details so every request starts with the same prefix
+STATIC_SYSTEM_PROMPT = """You are a motivating teacher who helps students learn the Persian (Farsi) language.
 You talk to the student in German language. However you can add a few Persian phrases here and there. 
 If you do, you should always add a translation to German.
 When you write Persian sentences, you should use the Persian script and a transliteration in Latin script.
-The sentence to be translated is: {sentence}.
+The student's name and the sentence to be translated are given in the session context.
 The workflow is as follows:
 - the student might ask questions about vocabulary or grammar in the context of this sentence to be translated. you should answer those questions
 - the student might provide their solution. you should check that for correctness. if correct, give some praise to the learner. if wrong, give some encouraging advice on how to improve and wait for another response.
@@ -28,6 +18,103 @@ The response should be structured:
 - text
 - finished: boolean if correct solution was provided or the student should make more improvements."""
 
+def get_session_prompt(student_name: str, sentence: str) -> str:
+    """
+    Generate the per-lesson part of the instructions.
+    
+    Args:
+        student_name: Name of the student
+        sentence: The sentence to be translated
+        
+    Returns:
+        Session context string
+    """
+    return f"""Session context:
+Your student's name is {student_name}.
+The sentence to be translated is: {sentence}."""
+
+def get_system_prompt(student_name: str, sentence: str) -> str:
+    """
+    Generate the system prompt for the Farsi teaching AI.
+    
+    Args:
+        student_name: Name of the student
+        sentence: The sentence to be translated
+        
+    Returns:
+        Formatted system prompt string (static prefix followed by the session context)
+    """
+    return f"{STATIC_SYSTEM_PROMPT}\n{get_session_prompt(student_name, sentence)}"
+
+def get_reference_instruction(reference: Dict[str, Any]) -> str:
+    """
+    Generate the system prompt addition carrying a precomputed reference solution.
+    
+    Args:
+        reference: Sentence pack entry with translation, transliteration and vocabulary
+        
+    Returns:
+        Text to append to the system prompt
+    """
+    vocabulary = "; ".join(
+        f"{item.get('persian', '')} ({item.get('transliteration', '')}) = {item.get('german', '')}"
+        for item in reference.get("vocabulary", [])
+    )
+    return f"""
+Reference solution, for checking only. Do not reveal it before the student has tried. Other correct translations are also fine:
+Persian: {reference.get("translation", "")}
+Transliteration: {reference.get("transliteration", "")}
+Key vocabulary: {vocabulary}"""
+
+def get_pack_prompt(sentence: str) -> str:
+    """
+    Generate the prompt for precomputing the reference of a sentence.
+    
+    Args:
+        sentence: The German sentence to translate
+        
+    Returns:
+        Formatted prompt string
+    """
+    return f"""Translate the following German sentence into natural, everyday Persian (Farsi) as spoken in Iran.
+Give the translation in Persian script, a transliteration in Latin script, and the key vocabulary a learner needs
+(Persian word, transliteration, German meaning).
+
+Sentence: {sentence}"""
+
+def get_summary_instruction(summary: str) -> str:
+    """
+    Generate the system prompt addition carrying a summary of older turns.
+    
+    Args:
+        summary: Summary of the earlier conversation
+        
+    Returns:
+        Text to append to the system prompt
+    """
+    return f"""
+Earlier parts of this conversation are not repeated in the history. This is a summary of them:
+{summary}"""
+
+def get_summary_prompt(previous_summary: Optional[str], transcript: str) -> str:
+    """
+    Generate the prompt for summarizing older turns of a tutoring conversation.
+    
+    Args:
+        previous_summary: Summary of even older turns, if any
+        transcript: Turns to fold into the summary, one "role: text" entry per line
+        
+    Returns:
+        Formatted summary prompt
+    """
+    previous = f"Summary so far:\n{previous_summary}\n\n" if previous_summary else ""
+    return f"""Summarize this part of a Persian (Farsi) tutoring conversation in a few short German bullet points.
+Keep the student's translation attempts, the mistakes that were pointed out, and the vocabulary and grammar that were explained.
+Assistant turns are JSON objects; only their "text" matters.
+
+{previous}Conversation:
+{transcript}"""
+
 def get_initial_message(student_name: str, sentence: str) -> str:
     """
     Generate the initial welcome message for a new lesson.
@@ -46,6 +133,10 @@ Bitte übersetze den folgenden Satz ins Persische:
 
 Wenn du Fragen hast, sag' mir Bescheid."""
 
+# Fixed reply to off-topic messages, sent without asking the model
+OFF_TOPIC_REPLY = """Ich bin nur deine Farsi-Lehrerin und kann dir bei anderen Themen leider nicht helfen. 😊
+Frag mich gern etwas zu Wörtern oder Grammatik in diesem Satz, oder schick mir deine Übersetzung."""
+
 # UI Messages
 UI_MESSAGES = {
     "welcome_title": "Willkommen im Farsi Unterricht!",
@@ -74,6 +165,13 @@ Viel Erfolg beim Lernen! 🇮🇷📝
     "access_denied": "Access Denied",
     "chat_input_placeholder": "Deine Antwort?",
     "waiting_response": "Warte auf Antwort...",
+    "ai_timeout": "Ava braucht gerade zu lange für eine Antwort. Bitte sende deine Nachricht noch einmal.",
+    "ai_error": "Ava ist gerade nicht erreichbar. Bitte versuche es in einem Moment noch einmal.",
+    "show_earlier": "Frühere Nachrichten anzeigen ({count})",
+    "history_user_label": "Du",
+    "history_assistant_label": "Ava",
+    "ai_busy": "⏳ Gerade üben sehr viele gleichzeitig mit Ava. Bitte sende deine Nachricht in ein paar Sekunden noch einmal.",
+    "ai_quota_exceeded": "Du hast heute schon sehr viel mit Ava geübt. Morgen geht es weiter!",
     "lesson_completed": "Die Übung ist abgeschlossen. Bitte gehe weiter zum nächsten Satz.",
     "sentence_prefix": "Satz",
     "completed_emoji": "✅",
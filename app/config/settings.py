@@ -3,31 +3,147 @@ Application configuration and settings.
 """
 import os
 
+# Storage Backend Configuration
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "gcs")  # "gcs" or "local"
+LOCAL_STORAGE_ROOT = os.environ.get("LOCAL_STORAGE_ROOT", "data")  # directory with sentences/ and admin/
+
 # Google Cloud Storage Configuration
 GCS_BUCKET_NAME = "farsi-sentences"
 SENTENCES_PREFIX = "sentences/"
 ADMIN_PREFIX = "admin/"
 ALLOWED_USERS_FILE = "allowed_users"
+SENTENCE_PACK_SUFFIX = ".pack.json"  # precomputed references stored next to sentences/<unit>.txt
+GCS_USER_PROJECT = os.environ.get("GCS_USER_PROJECT") or None  # billing project for requester-pays buckets
+GCS_HTTP_POOL_SIZE = 32  # pooled HTTPS connections shared by all script threads
+
+# Unit Manifest Configuration (one index object instead of listing sentences/, built by tools/build_unit_manifest.py)
+UNIT_MANIFEST_ENABLED = True
+UNIT_MANIFEST_NAME = "_manifest.json"  # stored next to the unit files
+UNIT_MANIFEST_INCLUDE_SENTENCES = True  # store the sentences too, so opening a unit needs no download
+
+# Allowed Users Cache Configuration
+ALLOWED_USERS_CACHE_TTL = 300  # seconds before the allowlist is revalidated against GCS
+
+# Content Cache Configuration (unit listings and sentence files shared by all sessions)
+CONTENT_CACHE_TTL = 60  # seconds before a cached blob is revalidated
+CONTENT_CACHE_MAX_ENTRIES = 512
+CONTENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
 
 # AI Model Configuration
 GEMINI_MODEL = "gemini-2.5-flash"
 GEMINI_TEMPERATURE = 1.4
 GEMINI_THINKING_BUDGET = -1
+GEMINI_THINKING_BUDGET_WITH_REFERENCE = 1024  # less thinking needed when a reference translation is given
 RESPONSE_MIME_TYPE = "application/json"
+GEMINI_STREAMING = True  # render replies progressively instead of after the full answer
+
+# Turn Routing Configuration (each student message is classified locally and routed by its kind)
+TURN_ROUTING_ENABLED = True
+TURN_OFF_TOPIC_LOCAL = True  # answer off-topic messages with a fixed reply instead of a Gemini call
+# Model (None for GEMINI_MODEL) and thinking budget (None for the chat's default) per kind of turn
+TURN_ROUTES = {
+    "answer_attempt": {"model": None, "thinking_budget": None},  # checking a translation needs full thinking
+    "grammar_question": {"model": None, "thinking_budget": 512},
+    "vocabulary_question": {"model": None, "thinking_budget": 0},  # a lookup, no thinking needed
+    "other": {"model": None, "thinking_budget": None}
+}
+
+# Sentence Pack Builder Configuration
+PACK_BUILDER_MODEL = "gemini-2.5-flash"
+PACK_BUILDER_CONCURRENCY = 8  # sentences generated in parallel
+PACK_BUILDER_RETRIES = 3
+PACK_CHECKPOINT_DIR = ".pack_checkpoints"
+
+# Batch Grading Configuration (tools/grade_answers.py)
+GRADER_CONCURRENCY = 16  # answers graded in parallel
+GRADER_REQUESTS_PER_MINUTE = 600  # Gemini requests started per minute, 0 for no limit
+GRADER_RETRIES = 3
+GRADER_WINDOW = 1000  # rows read ahead of the oldest unfinished row; bounds memory
+GRADER_CHECKPOINT_INTERVAL = 5  # seconds between checkpoints
+GRADER_PROGRESS_INTERVAL = 10  # seconds between throughput reports
+
+# Response Cache Configuration (replies to identical first answers, shared by all students)
+RESPONSE_CACHE_ENABLED = False
+RESPONSE_CACHE_SIZE = 5000
+RESPONSE_CACHE_TTL = 24 * 3600  # seconds
+
+# AI Turn Execution Configuration
+AI_WORKER_POOL_SIZE = 16  # Gemini calls running at the same time across all sessions
+AI_TURN_TIMEOUT = 60  # seconds before a turn is given up
+AI_MAX_RETRIES = 2  # retries for rate limits and server errors
+AI_BACKOFF_BASE = 0.5  # seconds, doubled per retry and jittered
+AI_BACKOFF_MAX = 8  # seconds
+
+# Gemini Governor Configuration (admission control shared by all sessions)
+GOVERNOR_MAX_CONCURRENT = 16  # Gemini calls in flight at the same time
+GOVERNOR_REQUESTS_PER_MINUTE = 600  # 0 for no limit
+GOVERNOR_TOKENS_PER_MINUTE = 1_000_000  # 0 for no limit
+GOVERNOR_USER_DAILY_TOKENS = 500_000  # per student and UTC day, 0 for no quota
+GOVERNOR_MAX_QUEUE = 200  # waiting calls before new ones are turned away as busy
+GOVERNOR_MAX_WAIT = 20  # seconds a call may wait for admission
+GOVERNOR_TURN_TOKEN_ESTIMATE = 4000  # tokens charged per call until its usage is known
+
+# Prefetch Configuration (next sentence's chat and next unit, prepared when a sentence is finished)
+PREFETCH_ENABLED = True
+PREFETCH_WORKERS = 4  # background prefetch threads shared by all sessions
+PREFETCH_MAX_PER_USER = 2  # pending prefetches per user; older ones are cancelled
+
+# Live Chat Session Cache Configuration
+CHAT_SESSION_CACHE_SIZE = 1000  # maximum number of live chats kept in memory
+CHAT_SESSION_IDLE_TIMEOUT = 1800  # seconds after which an unused chat is dropped
+
+# Chat History Rendering Configuration (reruns send only the most recent messages)
+CHAT_HISTORY_WINDOW = 8  # most recent messages always rendered
+CHAT_HISTORY_PAGE = 20  # earlier messages revealed per "show earlier" click
+CHAT_TRANSCRIPT_CACHE_SIZE = 256  # formatted transcripts of earlier messages kept per process
+
+# Context Management Configuration
+CONTEXT_COMPACTION_ENABLED = True
+CONTEXT_WINDOW_TURNS = 6  # most recent exchanges always sent verbatim
+CONTEXT_MAX_HISTORY_TOKENS = 3000  # estimated history size above which older turns are summarized
+CONTEXT_SUMMARY_MODEL = "gemini-2.5-flash-lite"
+CONTEXT_SUMMARY_WORKERS = 2  # background threads refreshing summaries
+
+# Progress Store Configuration (durable chat histories, written behind the rerun path)
+PROGRESS_BACKEND = os.environ.get("PROGRESS_BACKEND", "none")  # "none", "sqlite" or "gcs"
+PROGRESS_SQLITE_PATH = os.environ.get("PROGRESS_SQLITE_PATH", "progress.db")
+PROGRESS_PREFIX = "progress/"
+PROGRESS_FLUSH_INTERVAL = 2.0  # seconds between background writes
+PROGRESS_BATCH_SIZE = 200  # queued records that trigger an early write
+PROGRESS_COMPACT_THRESHOLD = 50  # GCS objects per unit log before they are merged
+
+# Metrics Configuration (timing spans, token usage and a Prometheus scrape endpoint)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464"))  # serves /metrics, 0 to disable
+METRICS_LOG_INTERVAL = 60  # seconds between metric snapshots in the log, 0 to disable
+
+# Startup Configuration
+PREWARM_ON_START = os.environ.get("PREWARM_ON_START", "").lower() in ("1", "true", "yes")  # see serve.py
 
 # Session Keys
 def get_messages_key(sentence: str) -> str:
     """Generate session key for chat messages."""
     return f"messages_{sentence}"
 
-def get_sentences_key(unit: str) -> str:
-    """Generate session key for cached sentences."""
-    return f"sentences_{unit}"
-
 def get_sentence_index_key(unit: str) -> str:
     """Generate session key for selected sentence index."""
     return f"selected_sentence_index_{unit}"
 
+def get_sentence_labels_key(unit: str) -> str:
+    """Generate session key for cached sentence labels."""
+    return f"sentence_labels_{unit}"
+
+def get_history_revealed_key(sentence: str) -> str:
+    """Generate session key for the number of earlier messages shown above the window."""
+    return f"history_revealed_{sentence}"
+
+SESSION_TOKEN_KEY = "session_token"
+COMPLETED_SENTENCES_KEY = "completed_sentences"
+COMPLETION_VERSION_KEY = "completion_version"
+PROGRESS_USER_KEY = "progress_user"
+LOADED_UNITS_KEY = "loaded_units"
+LOGGED_GREETINGS_KEY = "logged_greetings"
+
 # Environment Variables
 def get_gemini_api_key() -> str:
     """Get Gemini API key from environment."""
@@ -0,0 +1,3 @@
+"""
+Pytest setup: tests import the app's modules from this directory, like the app does.
+"""
@@ -1,14 +1,17 @@
-import json
 import streamlit as st
-from time import sleep
-from services.ai_service import AIService
+from services.registry import get_ai_service, get_prefetcher
+from services.turn_executor import TurnTimeoutError, TurnFailedError
+from services.governor import GovernorBusyError, QuotaExceededError
 from components.ui_components import UIComponents
 from utils.session_manager import SessionManager
+from models.chat_message import ChatMessage
+from utils.metrics import span
 from config.prompts import get_initial_message, UI_MESSAGES
+from config.settings import GEMINI_STREAMING, get_history_revealed_key
 
-def run_farsi_sentences_app(name="Student", sentence="Dieses Buch gehört dem Bruder meiner Freundin."):
-    # Initialize services
-    ai_service = AIService()
+def run_farsi_sentences_app(name="Student", sentence="Dieses Buch gehört dem Bruder meiner Freundin.", user_id="anonymous", reference=None, next_up=None):
+    # Get services
+    ai_service = get_ai_service()
     ui_components = UIComponents()
     
     # Render chat header
@@ -17,26 +20,11 @@ def run_farsi_sentences_app(name="Student", sentence="Dieses Buch gehört dem Br
     # Get or create message history
     initial_message = get_initial_message(name, sentence)
     messages = SessionManager.get_or_create_messages(sentence, initial_message)
+    chat_key = (user_id, SessionManager.get_session_token(), sentence)
 
-    # Create chat session if messages exist (skip initial message)
-    chat = None
-    if len(messages) > 1:
-        chat = ai_service.create_chat(name, sentence, messages)
-
-    # Display chat history
-    for message in messages:
-        with st.chat_message(message["role"]):
-            if message["role"] == "assistant":
-                try:
-                    msg_json = json.loads(message["content"])
-                    if isinstance(msg_json, dict) and "text" in msg_json:
-                        st.markdown(msg_json["text"])
-                    else:
-                        st.markdown(message["content"])
-                except (json.JSONDecodeError, TypeError):
-                    st.markdown(message["content"])
-            else:
-                st.markdown(message["content"])
+    # Display the recent chat history; earlier messages are revealed on demand
+    with span("render", stage="history"):
+        ui_components.render_chat_history(messages, get_history_revealed_key(sentence))
 
     # Check if session is completed
     session_finished = SessionManager.is_sentence_completed(sentence)
@@ -49,30 +37,68 @@ def run_farsi_sentences_app(name="Student", sentence="Dieses Buch gehört dem Br
         )
         
         if prompt:
+            # Identical first answers to the same sentence may be served from the shared cache
+            first_turn = len(messages) == 1
+            response = ai_service.response_cache.get(sentence, prompt, name) if first_turn else None
+            
+            # Reuse the live chat; it receives the prompt with the request below
+            chat = None
+            if response is None:
+                chat = ai_service.get_chat(chat_key, name, sentence, messages, reference=reference)
+            
             # Add user message
-            SessionManager.add_message(sentence, "user", prompt)
+            SessionManager.add_message(sentence, ChatMessage(role="user", text=prompt))
             with st.chat_message("user"):
                 st.markdown(prompt)
 
             # Get AI response
             with st.chat_message("assistant"):
-                with st.spinner(UI_MESSAGES["waiting_response"]):
-                    if chat is None:
-                        # Create chat if this is the first user message
-                        messages = SessionManager.get_or_create_messages(sentence, initial_message)
-                        chat = ai_service.create_chat(name, sentence, messages)
-                    
-                    response = ai_service.send_message(chat, prompt)
-                st.markdown(response["text"])
+                try:
+                    with span("render", stage="reply"):
+                        if chat is None:
+                            st.markdown(response.text)
+                        elif GEMINI_STREAMING:
+                            reply = ai_service.send_message_stream(chat, prompt, user_id=user_id)
+                            ui_components.render_streamed_reply(reply)
+                            response = reply.response
+                        else:
+                            with st.spinner(UI_MESSAGES["waiting_response"]):
+                                response = ai_service.send_message(chat, prompt, user_id=user_id)
+                            st.markdown(response.text)
+                except (GovernorBusyError, QuotaExceededError) as e:
+                    # Not an error: the prompt is dropped and the student tries again later
+                    SessionManager.remove_last_message(sentence)
+                    is_busy = isinstance(e, GovernorBusyError)
+                    ui_components.show_busy_message(UI_MESSAGES["ai_busy" if is_busy else "ai_quota_exceeded"])
+                    st.stop()
+                except (TurnTimeoutError, TurnFailedError) as e:
+                    # Drop the unanswered prompt, and the chat it may still reach
+                    SessionManager.remove_last_message(sentence)
+                    ai_service.discard_chat(chat_key)
+                    is_timeout = isinstance(e, TurnTimeoutError)
+                    ui_components.show_error_message(UI_MESSAGES["ai_timeout" if is_timeout else "ai_error"])
+                    st.stop()
             
             # Add assistant response
-            SessionManager.add_message(sentence, "assistant", json.dumps(response))
+            SessionManager.add_message(sentence, ChatMessage.from_response(response))
+            if chat is not None:
+                ai_service.mark_chat_synced(chat_key, len(messages))
+                if first_turn:
+                    ai_service.response_cache.put(sentence, prompt, name, response)
             
             # Check if lesson completed
-            if response.get("finished", False):
-                ui_components.show_balloons()
-                sleep(2)
+            if response.finished:
+                # Balloons are shown after the rerun below, without holding the script thread
+                SessionManager.set_session_value("celebrate", True)
                 session_finished = True
+                
+                # Prepare what the student will probably open next while they celebrate
+                if next_up is not None:
+                    next_history = (
+                        SessionManager.peek_messages(next_up.sentence, get_initial_message(name, next_up.sentence))
+                        if next_up.sentence else []
+                    )
+                    get_prefetcher().prefetch_next(user_id, SessionManager.get_session_token(), name, next_up, next_history)
     # Handle session completion
     if session_finished:
         if not SessionManager.get_session_value("just_finished", False):
@@ -86,3 +112,5 @@ def run_farsi_sentences_app(name="Student", sentence="Dieses Buch gehört dem Br
         else:
             SessionManager.clear_completion_flag()
             ui_components.render_completion_message()
+            if SessionManager.pop_session_value("celebrate", False):
+                ui_components.show_balloons()
@@ -0,0 +1,98 @@
+"""
+Chat message records kept in session state.
+"""
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from models.tutor_reply import TutorReply, parse_reply
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+ROLE_TO_GEMINI = {"assistant": "model", "user": "user"}
+ROLE_FROM_GEMINI = {"model": "assistant", "user": "user"}
+
+@dataclass(slots=True)
+class ChatMessage:
+    """A single chat message, parsed once when it arrives."""
+    role: str
+    text: str
+    finished: bool = False
+    raw: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_response(cls, response: TutorReply) -> "ChatMessage":
+        """
+        Create an assistant message from a parsed AI reply.
+
+        Args:
+            response: Parsed reply
+
+        Returns:
+            ChatMessage keeping the reply as raw payload
+        """
+        return cls(role="assistant", text=response.text, finished=response.finished, raw=response.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the message to a JSON-serializable dictionary.
+
+        Returns:
+            Dictionary with role, text, finished and raw
+        """
+        return {"role": self.role, "text": self.text, "finished": self.finished, "raw": self.raw}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChatMessage":
+        """
+        Create a message from a dictionary made by to_dict.
+
+        Args:
+            data: Message dictionary
+
+        Returns:
+            Equivalent ChatMessage
+        """
+        return cls(
+            role=data.get("role", "user"),
+            text=data.get("text", ""),
+            finished=bool(data.get("finished", False)),
+            raw=data.get("raw")
+        )
+
+    def to_content(self) -> "types.Content":
+        """
+        Convert the message to Gemini history format.
+
+        AI replies are sent back as the JSON payload the model produced.
+
+        Returns:
+            Content object for the chat history
+        """
+        # Imported here so session state can be handled without loading the Gemini SDK
+        from google.genai import types
+
+        text = json.dumps(self.raw, ensure_ascii=False) if self.raw is not None else self.text
+        return types.Content(
+            role=ROLE_TO_GEMINI.get(self.role, "user"),
+            parts=[types.Part(text=text)]
+        )
+
+    @classmethod
+    def from_content(cls, content: "types.Content") -> "ChatMessage":
+        """
+        Create a message from Gemini history format.
+
+        Args:
+            content: Content object from a chat history
+
+        Returns:
+            Equivalent ChatMessage
+        """
+        role = ROLE_FROM_GEMINI.get(content.role, "user")
+        text = "".join(part.text or "" for part in content.parts or [])
+        if role == "assistant":
+            reply, _ = parse_reply(text)
+            if reply is not None:
+                return cls.from_response(reply)
+        return cls(role=role, text=text)
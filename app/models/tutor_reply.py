@@ -0,0 +1,68 @@
+"""
+Typed teacher replies and their tolerant parsing.
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from utils.json_stream import repair_json
+
+@dataclass(slots=True)
+class TutorReply:
+    """A teacher reply as the response schema defines it."""
+    text: str
+    finished: bool = False
+    # How the reply was obtained: 'valid', 'repaired' or 'retried'; not part of the payload
+    outcome: str = "valid"
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> Optional["TutorReply"]:
+        """
+        Validate a decoded reply.
+
+        Args:
+            payload: Decoded JSON value
+
+        Returns:
+            TutorReply, or None if the payload has no text
+        """
+        if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
+            return None
+        finished = payload.get("finished", False)
+        if isinstance(finished, str):
+            finished = finished.strip().lower() == "true"
+        return cls(text=payload["text"], finished=bool(finished))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the reply to the JSON payload the model produces.
+
+        Returns:
+            Dictionary with text and finished
+        """
+        return {"text": self.text, "finished": self.finished}
+
+def parse_reply(raw: Optional[str]) -> Tuple[Optional[TutorReply], bool]:
+    """
+    Parse a model reply, repairing fenced or truncated JSON.
+
+    A reply beyond repair is not pieced together from its parts; callers
+    ask for it once more instead.
+
+    Args:
+        raw: Reply text as received
+
+    Returns:
+        Tuple of (reply or None if unusable, whether it needed repair)
+    """
+    raw = raw or ""
+    try:
+        reply = TutorReply.from_payload(json.loads(raw))
+        if reply is not None:
+            return reply, False
+    except json.JSONDecodeError:
+        pass
+    try:
+        reply = TutorReply.from_payload(repair_json(raw))
+    except json.JSONDecodeError:
+        reply = None
+    return reply, reply is not None
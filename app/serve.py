@@ -0,0 +1,28 @@
+"""
+Container entrypoint: `streamlit run app.py` with an optional prewarm.
+
+With PREWARM_ON_START set, the shared clients, allowlist and unit index
+are built on a background thread while the server
+starts, so the first student does not pay for them. Streamlit runs
+app.py in this same process, so the warmed instances are reused.
+
+Usage:
+    python serve.py [streamlit options, e.g. --server.port=8080]
+"""
+import os
+import sys
+import threading
+from config.settings import PREWARM_ON_START
+
+def main():
+    if PREWARM_ON_START:
+        from services.prewarm import prewarm
+        threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+
+    from streamlit.web import cli
+    app_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    sys.argv = ["streamlit", "run", app_script, *sys.argv[1:]]
+    sys.exit(cli.main())
+
+if __name__ == "__main__":
+    main()
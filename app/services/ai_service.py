@@ -2,33 +2,211 @@
 AI service for handling interactions with the Gemini model.
 """
 import json
-from typing import List, Dict, Any
+import time
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 from google import genai
 from google.genai import types
 from config.settings import (
     GEMINI_MODEL, 
     GEMINI_TEMPERATURE, 
     GEMINI_THINKING_BUDGET,
+    GEMINI_THINKING_BUDGET_WITH_REFERENCE,
     RESPONSE_MIME_TYPE,
+    TURN_ROUTING_ENABLED,
+    TURN_OFF_TOPIC_LOCAL,
     get_gemini_api_key,
     validate_environment
 )
-from config.prompts import get_system_prompt
+from config.prompts import (
+    OFF_TOPIC_REPLY,
+    get_system_prompt,
+    get_summary_instruction,
+    get_reference_instruction
+)
+from models.chat_message import ChatMessage
+from models.tutor_reply import TutorReply, parse_reply
+from services.chat_session_cache import ChatSessionCache, ChatKey
+from services.context_manager import ContextManager, estimate_tokens
+from services.governor import GeminiGovernor
+from services.response_cache import ResponseCache
+from services.turn_classifier import OFF_TOPIC, OTHER, TurnRoute, classify_turn, get_route
+from services.turn_executor import TurnExecutor, TurnFailedError
+from utils.json_stream import JsonFieldStreamParser
+from utils.metrics import metrics, span, timed, record_usage, log_event
+
+logger = logging.getLogger(__name__)
+
+# Structure of every teacher reply; the text comes first so it can be streamed
+REPLY_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "text": types.Schema(type=types.Type.STRING),
+        "finished": types.Schema(type=types.Type.BOOLEAN)
+    },
+    required=["text", "finished"],
+    property_ordering=["text", "finished"]
+)
+
+class StreamedReply:
+    """
+    Visible text of a streamed AI reply.
+    
+    Iterating yields the characters of the "text" field as they arrive.
+    Once exhausted, the parsed reply is available as `response`. A reply
+    that cannot be repaired is asked for once more with `retry`, and its
+    text is yielded then, below any text shown of the broken reply.
+    """
+    
+    def __init__(
+        self, 
+        chunks: Iterator[Any], 
+        turn_class: str = OTHER, 
+        op: str = "send_message_stream",
+        retry: Optional[Callable[[], TutorReply]] = None
+    ):
+        self._chunks = chunks
+        self.turn_class = turn_class
+        self.op = op
+        self._retry = retry
+        self._parser = JsonFieldStreamParser("text")
+        self.started_at = time.perf_counter()
+        self.first_token_latency: Optional[float] = None
+        self.total_latency: Optional[float] = None
+        self.response: Optional[TutorReply] = None
+        self.outcome: Optional[str] = None
+        self.usage_metadata: Optional[Any] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        shown = []
+        for chunk in self._chunks:
+            if getattr(chunk, "usage_metadata", None) is not None:
+                self.usage_metadata = chunk.usage_metadata
+            if not chunk.text:
+                continue
+            delta = self._parser.feed(chunk.text)
+            if delta:
+                if self.first_token_latency is None:
+                    self.first_token_latency = time.perf_counter() - self.started_at
+                shown.append(delta)
+                yield delta
+        
+        self.response, repaired = parse_reply(self._parser.get_raw())
+        self.outcome = "repaired" if repaired else "valid"
+        if self.response is None:
+            if self._retry is None:
+                raise TurnFailedError("Malformed reply")
+            self.response = self._retry()
+            self.outcome = "retried"
+            if self.first_token_latency is None:
+                self.first_token_latency = time.perf_counter() - self.started_at
+            yield ("\n\n" if shown else "") + self.response.text
+        self.response.outcome = self.outcome
+        self.total_latency = time.perf_counter() - self.started_at
+        logger.info(
+            "Streamed reply: first token after %.2fs, complete after %.2fs",
+            self.first_token_latency or self.total_latency,
+            self.total_latency
+        )
+        if metrics.enabled:
+            metrics.observe(
+                "ai_first_token_seconds", 
+                self.first_token_latency or self.total_latency, 
+                turn_class=self.turn_class
+            )
+            metrics.observe("ai_call_seconds", self.total_latency, op=self.op, turn_class=self.turn_class)
+            record_usage(self.usage_metadata, "turn", turn_class=self.turn_class)
+            metrics.inc("ai_replies", outcome=self.outcome)
+            log_event(
+                "ai_turn",
+                streaming=True,
+                turn_class=self.turn_class,
+                local=self.op == "local_reply",
+                outcome=self.outcome,
+                first_token_seconds=self.first_token_latency,
+                total_seconds=self.total_latency,
+                usage=_usage_fields(self.usage_metadata)
+            )
+
+def _usage_fields(usage_metadata: Any) -> Dict[str, Optional[int]]:
+    """Extract the token counts of a response for logging."""
+    return {
+        field: getattr(usage_metadata, field, None)
+        for field in (
+            "prompt_token_count",
+            "cached_content_token_count",
+            "thoughts_token_count",
+            "candidates_token_count"
+        )
+    }
+
+def _user_content(message: str) -> types.Content:
+    """Wrap a student message as a user turn."""
+    return types.Content(role="user", parts=[types.Part(text=message)])
+
+def _record_turn(chat, user_content: types.Content, reply: str):
+    """Append a turn answered outside the chat, so the chat keeps mirroring the session history."""
+    chat.record_history(
+        user_input=user_content,
+        model_output=[types.Content(role="model", parts=[types.Part(text=reply)])],
+        is_valid=True
+    )
+
+def _content_text(content: Any) -> str:
+    return "".join(part.text or "" for part in content.parts or [])
+
+def _text_response(text: str) -> types.GenerateContentResponse:
+    """Wrap a locally produced reply like a model response chunk."""
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))]
+    )
+
+@dataclass
+class _ChatSetup:
+    """What a chat was created for, needed to route its turns."""
+    sentence: str
+    config: types.GenerateContentConfig
+    # Set when the chat recorded a malformed reply and no longer mirrors the session history
+    stale: bool = False
 
 class AIService:
     """Service for handling AI interactions with Gemini."""
     
-    def __init__(self):
-        validate_environment()
-        self.client = genai.Client(api_key=get_gemini_api_key())
+    def __init__(
+        self, 
+        chat_sessions: Optional[ChatSessionCache] = None, 
+        client: Optional[Any] = None, 
+        governor: Optional[GeminiGovernor] = None,
+        routing: bool = TURN_ROUTING_ENABLED
+    ):
+        if client is None:
+            validate_environment()
+            client = genai.Client(api_key=get_gemini_api_key())
+        self.client = client
         self.model = GEMINI_MODEL
+        self.chat_sessions = chat_sessions if chat_sessions is not None else ChatSessionCache()
+        self.governor = governor if governor is not None else GeminiGovernor()
+        self.context = ContextManager(self.client, self.governor)
+        self.response_cache = ResponseCache()
+        self.turns = TurnExecutor()
+        self.routing = routing
+        # Setup of the chats created here, dropped together with the chats
+        self._chat_setups: "weakref.WeakKeyDictionary[Any, _ChatSetup]" = weakref.WeakKeyDictionary()
         
-    def create_generate_config(self, system_prompt: str) -> types.GenerateContentConfig:
+    def create_generate_config(
+        self, 
+        system_prompt: str, 
+        thinking_budget: int = GEMINI_THINKING_BUDGET
+    ) -> types.GenerateContentConfig:
         """
         Create the configuration for content generation.
         
         Args:
             system_prompt: System instruction prompt
+            thinking_budget: Thinking token budget (-1 for dynamic thinking)
             
         Returns:
             GenerateContentConfig object
@@ -36,56 +214,427 @@ class AIService:
         return types.GenerateContentConfig(
             temperature=GEMINI_TEMPERATURE,
             thinking_config=types.ThinkingConfig(
-                thinking_budget=GEMINI_THINKING_BUDGET,
+                thinking_budget=thinking_budget,
             ),
             response_mime_type=RESPONSE_MIME_TYPE,
+            response_schema=REPLY_SCHEMA,
             system_instruction=[
                 types.Part.from_text(text=system_prompt),
             ],
         )
     
-    def create_chat(self, student_name: str, sentence: str, message_history: List[Dict[str, str]]):
+    def build_chat_request(
+        self, 
+        student_name: str, 
+        sentence: str, 
+        message_history: List[ChatMessage], 
+        summary: Optional[str] = None,
+        reference: Optional[Dict[str, Any]] = None
+    ) -> Tuple[types.GenerateContentConfig, List[types.Content]]:
         """
-        Create a chat session with message history.
+        Build the config and contents of a lesson conversation.
         
         Args:
             student_name: Name of the student
             sentence: The sentence being practiced
             message_history: List of previous messages
+            summary: Summary of turns left out of the history, if any
+            reference: Precomputed sentence pack entry, if any
             
         Returns:
-            Chat object
+            Tuple of (generate config, history in Gemini format)
         """
-        system_prompt = get_system_prompt(student_name, sentence)
-        config = self.create_generate_config(system_prompt)
+        additions = ""
+        thinking_budget = GEMINI_THINKING_BUDGET
+        if reference:
+            additions += get_reference_instruction(reference)
+            thinking_budget = GEMINI_THINKING_BUDGET_WITH_REFERENCE
+        if summary:
+            additions += get_summary_instruction(summary)
         
         # Convert message history to Gemini format
-        history = []
-        for message in message_history:
-            role = {"assistant": "model"}.get(message["role"], "user")
-            history.append(
-                types.Content(
-                    role=role, 
-                    parts=[types.Part(text=message["content"])]
-                )
-            )
+        history = [message.to_content() for message in message_history]
         
-        return self.client.chats.create(
+        system_prompt = get_system_prompt(student_name, sentence) + additions
+        config = self.create_generate_config(system_prompt, thinking_budget=thinking_budget)
+        return config, history
+    
+    @timed("ai_call", op="create_chat")
+    def create_chat(
+        self, 
+        student_name: str, 
+        sentence: str, 
+        message_history: List[ChatMessage], 
+        summary: Optional[str] = None,
+        reference: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Create a chat session with message history.
+        
+        Args:
+            student_name: Name of the student
+            sentence: The sentence being practiced
+            message_history: List of previous messages
+            summary: Summary of turns left out of the history, if any
+            reference: Precomputed sentence pack entry, if any
+            
+        Returns:
+            Chat object
+        """
+        config, history = self.build_chat_request(student_name, sentence, message_history, summary, reference)
+        chat = self.client.chats.create(
             model=self.model,
             config=config,
             history=history
         )
+        self._chat_setups[chat] = _ChatSetup(sentence, config)
+        return chat
     
-    def send_message(self, chat, message: str) -> Dict[str, Any]:
+    def get_chat(
+        self, 
+        chat_key: ChatKey, 
+        student_name: str, 
+        sentence: str, 
+        message_history: List[ChatMessage], 
+        reference: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Get the live chat for a conversation, creating it only if needed.
+        
+        A cached chat is reused while it mirrors the session history, so a
+        turn only appends the new message instead of rebuilding the history.
+        Long conversations are rebuilt from a compacted context once the
+        chat has grown a full window past its last compaction.
+        
+        Args:
+            chat_key: Key of the conversation (user, session token, sentence)
+            student_name: Name of the student
+            sentence: The sentence being practiced
+            message_history: Current session history, before the new message
+            reference: Precomputed sentence pack entry, if any
+            
+        Returns:
+            Chat object
+        """
+        message_count = len(message_history)
+        entry = self.chat_sessions.get(chat_key, message_count)
+        if (
+            entry is not None 
+            and not self._is_stale(entry.chat) 
+            and not self.context.should_rebuild(entry.built_count, message_count, message_history)
+        ):
+            sent_tokens = entry.context_tokens + estimate_tokens(message_history[entry.built_count:])
+            self.context.record_turn(estimate_tokens(message_history), sent_tokens)
+            return entry.chat
+        
+        context = self.context.compact(chat_key, message_history)
+        chat = self.create_chat(
+            student_name, 
+            sentence, 
+            context.history, 
+            summary=context.summary, 
+            reference=reference
+        )
+        self.chat_sessions.put(chat_key, chat, message_count, context.tokens)
+        self.context.record_turn(estimate_tokens(message_history), context.tokens)
+        return chat
+    
+    def prepare_chat(
+        self, 
+        chat_key: ChatKey, 
+        student_name: str, 
+        sentence: str, 
+        message_history: List[ChatMessage], 
+        reference: Optional[Dict[str, Any]] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Create and cache a chat ahead of the student's first message.
+        
+        A later get_chat with the same key and history length reuses it. A
+        chat created by the foreground in the meantime is never replaced.
+        
+        Args:
+            chat_key: Key of the conversation (user, session token, sentence)
+            student_name: Name of the student
+            sentence: The sentence that will be practiced
+            message_history: History the chat should mirror
+            reference: Precomputed sentence pack entry, if any
+            cancelled: Event that, once set, discards the prepared chat
+            
+        Returns:
+            True if a new chat was cached
+        """
+        if self.chat_sessions.get(chat_key, len(message_history)) is not None:
+            return False
+        context = self.context.compact(chat_key, message_history)
+        chat = self.create_chat(
+            student_name, 
+            sentence, 
+            context.history, 
+            summary=context.summary, 
+            reference=reference
+        )
+        if cancelled is not None and cancelled.is_set():
+            return False
+        return self.chat_sessions.put_if_absent(chat_key, chat, len(message_history), context.tokens)
+    
+    def mark_chat_synced(self, chat_key: ChatKey, message_count: int):
+        """
+        Record that a turn completed and the chat mirrors the history again.
+        
+        Args:
+            chat_key: Key of the conversation
+            message_count: Number of messages in the session history
+        """
+        self.chat_sessions.advance(chat_key, message_count)
+    
+    def discard_chat(self, chat_key: ChatKey):
+        """
+        Drop the cached chat of a turn that timed out or failed.
+        
+        The request may still finish on its worker and append the turn to
+        the chat after the prompt was removed from the session history, so
+        the next turn rebuilds the chat instead of reusing it.
+        
+        Args:
+            chat_key: Key of the conversation
+        """
+        self.chat_sessions.evict(chat_key)
+    
+    def route_turn(self, chat, message: str) -> TurnRoute:
+        """
+        Classify a student message and look up how to answer it.
+        
+        Args:
+            chat: Chat the message is sent to
+            message: Student message
+            
+        Returns:
+            Route of the turn; without routing, the chat's defaults
+        """
+        if not self.routing:
+            return TurnRoute(OTHER)
+        setup = self._chat_setups.get(chat)
+        return get_route(classify_turn(message, setup.sentence if setup else ""))
+    
+    def send_message(self, chat, message: str, user_id: Optional[str] = None) -> TutorReply:
         """
         Send a message to the chat and get response.
         
+        The message is classified first: off-topic messages get a fixed
+        reply without a Gemini call, others go to their route's model and
+        thinking budget. Fenced or truncated replies are repaired; a reply
+        beyond repair is asked for once more.
+        
         Args:
             chat: Active chat session
             message: User message to send
+            user_id: User the call is admitted and charged for
             
         Returns:
-            Parsed JSON response from the AI
+            Parsed reply from the AI
+            
+        Raises:
+            TurnTimeoutError: If the reply does not arrive in time
+            TurnFailedError: If the request fails for good
+            GovernorBusyError: If the call is not admitted in time
+            QuotaExceededError: If the user's daily quota is used up
+        """
+        started_at = time.perf_counter()
+        route = self.route_turn(chat, message)
+        if route.turn_class == OFF_TOPIC and TURN_OFF_TOPIC_LOCAL:
+            with span("ai_call", op="local_reply", turn_class=route.turn_class):
+                reply = self._reply_locally(chat, message)
+            log_event(
+                "ai_turn",
+                streaming=False,
+                turn_class=route.turn_class,
+                local=True,
+                total_seconds=time.perf_counter() - started_at
+            )
+            return reply
+        
+        model, config = self._route_config(chat, route)
+        with self.governor.admit(user_id) as admission, span("ai_call", op="send_message", turn_class=route.turn_class):
+            if model == self.model:
+                response = self.turns.run(chat.send_message, message=message, config=config)
+            else:
+                response = self.turns.run(self._send_to_model, chat, message, model, config)
+            admission.usage_metadata = getattr(response, "usage_metadata", None)
+        usage_metadata = getattr(response, "usage_metadata", None)
+        record_usage(usage_metadata, "turn", turn_class=route.turn_class)
+        reply, repaired = parse_reply(response.text)
+        outcome = "repaired" if repaired else "valid"
+        if reply is None:
+            reply = self._retry_reply(chat, message, model, config, user_id)
+            outcome = "retried"
+        reply.outcome = outcome
+        if metrics.enabled:
+            metrics.inc("ai_replies", outcome=outcome)
+        log_event(
+            "ai_turn",
+            streaming=False,
+            turn_class=route.turn_class,
+            local=False,
+            outcome=outcome,
+            total_seconds=time.perf_counter() - started_at,
+            usage=_usage_fields(usage_metadata)
+        )
+        return reply
+    
+    def send_message_stream(self, chat, message: str, user_id: Optional[str] = None) -> StreamedReply:
         """
-        response = chat.send_message(message=message)
-        return json.loads(response.text)
\ No newline at end of file
+        Send a message to the chat and stream the response.
+        
+        Messages are classified and routed like in send_message; the fixed
+        off-topic reply is returned as a stream of one chunk.
+        
+        Args:
+            chat: Active chat session
+            message: User message to send
+            user_id: User the call is admitted and charged for
+            
+        Returns:
+            StreamedReply yielding the reply text; its `response` holds the
+            parsed reply once the stream is exhausted. Iterating waits for
+            admission first and raises TurnTimeoutError, TurnFailedError,
+            GovernorBusyError or QuotaExceededError if the request fails.
+        """
+        route = self.route_turn(chat, message)
+        if route.turn_class == OFF_TOPIC and TURN_OFF_TOPIC_LOCAL:
+            reply = self._reply_locally(chat, message)
+            payload = json.dumps(reply.to_dict(), ensure_ascii=False)
+            return StreamedReply(iter([_text_response(payload)]), route.turn_class, op="local_reply")
+        
+        model, config = self._route_config(chat, route)
+        if model == self.model:
+            open_stream = lambda: chat.send_message_stream(message=message, config=config)
+        else:
+            open_stream = lambda: self._stream_from_model(chat, message, model, config)
+        return StreamedReply(
+            self._governed_stream(user_id, open_stream), 
+            route.turn_class, 
+            retry=lambda: self._retry_reply(chat, message, model, config, user_id)
+        )
+    
+    def _route_config(self, chat, route: TurnRoute) -> Tuple[str, Optional[types.GenerateContentConfig]]:
+        """
+        Build the model and config a turn is sent with.
+        
+        Args:
+            chat: Chat the turn belongs to
+            route: Route of the turn
+            
+        Returns:
+            Tuple of (model, config); the config is None to keep the chat's own
+        """
+        model = route.model or self.model
+        setup = self._chat_setups.get(chat)
+        if setup is None or (route.thinking_budget is None and model == self.model):
+            return model, None
+        update: Dict[str, Any] = {}
+        if route.thinking_budget is not None:
+            update["thinking_config"] = types.ThinkingConfig(thinking_budget=route.thinking_budget)
+        return model, setup.config.model_copy(update=update)
+    
+    def _send_to_model(self, chat, message: str, model: str, config: Optional[types.GenerateContentConfig]) -> Any:
+        """Answer a chat's turn with another model and record it in the chat."""
+        user_content = _user_content(message)
+        response = self.client.models.generate_content(
+            model=model,
+            contents=chat.get_history(curated=True) + [user_content],
+            config=config
+        )
+        _record_turn(chat, user_content, response.text or "")
+        return response
+    
+    def _stream_from_model(
+        self, 
+        chat, 
+        message: str, 
+        model: str, 
+        config: Optional[types.GenerateContentConfig]
+    ) -> Iterator[Any]:
+        """Stream a chat's turn from another model and record it in the chat once complete."""
+        user_content = _user_content(message)
+        texts = []
+        for chunk in self.client.models.generate_content_stream(
+            model=model,
+            contents=chat.get_history(curated=True) + [user_content],
+            config=config
+        ):
+            if chunk.text:
+                texts.append(chunk.text)
+            yield chunk
+        _record_turn(chat, user_content, "".join(texts))
+    
+    def _reply_locally(self, chat, message: str) -> TutorReply:
+        """Answer an off-topic message with the fixed reply and record it in the chat."""
+        reply = TutorReply(text=OFF_TOPIC_REPLY, finished=False)
+        _record_turn(chat, _user_content(message), json.dumps(reply.to_dict(), ensure_ascii=False))
+        if metrics.enabled:
+            metrics.inc("ai_local_replies", turn_class=OFF_TOPIC)
+        return reply
+    
+    def _retry_reply(
+        self, 
+        chat, 
+        message: str, 
+        model: str, 
+        config: Optional[types.GenerateContentConfig], 
+        user_id: Optional[str]
+    ) -> TutorReply:
+        """
+        Ask once more for a reply that arrived malformed.
+        
+        The retry is sent next to the chat, with the history before the
+        malformed turn. The chat is then marked stale, so the next turn
+        rebuilds it from the session history holding the good reply.
+        
+        Args:
+            chat: Chat whose reply was malformed
+            message: User message of the turn
+            model: Model the turn was sent to
+            config: Config the turn was sent with (None for the chat's own)
+            user_id: User the call is admitted and charged for
+            
+        Returns:
+            Parsed reply
+            
+        Raises:
+            TurnFailedError: If the retry is malformed, too
+        """
+        setup = self._chat_setups.get(chat)
+        history = chat.get_history(curated=True)
+        if len(history) >= 2 and history[-2].role == "user" and _content_text(history[-2]) == message:
+            history = history[:-2]
+        with self.governor.admit(user_id) as admission, span("ai_call", op="retry_malformed"):
+            response = self.turns.run(
+                self.client.models.generate_content,
+                model=model,
+                contents=history + [_user_content(message)],
+                config=config if config is not None or setup is None else setup.config
+            )
+            admission.usage_metadata = getattr(response, "usage_metadata", None)
+        record_usage(admission.usage_metadata, "retry")
+        if setup is not None:
+            setup.stale = True
+        reply, _ = parse_reply(response.text)
+        if reply is None:
+            raise TurnFailedError("Malformed reply after a retry")
+        logger.info("Replaced a malformed reply with a retry")
+        return reply
+    
+    def _is_stale(self, chat) -> bool:
+        """Check if a chat recorded a malformed reply."""
+        setup = self._chat_setups.get(chat)
+        return setup is not None and setup.stale
+    
+    def _governed_stream(self, user_id: Optional[str], open_stream: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Yield a stream's chunks while holding an admission for the call."""
+        with self.governor.admit(user_id) as admission:
+            for chunk in self.turns.stream(open_stream):
+                if getattr(chunk, "usage_metadata", None) is not None:
+                    admission.usage_metadata = chunk.usage_metadata
+                yield chunk
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Cache of live Gemini chat sessions shared by all Streamlit sessions.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional, Tuple
+from config.settings import CHAT_SESSION_CACHE_SIZE, CHAT_SESSION_IDLE_TIMEOUT
+
+ChatKey = Tuple[str, str, str]  # (user id, session token, sentence)
+
+@dataclass
+class ChatSessionEntry:
+    """A live chat together with the history length it mirrors."""
+    chat: Any
+    message_count: int
+    last_used: float
+    built_count: int = 0  # history length the chat was created from
+    context_tokens: int = 0  # estimated tokens of the context it was created with
+
+class ChatSessionCache:
+    """Bounded cache of chat objects with idle eviction."""
+
+    def __init__(
+        self,
+        max_sessions: int = CHAT_SESSION_CACHE_SIZE,
+        idle_timeout: float = CHAT_SESSION_IDLE_TIMEOUT
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._entries: "OrderedDict[Hashable, ChatSessionEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: ChatKey, message_count: int) -> Optional[ChatSessionEntry]:
+        """
+        Get a live chat if it mirrors the given history length.
+
+        Args:
+            key: Chat key
+            message_count: Number of messages in the session history
+
+        Returns:
+            The cache entry, or None if missing or out of sync
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.message_count != message_count:
+                del self._entries[key]
+                return None
+            entry.last_used = now
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: ChatKey, chat: Any, message_count: int, context_tokens: int = 0):
+        """
+        Store a live chat.
+
+        Args:
+            key: Chat key
+            chat: Chat object
+            message_count: Number of messages in the history the chat mirrors
+            context_tokens: Estimated tokens of the context the chat was created with
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = ChatSessionEntry(chat, message_count, now, message_count, context_tokens)
+            self._entries.move_to_end(key)
+            self._evict_idle(now)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def put_if_absent(self, key: ChatKey, chat: Any, message_count: int, context_tokens: int = 0) -> bool:
+        """
+        Store a live chat unless one is already cached for the key.
+
+        Args:
+            key: Chat key
+            chat: Chat object
+            message_count: Number of messages in the history the chat mirrors
+            context_tokens: Estimated tokens of the context the chat was created with
+
+        Returns:
+            True if the chat was stored
+        """
+        with self._lock:
+            if key in self._entries:
+                return False
+            self._entries[key] = ChatSessionEntry(chat, message_count, time.monotonic(), message_count, context_tokens)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+            return True
+
+    def advance(self, key: ChatKey, message_count: int):
+        """
+        Record that a chat's history now has the given length.
+
+        Args:
+            key: Chat key
+            message_count: New number of messages
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.message_count = message_count
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(key)
+
+    def evict(self, key: ChatKey):
+        """
+        Drop a chat, e.g. one whose history may no longer match the session.
+
+        Args:
+            key: Chat key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict_user(self, user_id: str):
+        """
+        Drop all chats of a user.
+
+        Args:
+            user_id: User whose chats should be dropped
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict_idle(self, now: float):
+        """Drop chats unused for longer than the idle timeout (oldest first)."""
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used < self.idle_timeout:
+                break
+            del self._entries[key]
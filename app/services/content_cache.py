@@ -0,0 +1,224 @@
+"""
+Shared in-process cache for content loaded from Google Cloud Storage.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+from config.settings import (
+    CONTENT_CACHE_TTL,
+    CONTENT_CACHE_MAX_ENTRIES,
+    CONTENT_CACHE_MAX_BYTES
+)
+
+@dataclass
+class CacheEntry:
+    """A cached value together with the blob generation it was parsed from."""
+    value: Any
+    generation: Optional[int]
+    size: int
+    checked_at: float
+
+@dataclass
+class _KeyLock:
+    """Lock serializing the reloads of one key, with the threads holding or awaiting it."""
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory held by a cached value.
+
+    Collections, dictionaries and objects such as the parsed manifest are
+    sized with everything they contain; objects shared within the value
+    are counted once.
+
+    Args:
+        value: A string, collection, dictionary or object
+
+    Returns:
+        Approximate size in bytes
+    """
+    size = 0
+    seen = set()
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, int, float, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, frozenset, set)):
+            pending.extend(item)
+        else:
+            if hasattr(item, "__dict__"):
+                pending.append(vars(item))
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    pending.append(getattr(item, slot))
+    return size
+
+class ContentCache:
+    """Bounded LRU cache keyed by blob name, shared by all sessions."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = CONTENT_CACHE_TTL,
+        max_entries: int = CONTENT_CACHE_MAX_ENTRIES,
+        max_bytes: int = CONTENT_CACHE_MAX_BYTES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, _KeyLock] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "not_modified": 0,
+            "evictions": 0
+        }
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Get an entry and mark it as recently used.
+
+        Args:
+            key: Cache key (usually the blob name)
+
+        Returns:
+            The cached entry or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Check if an entry was validated within the TTL."""
+        return time.monotonic() - entry.checked_at < self.ttl_seconds
+
+    @contextmanager
+    def key_lock(self, key: str) -> Iterator[None]:
+        """
+        Hold the lock that serializes reloads of one key.
+
+        The lock is kept while any thread holds or waits for it, so
+        evicting the key never lets a second download of it start.
+
+        Args:
+            key: Cache key
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, _KeyLock())
+            key_lock.users += 1
+        try:
+            with key_lock.lock:
+                yield
+        finally:
+            with self._lock:
+                key_lock.users -= 1
+                if not key_lock.users and key not in self._entries:
+                    self._key_locks.pop(key, None)
+
+    def put(self, key: str, value: Any, generation: Optional[int]):
+        """
+        Store a freshly downloaded value and evict entries over budget.
+
+        Args:
+            key: Cache key
+            value: Parsed value
+            generation: Blob generation the value was parsed from
+        """
+        entry = CacheEntry(value, generation, estimate_size(value), time.monotonic())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._drop_key_lock(evicted_key)
+                self._stats["evictions"] += 1
+
+    def mark_validated(self, key: str):
+        """
+        Restart the TTL of an entry whose blob was confirmed unchanged.
+
+        Args:
+            key: Cache key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.checked_at = time.monotonic()
+
+    def invalidate(self, key: str):
+        """
+        Drop an entry from the cache.
+
+        Args:
+            key: Cache key
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def invalidate_if_changed(self, key: str, generation: Optional[int]):
+        """
+        Drop an entry if the blob now has a different generation.
+
+        Args:
+            key: Cache key
+            generation: Current generation of the blob
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.generation != generation:
+                del self._entries[key]
+                self._bytes -= entry.size
+
+    def _drop_key_lock(self, key: str):
+        """Forget the lock of an evicted key unless a thread holds or awaits it; call with the lock held."""
+        key_lock = self._key_locks.get(key)
+        if key_lock is not None and not key_lock.users:
+            del self._key_locks[key]
+
+    def record(self, event: str):
+        """
+        Count a cache event.
+
+        Args:
+            event: One of 'hits', 'misses' or 'not_modified'
+        """
+        with self._lock:
+            self._stats[event] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary with hit/miss/revalidation counters, entry count and bytes
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
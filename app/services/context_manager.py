@@ -0,0 +1,234 @@
+"""
+Bounded chat context with rolling summaries of older turns.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+from google.genai import types
+from models.chat_message import ChatMessage
+from config.prompts import get_summary_prompt
+from utils.metrics import span, record_usage
+from services.governor import GeminiGovernor, GovernorBusyError, QuotaExceededError
+from config.settings import (
+    CONTEXT_COMPACTION_ENABLED,
+    CONTEXT_WINDOW_TURNS,
+    CONTEXT_MAX_HISTORY_TOKENS,
+    CONTEXT_SUMMARY_MODEL,
+    CONTEXT_SUMMARY_WORKERS,
+    CHAT_SESSION_CACHE_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Greeting, first student message and first reply are always kept verbatim
+FIRST_EXCHANGE_LENGTH = 3
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(messages: List[ChatMessage]) -> int:
+    """
+    Roughly estimate the input tokens of a message list.
+
+    Args:
+        messages: Chat messages
+
+    Returns:
+        Estimated token count
+    """
+    return sum(len(message.text) for message in messages) // CHARS_PER_TOKEN
+
+@dataclass
+class CompactedContext:
+    """History to send to the model, plus the summary replacing older turns."""
+    history: List[ChatMessage]
+    summary: Optional[str]
+    tokens: int
+
+@dataclass
+class ConversationSummary:
+    """Summary of the messages between the first exchange and `covered_upto`."""
+    text: str
+    covered_upto: int
+
+class ContextManager:
+    """Keeps the first exchange and the last turns verbatim and summarizes the rest."""
+
+    def __init__(
+        self,
+        client: Any,
+        governor: Optional[GeminiGovernor] = None,
+        window_turns: int = CONTEXT_WINDOW_TURNS,
+        max_history_tokens: int = CONTEXT_MAX_HISTORY_TOKENS,
+        summary_model: str = CONTEXT_SUMMARY_MODEL,
+        enabled: bool = CONTEXT_COMPACTION_ENABLED
+    ):
+        self.client = client
+        self.governor = governor if governor is not None else GeminiGovernor()
+        self.window_turns = window_turns
+        self.max_history_tokens = max_history_tokens
+        self.summary_model = summary_model
+        self.enabled = enabled
+        self._summaries: "OrderedDict[Hashable, ConversationSummary]" = OrderedDict()
+        self._pending: Set[Tuple[Hashable, int]] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=CONTEXT_SUMMARY_WORKERS,
+            thread_name_prefix="context-summary"
+        )
+        self._stats = {
+            "turns": 0,
+            "compacted_turns": 0,
+            "tokens_saved": 0,
+            "last_tokens_saved": 0
+        }
+
+    def needs_compaction(self, messages: List[ChatMessage]) -> bool:
+        """
+        Check if a history is longer than the verbatim window and token budget.
+
+        Args:
+            messages: Session history
+
+        Returns:
+            True if older turns should be summarized
+        """
+        return (
+            self.enabled
+            and len(messages) > FIRST_EXCHANGE_LENGTH + 2 * self.window_turns
+            and estimate_tokens(messages) > self.max_history_tokens
+        )
+
+    def should_rebuild(self, built_count: int, message_count: int, messages: List[ChatMessage]) -> bool:
+        """
+        Check if a live chat has grown a full window past its last compaction.
+
+        Args:
+            built_count: History length the chat was built from
+            message_count: Current history length
+            messages: Session history
+
+        Returns:
+            True if the chat should be rebuilt from a compacted context
+        """
+        return message_count - built_count >= 2 * self.window_turns and self.needs_compaction(messages)
+
+    def compact(self, key: Hashable, messages: List[ChatMessage]) -> CompactedContext:
+        """
+        Build the context for a chat and refresh its summary in the background.
+
+        Until a summary covering the older turns is ready, the most recent
+        available summary is used and the remaining turns are sent verbatim.
+
+        Args:
+            key: Conversation key
+            messages: Session history
+
+        Returns:
+            The compacted context
+        """
+        if not self.needs_compaction(messages):
+            return CompactedContext(list(messages), None, estimate_tokens(messages))
+
+        cutoff = len(messages) - 2 * self.window_turns
+        if messages[cutoff].role != "user":
+            cutoff -= 1
+
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+
+        if summary is None or summary.covered_upto < cutoff:
+            self._schedule_summary(key, messages[:cutoff], summary)
+
+        if summary is None or summary.covered_upto > len(messages):
+            return CompactedContext(list(messages), None, estimate_tokens(messages))
+
+        history = messages[:FIRST_EXCHANGE_LENGTH] + messages[summary.covered_upto:]
+        tokens = estimate_tokens(history) + len(summary.text) // CHARS_PER_TOKEN
+        return CompactedContext(history, summary.text, tokens)
+
+    def record_turn(self, full_tokens: int, sent_tokens: int):
+        """
+        Record the estimated tokens saved on one turn.
+
+        Args:
+            full_tokens: Estimated tokens of the whole history
+            sent_tokens: Estimated tokens actually held by the chat
+        """
+        saved = max(full_tokens - sent_tokens, 0)
+        with self._lock:
+            self._stats["turns"] += 1
+            self._stats["last_tokens_saved"] = saved
+            if saved:
+                self._stats["compacted_turns"] += 1
+                self._stats["tokens_saved"] += saved
+        logger.debug("Context: %d of %d estimated history tokens sent", sent_tokens, full_tokens)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get token savings counters.
+
+        Returns:
+            Dictionary with turn counts, total and average tokens saved per turn
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_tokens_saved"] = stats["tokens_saved"] / stats["turns"] if stats["turns"] else 0.0
+        return stats
+
+    def forget(self, key: Hashable):
+        """
+        Drop the summary of a conversation.
+
+        Args:
+            key: Conversation key
+        """
+        with self._lock:
+            self._summaries.pop(key, None)
+
+    def _schedule_summary(self, key: Hashable, messages: List[ChatMessage], previous: Optional[ConversationSummary]):
+        """Summarize older turns on a worker thread unless already in progress."""
+        cutoff = len(messages)
+        with self._lock:
+            if (key, cutoff) in self._pending:
+                return
+            self._pending.add((key, cutoff))
+        self._executor.submit(self._summarize, key, list(messages), previous)
+
+    def _summarize(self, key: Hashable, messages: List[ChatMessage], previous: Optional[ConversationSummary]):
+        """Fold the turns after the previous summary into a new summary."""
+        cutoff = len(messages)
+        start = previous.covered_upto if previous is not None else FIRST_EXCHANGE_LENGTH
+        transcript = "\n".join(f"{message.role}: {message.text}" for message in messages[start:])
+        user_id = key[0] if isinstance(key, tuple) else None
+        try:
+            with self.governor.admit(user_id, len(transcript) // CHARS_PER_TOKEN) as admission, span("ai_call", op="summarize"):
+                response = self.client.models.generate_content(
+                    model=self.summary_model,
+                    contents=get_summary_prompt(previous.text if previous else None, transcript),
+                    config=types.GenerateContentConfig(
+                        temperature=0.2,
+                        thinking_config=types.ThinkingConfig(thinking_budget=0)
+                    )
+                )
+                admission.usage_metadata = getattr(response, "usage_metadata", None)
+            record_usage(getattr(response, "usage_metadata", None), "summary")
+            if response.text:
+                with self._lock:
+                    current = self._summaries.get(key)
+                    if current is None or current.covered_upto < cutoff:
+                        self._summaries[key] = ConversationSummary(response.text.strip(), cutoff)
+                        self._summaries.move_to_end(key)
+                    while len(self._summaries) > CHAT_SESSION_CACHE_SIZE:
+                        self._summaries.popitem(last=False)
+        except (GovernorBusyError, QuotaExceededError) as e:
+            # The full history is sent until a later turn retries the summary
+            logger.info("Skipped summarizing conversation history: %s", e)
+        except Exception:
+            logger.exception("Failed to summarize conversation history")
+        finally:
+            with self._lock:
+                self._pending.discard((key, cutoff))
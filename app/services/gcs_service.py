@@ -2,21 +2,245 @@
 Google Cloud Storage service for managing lesson data.
 """
 import os
+import json
+import logging
+import threading
 import streamlit as st
-from typing import List, Optional
-from google.cloud import storage
-from config.settings import GCS_BUCKET_NAME, SENTENCES_PREFIX
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from google.api_core.exceptions import NotFound, NotModified
+from services.content_cache import ContentCache
+from services.storage_backend import StorageBackend, create_storage_backend
+from services.unit_manifest import UnitManifest, content_hash, parse_manifest
+from utils.metrics import span, timed
+from config.settings import (
+    SENTENCES_PREFIX,
+    SENTENCE_PACK_SUFFIX,
+    UNIT_MANIFEST_ENABLED,
+    UNIT_MANIFEST_NAME
+)
+
+if TYPE_CHECKING:
+    from google.cloud import storage
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def parse_lines(content: str) -> Tuple[str, ...]:
+    """
+    Parse a one-entry-per-line text file.
+    
+    Args:
+        content: Raw file content
+        
+    Returns:
+        Tuple of stripped, non-empty lines
+    """
+    return tuple(line.strip() for line in content.splitlines() if line.strip())
+
+def parse_sentence_pack(content: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse a sentence pack file.
+    
+    Args:
+        content: Raw JSON content of the pack
+        
+    Returns:
+        Mapping of sentence to its reference entry
+        
+    Raises:
+        ValueError: If the content is not a pack document
+    """
+    pack = json.loads(content)
+    entries = pack.get("entries", {}) if isinstance(pack, dict) else None
+    if not isinstance(entries, dict):
+        raise ValueError("Sentence pack has no mapping of entries")
+    return entries
+
+def unit_name(blob_name: str, sentences_prefix: str = SENTENCES_PREFIX) -> Optional[str]:
+    """
+    Get the unit a blob holds.
+    
+    Args:
+        blob_name: Name of a blob below the sentences prefix
+        sentences_prefix: Prefix path of the unit files
+        
+    Returns:
+        Unit name, or None if the blob is not a unit file
+    """
+    if not blob_name.endswith(".txt") or not blob_name.startswith(sentences_prefix):
+        return None
+    base = blob_name[len(sentences_prefix):]
+    return os.path.splitext(base)[0] if base else None
 
 class GCSService:
-    """Service for interacting with Google Cloud Storage."""
+    """Service for lesson data in Google Cloud Storage or a local mirror of the bucket."""
+    
+    def __init__(
+        self, 
+        client: Optional["storage.Client"] = None, 
+        backend: Optional[StorageBackend] = None,
+        use_manifest: bool = UNIT_MANIFEST_ENABLED
+    ):
+        self.backend = backend if backend is not None else create_storage_backend(client)
+        self.cache = ContentCache(ttl_seconds=self.backend.revalidate_after)
+        self.use_manifest = use_manifest
+        # Generation of each manifest found out of date, ignored until it is rebuilt
+        self._stale_manifests: Dict[str, Optional[int]] = {}
+        self._stale_lock = threading.Lock()
+    
+    def get_blob_path(self, unit: str, sentences_dir: str = SENTENCES_PREFIX) -> str:
+        """
+        Build the blob path of a unit file.
+        
+        Args:
+            unit: The unit name
+            sentences_dir: Directory path in GCS (default: sentences/)
+            
+        Returns:
+            Blob path of the unit's .txt file
+        """
+        return os.path.join(sentences_dir, f"{unit}.txt")
+    
+    def get_pack_path(self, unit: str, sentences_dir: str = SENTENCES_PREFIX) -> str:
+        """
+        Build the blob path of a unit's sentence pack.
+        
+        Args:
+            unit: The unit name
+            sentences_dir: Directory path in GCS (default: sentences/)
+            
+        Returns:
+            Blob path of the pack file next to the unit's .txt file
+        """
+        return os.path.join(sentences_dir, f"{unit}{SENTENCE_PACK_SUFFIX}")
     
-    def __init__(self):
-        self.client = storage.Client()
-        self.bucket_name = GCS_BUCKET_NAME
+    def get_manifest_path(self, sentences_dir: str = SENTENCES_PREFIX) -> str:
+        """
+        Build the blob path of the unit manifest.
+        
+        Args:
+            sentences_dir: Directory path in GCS (default: sentences/)
+            
+        Returns:
+            Blob path of the manifest next to the unit files
+        """
+        return os.path.join(sentences_dir, UNIT_MANIFEST_NAME)
     
-    def get_bucket(self):
-        """Get the GCS bucket."""
-        return self.client.get_bucket(self.bucket_name)
+    @timed("gcs_request", op="download")
+    def download_text_if_modified(self, blob_path: str, generation: Optional[int] = None) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Download a blob's text unless its generation is unchanged.
+        
+        Args:
+            blob_path: Path to the blob in GCS
+            generation: Generation of the locally known copy, if any
+            
+        Returns:
+            Tuple of (content, generation). Content is None if the blob
+            still has the given generation.
+            
+        Raises:
+            Exception: Any GCS error other than "not modified"
+        """
+        try:
+            return self.backend.read_text(blob_path, if_generation_not_match=generation)
+        except NotModified:
+            return None, generation
+    
+    def load_cached(self, blob_path: str, parse: Callable[[str], T]) -> T:
+        """
+        Load and parse a blob through the shared content cache.
+        
+        Fresh entries are served from memory. Stale entries are revalidated
+        with a conditional download that only transfers changed content.
+        
+        Args:
+            blob_path: Path to the blob in GCS
+            parse: Function turning the blob text into the cached value
+            
+        Returns:
+            The parsed value (shared between sessions, do not mutate)
+            
+        Raises:
+            Exception: Any GCS error
+        """
+        entry = self.cache.get(blob_path)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record("hits")
+            return entry.value
+        
+        with self.cache.key_lock(blob_path):
+            # Another thread may have reloaded the blob while we waited
+            entry = self.cache.get(blob_path)
+            if entry is not None and self.cache.is_fresh(entry):
+                self.cache.record("hits")
+                return entry.value
+            
+            known_generation = entry.generation if entry is not None else None
+            content, generation = self.download_text_if_modified(blob_path, known_generation)
+            if content is None:
+                self.cache.record("not_modified")
+                self.cache.mark_validated(blob_path)
+                return entry.value
+            
+            self.cache.record("misses")
+            value = parse(content)
+            self.cache.put(blob_path, value, generation)
+            return value
+    
+    def load_manifest(self, sentences_prefix: str = SENTENCES_PREFIX) -> Optional[UnitManifest]:
+        """
+        Load the unit manifest through the shared content cache.
+        
+        Revalidating it is one conditional download. A newly downloaded
+        manifest seeds the cache with the sentences it holds, so opening a
+        unit needs no download either.
+        
+        Args:
+            sentences_prefix: Prefix path of the unit files
+            
+        Returns:
+            The manifest, or None if it is missing, unsupported or out of date
+        """
+        manifest_path = self.get_manifest_path(sentences_prefix)
+        try:
+            manifest = self.load_cached(manifest_path, self._parse_manifest)
+        except NotFound:
+            # Remember the missing manifest until the next revalidation
+            self.cache.put(manifest_path, None, None)
+            return None
+        except Exception:
+            logger.warning("Could not load the unit manifest %s", manifest_path, exc_info=True)
+            return None
+        if manifest is None or self._is_manifest_stale(manifest_path):
+            return None
+        return manifest
+    
+    def load_unit_sentences(self, unit: str, sentences_dir: str = SENTENCES_PREFIX) -> Tuple[str, ...]:
+        """
+        Load the sentences of a unit through the shared content cache.
+        
+        A downloaded unit whose content differs from the manifest's hash, or
+        a unit of the manifest that no longer exists, marks the manifest as
+        out of date, so units are listed again until it is rebuilt.
+        
+        Args:
+            unit: The unit name
+            sentences_dir: Directory path in GCS (default: sentences/)
+            
+        Returns:
+            Tuple of sentences (shared between sessions)
+            
+        Raises:
+            Exception: Any GCS error
+        """
+        blob_path = self.get_blob_path(unit, sentences_dir)
+        try:
+            return self.load_cached(blob_path, lambda content: self._parse_unit(blob_path, content))
+        except NotFound:
+            self._check_manifest(blob_path, None)
+            raise
     
     def load_sentences_for_unit(self, unit: str, sentences_dir: str = SENTENCES_PREFIX) -> Optional[List[str]]:
         """
@@ -30,10 +254,7 @@ class GCSService:
             List of sentences or None if error
         """
         try:
-            bucket = self.get_bucket()
-            blob = bucket.blob(os.path.join(sentences_dir, f"{unit}.txt"))
-            content = blob.download_as_text()
-            return [line.strip() for line in content.splitlines() if line.strip()]
+            return list(self.load_unit_sentences(unit, sentences_dir))
         except Exception as e:
             st.error(f"Error reading '{unit}' from GCS: {e}")
             return None
@@ -42,29 +263,135 @@ class GCSService:
         """
         List available unit files in GCS.
         
+        Units come from the manifest if there is an up-to-date one.
+        Otherwise the prefix is listed; the listing is cached for the content
+        cache TTL, and refreshing it also drops cached units whose blob
+        generation has changed.
+        
         Args:
             sentences_prefix: Prefix path in GCS bucket
             
         Returns:
             List of unit names (without .txt extension)
         """
+        if self.use_manifest:
+            manifest = self.load_manifest(sentences_prefix)
+            if manifest is not None:
+                return [unit.name for unit in manifest.units]
+        
+        cache_key = f"list:{sentences_prefix}"
+        entry = self.cache.get(cache_key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record("hits")
+            return list(entry.value)
+        
         try:
-            bucket = self.get_bucket()
-            blobs = bucket.list_blobs(prefix=sentences_prefix)
-            unit_files = []
-            
-            for blob in blobs:
-                name = blob.name
-                if name.endswith(".txt") and not name.endswith("/"):
-                    base = name[len(sentences_prefix):]
-                    if base:
-                        unit_files.append(os.path.splitext(base)[0])
-            
-            return unit_files
+            with self.cache.key_lock(cache_key):
+                entry = self.cache.get(cache_key)
+                if entry is not None and self.cache.is_fresh(entry):
+                    self.cache.record("hits")
+                    return list(entry.value)
+                
+                unit_files = []
+                
+                with span("gcs_request", op="list"):
+                    for blob in self.backend.list_objects(sentences_prefix):
+                        unit = unit_name(blob.name, sentences_prefix)
+                        if unit:
+                            unit_files.append(unit)
+                            self.cache.invalidate_if_changed(blob.name, blob.generation)
+                
+                self.cache.record("misses")
+                self.cache.put(cache_key, tuple(unit_files), None)
+                return unit_files
         except Exception as e:
             st.error(f"Error listing files in '{sentences_prefix}' from GCS: {e}")
             return []
     
+    def load_sentence_pack(self, unit: str, sentences_dir: str = SENTENCES_PREFIX) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Load the precomputed references of a unit, if a pack was built.
+        
+        Args:
+            unit: The unit name
+            sentences_dir: Directory path in GCS (default: sentences/)
+            
+        Returns:
+            Mapping of sentence to reference entry, or None if there is no pack
+        """
+        pack_path = self.get_pack_path(unit, sentences_dir)
+        try:
+            return self.load_cached(pack_path, parse_sentence_pack)
+        except NotFound:
+            # Remember the missing pack until the next revalidation
+            self.cache.put(pack_path, None, None)
+            return None
+        except ValueError:
+            # Includes JSON decode errors
+            logger.warning("Sentence pack %s is malformed, answering without references", pack_path, exc_info=True)
+            return None
+        except Exception:
+            logger.warning("Could not load the sentence pack %s", pack_path, exc_info=True)
+            return None
+    
+    def _parse_manifest(self, content: str) -> Optional[UnitManifest]:
+        """Parse a downloaded manifest and seed the cache with its sentences."""
+        manifest = parse_manifest(content)
+        if manifest is None:
+            logger.warning("Unit manifest has an unsupported version, listing units instead")
+            return None
+        for unit in manifest.units:
+            if unit.sentences is not None and self.cache.get(unit.path) is None:
+                self.cache.put(unit.path, unit.sentences, unit.generation)
+        return manifest
+    
+    def _parse_unit(self, blob_path: str, content: str) -> Tuple[str, ...]:
+        """Parse a downloaded unit file and check it against the manifest."""
+        self._check_manifest(blob_path, content_hash(content))
+        return parse_lines(content)
+    
+    def _check_manifest(self, blob_path: str, sha256: Optional[str]):
+        """
+        Mark the manifest as out of date if it disagrees with a unit.
+        
+        Args:
+            blob_path: Blob path of the unit
+            sha256: Hash of the unit's current content, None if it was deleted
+        """
+        if not self.use_manifest:
+            return
+        manifest_path = os.path.join(os.path.dirname(blob_path), UNIT_MANIFEST_NAME)
+        entry = self.cache.get(manifest_path)
+        if entry is None or entry.value is None:
+            return
+        unit = entry.value.get(blob_path)
+        if unit is not None and unit.sha256 != sha256:
+            logger.info("Unit manifest %s is out of date for %s, listing units instead", manifest_path, blob_path)
+            with self._stale_lock:
+                self._stale_manifests[manifest_path] = entry.generation
+    
+    def _is_manifest_stale(self, manifest_path: str) -> bool:
+        """Check if the cached manifest was found out of date."""
+        entry = self.cache.get(manifest_path)
+        with self._stale_lock:
+            if manifest_path not in self._stale_manifests:
+                return False
+            return entry is not None and self._stale_manifests[manifest_path] == entry.generation
+    
+    @timed("gcs_request", op="upload")
+    def upload_text(self, blob_path: str, content: str, content_type: str = "text/plain"):
+        """
+        Upload text content to GCS.
+        
+        Args:
+            blob_path: Path to the blob in GCS
+            content: Text to upload
+            content_type: MIME type of the content
+        """
+        self.backend.write_text(blob_path, content, content_type=content_type)
+        self.cache.invalidate(blob_path)
+    
+    @timed("gcs_request", op="exists")
     def file_exists(self, file_path: str) -> bool:
         """
         Check if a file exists in GCS.
@@ -76,8 +403,6 @@ class GCSService:
             True if file exists, False otherwise
         """
         try:
-            bucket = self.get_bucket()
-            blob = bucket.blob(file_path)
-            return blob.exists()
+            return self.backend.exists(file_path)
         except Exception:
             return False
\ No newline at end of file
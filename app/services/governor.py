@@ -0,0 +1,267 @@
+"""
+Process-wide admission control in front of all Gemini calls.
+
+Every call waits for a free slot under a global concurrency cap and for
+request and token budgets (token buckets refilled per minute). Waiting
+calls are served round-robin across users, so one chatty student cannot
+starve a class. Actual token usage from the responses counts against a
+per-user daily quota. Calls that cannot be admitted in time fail fast with
+GovernorBusyError, which the UI shows as a busy state.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+from utils.metrics import metrics
+from config.settings import (
+    GOVERNOR_MAX_CONCURRENT,
+    GOVERNOR_REQUESTS_PER_MINUTE,
+    GOVERNOR_TOKENS_PER_MINUTE,
+    GOVERNOR_USER_DAILY_TOKENS,
+    GOVERNOR_MAX_QUEUE,
+    GOVERNOR_MAX_WAIT,
+    GOVERNOR_TURN_TOKEN_ESTIMATE
+)
+
+logger = logging.getLogger(__name__)
+
+class GovernorBusyError(Exception):
+    """Raised when a Gemini call cannot be admitted before its wait limit."""
+
+class QuotaExceededError(Exception):
+    """Raised when a user has used up their daily token quota."""
+
+class TokenBucket:
+    """Budget refilled continuously at a per-minute rate; 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Get the seconds until an amount can be taken.
+
+        Args:
+            amount: Tokens needed (capped at the bucket's capacity)
+            now: Current monotonic time
+
+        Returns:
+            0 if the amount is available now
+        """
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        """Take tokens; a negative amount refunds them."""
+        if not self.capacity:
+            return
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+class Admission:
+    """
+    A granted Gemini call; release it when the call is done.
+
+    Use as a context manager and set `usage_metadata` from the response so
+    the actual tokens are charged instead of the estimate.
+    """
+
+    def __init__(self, governor: "GeminiGovernor", user_id: str, estimated_tokens: int, waited: float):
+        self.governor = governor
+        self.user_id = user_id
+        self.estimated_tokens = estimated_tokens
+        self.waited = waited
+        self.usage_metadata: Optional[Any] = None
+        self._released = False
+
+    def __enter__(self) -> "Admission":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        """Free the slot and charge the used tokens, once."""
+        if not self._released:
+            self._released = True
+            self.governor._release(self)
+
+def used_tokens(usage_metadata: Any) -> Optional[int]:
+    """Get the total tokens reported for a call, or None if unknown."""
+    if usage_metadata is None:
+        return None
+    total = getattr(usage_metadata, "total_token_count", None)
+    if total:
+        return total
+    return sum(
+        getattr(usage_metadata, field, None) or 0
+        for field in ("prompt_token_count", "candidates_token_count", "thoughts_token_count")
+    ) or None
+
+class GeminiGovernor:
+    """Admission controller with rate limits, a concurrency cap, fair queueing and quotas."""
+
+    def __init__(
+        self,
+        max_concurrent: int = GOVERNOR_MAX_CONCURRENT,
+        requests_per_minute: float = GOVERNOR_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = GOVERNOR_TOKENS_PER_MINUTE,
+        daily_user_tokens: int = GOVERNOR_USER_DAILY_TOKENS,
+        max_queue: int = GOVERNOR_MAX_QUEUE,
+        max_wait: float = GOVERNOR_MAX_WAIT
+    ):
+        self.max_concurrent = max_concurrent
+        self.daily_user_tokens = daily_user_tokens
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._condition = threading.Condition()
+        self._active = 0
+        # Users with waiting calls in round-robin order, each with its calls in arrival order
+        self._waiting: "OrderedDict[str, Deque[object]]" = OrderedDict()
+        self._queued = 0
+        self._usage_day = ""
+        self._usage: Dict[str, int] = {}
+        self._stats = {
+            "admitted": 0,
+            "busy": 0,
+            "over_quota": 0,
+            "wait_seconds_total": 0.0,
+            "max_wait_seconds": 0.0,
+            "max_queued": 0
+        }
+
+    def admit(self, user_id: Optional[str], estimated_tokens: int = GOVERNOR_TURN_TOKEN_ESTIMATE) -> Admission:
+        """
+        Wait for this user's turn and the budget of one call.
+
+        Args:
+            user_id: User the call is made for
+            estimated_tokens: Tokens charged until the actual usage is known
+
+        Returns:
+            Admission to release once the call is done
+
+        Raises:
+            QuotaExceededError: If the user's daily quota is used up
+            GovernorBusyError: If the queue is full or the wait limit passes
+        """
+        user_id = user_id or "anonymous"
+        ticket = object()
+        started_at = time.monotonic()
+        deadline = started_at + self.max_wait
+        with self._condition:
+            if self.daily_user_tokens and self._usage_today(user_id) >= self.daily_user_tokens:
+                self._stats["over_quota"] += 1
+                raise QuotaExceededError(f"Daily token quota of {user_id} is used up")
+            if self._queued >= self.max_queue:
+                self._stats["busy"] += 1
+                raise GovernorBusyError("Too many Gemini calls are waiting")
+            self._waiting.setdefault(user_id, deque()).append(ticket)
+            self._queued += 1
+            self._stats["max_queued"] = max(self._stats["max_queued"], self._queued)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._admission_delay(user_id, ticket, estimated_tokens, now)
+                    if delay == 0:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats["busy"] += 1
+                        raise GovernorBusyError(f"No Gemini capacity within {self.max_wait:g}s")
+                    self._condition.wait(timeout=min(remaining, delay) if delay is not None else remaining)
+            except BaseException:
+                self._dequeue(user_id, ticket)
+                self._condition.notify_all()
+                raise
+            self._dequeue(user_id, ticket)
+            self._active += 1
+            self._requests.take(1, now)
+            self._tokens.take(estimated_tokens, now)
+            waited = now - started_at
+            self._stats["admitted"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            # Others may be admissible now that this user moved to the back of the line
+            self._condition.notify_all()
+        if metrics.enabled:
+            metrics.observe("gemini_queue_wait_seconds", waited)
+        return Admission(self, user_id, estimated_tokens, waited)
+
+    def usage_today(self, user_id: str) -> int:
+        """Get the tokens a user has used today."""
+        with self._condition:
+            return self._usage_today(user_id)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get queue depth, occupancy and outcome counters.
+
+        Returns:
+            Dictionary with active calls, queued calls, waiting users and counters
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats["active"] = self._active
+            stats["queued"] = self._queued
+            stats["waiting_users"] = len(self._waiting)
+        stats["avg_wait_seconds"] = stats["wait_seconds_total"] / stats["admitted"] if stats["admitted"] else 0.0
+        return stats
+
+    def _admission_delay(self, user_id: str, ticket: object, estimated_tokens: int, now: float) -> Optional[float]:
+        """
+        Check if a waiting call may start.
+
+        Returns:
+            0 to start now, seconds until the budgets allow it, or None to wait for a release
+        """
+        next_user = next(iter(self._waiting))
+        if next_user != user_id or self._waiting[user_id][0] is not ticket:
+            return None
+        if self._active >= self.max_concurrent:
+            return None
+        return max(self._requests.delay(1, now), self._tokens.delay(estimated_tokens, now))
+
+    def _dequeue(self, user_id: str, ticket: object):
+        """Remove a call from its user's queue and move the user to the back of the line."""
+        tickets = self._waiting.get(user_id)
+        if tickets is None or ticket not in tickets:
+            return
+        tickets.remove(ticket)
+        self._queued -= 1
+        if tickets:
+            self._waiting.move_to_end(user_id)
+        else:
+            del self._waiting[user_id]
+
+    def _release(self, admission: Admission):
+        """Free a slot and charge the call's tokens."""
+        actual = used_tokens(admission.usage_metadata)
+        with self._condition:
+            self._active -= 1
+            if actual is not None:
+                self._tokens.take(actual - admission.estimated_tokens, time.monotonic())
+            tokens = actual if actual is not None else admission.estimated_tokens
+            self._usage[admission.user_id] = self._usage_today(admission.user_id) + tokens
+            self._condition.notify_all()
+
+    def _usage_today(self, user_id: str) -> int:
+        """Get a user's tokens of the current UTC day, starting a new day if needed."""
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        if today != self._usage_day:
+            self._usage_day = today
+            self._usage.clear()
+        return self._usage.get(user_id, 0)
@@ -0,0 +1,226 @@
+"""
+Background prefetch of what a student is likely to open next.
+
+When a sentence is finished, the next sentence's chat and the next unit's
+sentences are prepared on a small worker pool, so switching to them does
+not wait for storage reads or chat setup. Work is bounded per user: a new
+prefetch cancels that user's oldest pending ones, and a reset cancels all.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from models.chat_message import ChatMessage
+from services.chat_session_cache import ChatKey
+from services.gcs_service import GCSService
+from config.settings import PREFETCH_ENABLED, PREFETCH_WORKERS, PREFETCH_MAX_PER_USER
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class NextUp:
+    """What a student will probably open after the current sentence."""
+    sentence: Optional[str] = None
+    reference: Optional[Dict[str, Any]] = None
+    unit: Optional[str] = None
+
+@dataclass
+class _PrefetchTask:
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    future: Optional[Future] = None
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+class Prefetcher:
+    """Runs cancellable prefetch work, a bounded number per user."""
+
+    def __init__(
+        self,
+        gcs_service: GCSService,
+        get_ai_service: Callable[[], Any],
+        max_workers: int = PREFETCH_WORKERS,
+        max_per_user: int = PREFETCH_MAX_PER_USER,
+        enabled: bool = PREFETCH_ENABLED
+    ):
+        self.gcs_service = gcs_service
+        self.get_ai_service = get_ai_service
+        self.max_per_user = max_per_user
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._tasks: Dict[str, "OrderedDict[Hashable, _PrefetchTask]"] = {}
+        self._lock = threading.Lock()
+        self._stats = {"scheduled": 0, "completed": 0, "cancelled": 0, "failed": 0, "duplicates": 0}
+
+    def prefetch_chat(
+        self,
+        user_id: str,
+        chat_key: ChatKey,
+        student_name: str,
+        sentence: str,
+        message_history: List[ChatMessage],
+        reference: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Prepare a sentence's chat (prompt and config) in the background.
+
+        Args:
+            user_id: User the work is accounted to
+            chat_key: Key the chat will be looked up with
+            student_name: Name of the student
+            sentence: Sentence to prepare
+            message_history: History the chat should mirror; copied
+            reference: Precomputed sentence pack entry, if any
+
+        Returns:
+            True if the work was scheduled
+        """
+        history = list(message_history)
+        return self._submit(
+            user_id,
+            ("chat", chat_key),
+            lambda cancelled: self.get_ai_service().prepare_chat(
+                chat_key, student_name, sentence, history, reference, cancelled=cancelled
+            )
+        )
+
+    def prefetch_unit(self, user_id: str, unit: str) -> bool:
+        """
+        Load a unit's sentences and sentence pack into the shared cache in the background.
+
+        Args:
+            user_id: User the work is accounted to
+            unit: Unit to load
+
+        Returns:
+            True if the work was scheduled
+        """
+        def load(cancelled: threading.Event):
+            self.gcs_service.load_unit_sentences(unit)
+            if not cancelled.is_set():
+                self.gcs_service.load_sentence_pack(unit)
+        return self._submit(user_id, ("unit", unit), load)
+
+    def prefetch_next(
+        self,
+        user_id: str,
+        session_token: str,
+        student_name: str,
+        next_up: NextUp,
+        message_history: List[ChatMessage]
+    ):
+        """
+        Prefetch everything a student may open after finishing a sentence.
+
+        Args:
+            user_id: Student's user id
+            session_token: Token of the student's browser session
+            student_name: Name of the student
+            next_up: Next sentence and unit
+            message_history: Current history of the next sentence
+        """
+        if next_up.sentence:
+            self.prefetch_chat(
+                user_id,
+                (user_id, session_token, next_up.sentence),
+                student_name,
+                next_up.sentence,
+                message_history,
+                next_up.reference
+            )
+        if next_up.unit:
+            self.prefetch_unit(user_id, next_up.unit)
+
+    def cancel_user(self, user_id: str):
+        """
+        Cancel all pending prefetches of a user.
+
+        Args:
+            user_id: User whose work is cancelled
+        """
+        with self._lock:
+            tasks = self._tasks.pop(user_id, None)
+            if tasks:
+                for task in tasks.values():
+                    task.cancel()
+                self._stats["cancelled"] += len(tasks)
+
+    def wait_idle(self, user_id: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Wait until scheduled prefetches have finished.
+
+        Args:
+            user_id: Only wait for this user's work (all users if None)
+            timeout: Maximum seconds to wait
+        """
+        with self._lock:
+            users = [user_id] if user_id is not None else list(self._tasks)
+            futures = [
+                task.future
+                for user in users
+                for task in self._tasks.get(user, {}).values()
+                if task.future is not None
+            ]
+        wait(futures, timeout=timeout)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get prefetch statistics.
+
+        Returns:
+            Dictionary with counts and the number of pending prefetches
+        """
+        with self._lock:
+            return {**self._stats, "pending": sum(len(tasks) for tasks in self._tasks.values())}
+
+    def _submit(self, user_id: str, key: Hashable, work: Callable[[threading.Event], Any]) -> bool:
+        """
+        Schedule work for a user, cancelling their oldest pending work beyond the limit.
+
+        Args:
+            user_id: User the work is accounted to
+            key: Identity of the work; already pending work is not scheduled twice
+            work: Callable receiving an event that is set when the work is cancelled
+
+        Returns:
+            True if the work was scheduled
+        """
+        if not self.enabled or not user_id:
+            return False
+        with self._lock:
+            tasks = self._tasks.setdefault(user_id, OrderedDict())
+            if key in tasks:
+                self._stats["duplicates"] += 1
+                return False
+            while len(tasks) >= self.max_per_user:
+                _, oldest = tasks.popitem(last=False)
+                oldest.cancel()
+                self._stats["cancelled"] += 1
+            task = _PrefetchTask()
+            tasks[key] = task
+            task.future = self._executor.submit(self._run, user_id, key, task, work)
+            self._stats["scheduled"] += 1
+        return True
+
+    def _run(self, user_id: str, key: Hashable, task: _PrefetchTask, work: Callable[[threading.Event], Any]):
+        """Run scheduled work on a pool thread; failures only cost the prefetch."""
+        try:
+            if not task.cancelled.is_set():
+                work(task.cancelled)
+                with self._lock:
+                    self._stats["completed"] += 1
+        except Exception:
+            logger.warning("Prefetch %s failed", key, exc_info=True)
+            with self._lock:
+                self._stats["failed"] += 1
+        finally:
+            with self._lock:
+                tasks = self._tasks.get(user_id)
+                if tasks is not None and tasks.get(key) is task:
+                    del tasks[key]
+                    if not tasks:
+                        del self._tasks[user_id]
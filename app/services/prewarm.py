@@ -0,0 +1,49 @@
+"""
+Instance prewarm: build the shared services before the first student arrives.
+
+A cold instance otherwise pays for SDK imports, credential lookup, TLS
+handshakes and the first storage reads inside the first user's rerun.
+"""
+import logging
+import time
+from typing import Callable, Dict
+from auth.allowlist_cache import get_allowlist_cache
+from services.registry import get_ai_service, get_gcs_service
+
+logger = logging.getLogger(__name__)
+
+def _warm_storage():
+    """Create the storage client and read the allowlist and unit index."""
+    gcs_service = get_gcs_service()
+    get_allowlist_cache().refresh(gcs_service)
+    gcs_service.list_unit_files()
+
+def _warm_gemini():
+    """Create the Gemini client."""
+    get_ai_service()
+
+PREWARM_STEPS: Dict[str, Callable[[], None]] = {
+    "storage": _warm_storage,
+    "gemini": _warm_gemini
+}
+
+def prewarm() -> Dict[str, float]:
+    """
+    Run every prewarm step, logging failures instead of raising them.
+
+    A failed step is simply done again lazily by the first session that needs it.
+
+    Returns:
+        Seconds taken per successful step
+    """
+    timings = {}
+    for name, step in PREWARM_STEPS.items():
+        started_at = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.warning("Prewarm step %s failed", name, exc_info=True)
+            continue
+        timings[name] = time.perf_counter() - started_at
+        logger.info("Prewarmed %s in %.0f ms", name, timings[name] * 1000)
+    return timings
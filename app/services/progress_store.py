@@ -0,0 +1,336 @@
+"""
+Durable storage of students' chat progress as an append-only log per user.
+"""
+import atexit
+from abc import ABC, abstractmethod
+import hashlib
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+from google.api_core.exceptions import NotFound
+from services.gcs_service import GCSService
+from config.settings import (
+    PROGRESS_BACKEND,
+    PROGRESS_SQLITE_PATH,
+    PROGRESS_PREFIX,
+    PROGRESS_FLUSH_INTERVAL,
+    PROGRESS_BATCH_SIZE,
+    PROGRESS_COMPACT_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+# Records without a unit (resets) apply to every unit
+ALL_UNITS = "*"
+
+_sequence = itertools.count()
+
+def make_record(kind: str, unit: Optional[str] = None, sentence: Optional[str] = None, **fields: Any) -> Dict[str, Any]:
+    """
+    Build a progress log record.
+
+    Args:
+        kind: 'message', 'retract' (drop the last message) or 'reset'
+        unit: Unit of the sentence, None for resets
+        sentence: The sentence, None for resets
+        **fields: Message fields (role, text, finished, raw)
+
+    Returns:
+        Record dictionary ordered by timestamp and sequence number
+    """
+    return {
+        "ts": time.time(),
+        "seq": next(_sequence),
+        "kind": kind,
+        "unit": unit or ALL_UNITS,
+        "sentence": sentence,
+        **fields
+    }
+
+def sort_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order records as they were written."""
+    return sorted(records, key=lambda record: (record["ts"], record["seq"]))
+
+class ProgressStore(ABC):
+    """Interface of progress log backends."""
+
+    @abstractmethod
+    def append(self, user_id: str, records: List[Dict[str, Any]]):
+        """
+        Append records to a user's log.
+
+        Args:
+            user_id: User the records belong to
+            records: Records to append
+        """
+
+    @abstractmethod
+    def load(self, user_id: str, unit: str) -> List[Dict[str, Any]]:
+        """
+        Load a user's records of one unit, including resets, in write order.
+
+        Args:
+            user_id: User whose log to read
+            unit: Unit to read
+
+        Returns:
+            List of records
+        """
+
+    def compact(self, user_id: str, unit: str):
+        """
+        Merge a user's unit log into fewer parts, for backends that split it.
+
+        Called on the writer thread after the log was loaded.
+
+        Args:
+            user_id: User whose log to merge
+            unit: Unit to merge
+        """
+
+class SQLiteProgressStore(ProgressStore):
+    """Progress log in a local SQLite database."""
+
+    def __init__(self, path: str = PROGRESS_SQLITE_PATH):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS progress ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+                "unit TEXT NOT NULL, record TEXT NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS progress_user_unit ON progress (user_id, unit)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection (one per call, so any thread may use the store)."""
+        return sqlite3.connect(self.path, timeout=30)
+
+    def append(self, user_id: str, records: List[Dict[str, Any]]):
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT INTO progress (user_id, unit, record) VALUES (?, ?, ?)",
+                [(user_id, record["unit"], json.dumps(record, ensure_ascii=False)) for record in records]
+            )
+
+    def load(self, user_id: str, unit: str) -> List[Dict[str, Any]]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT record FROM progress WHERE user_id = ? AND unit IN (?, ?) ORDER BY id",
+                (user_id, unit, ALL_UNITS)
+            ).fetchall()
+        return sort_records([json.loads(row[0]) for row in rows])
+
+class GCSProgressStore(ProgressStore):
+    """
+    Progress log in the bucket (or its local mirror), one JSON-lines object
+    per written batch and unit.
+
+    Objects live under progress/<user hash>/<unit>/. Once a unit has more
+    than PROGRESS_COMPACT_THRESHOLD objects, the writer thread merges them
+    into one after the log was loaded.
+    """
+
+    def __init__(self, gcs_service: GCSService, prefix: str = PROGRESS_PREFIX):
+        self.gcs_service = gcs_service
+        self.prefix = prefix
+
+    def _unit_prefix(self, user_id: str, unit: str) -> str:
+        """Build the object prefix of a user's unit log."""
+        user_hash = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+        return f"{self.prefix}{user_hash}/{quote(unit, safe='')}/"
+
+    def append(self, user_id: str, records: List[Dict[str, Any]]):
+        by_unit: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_unit.setdefault(record["unit"], []).append(record)
+        for unit, unit_records in by_unit.items():
+            name = f"{self._unit_prefix(user_id, unit)}{time.time_ns()}-{uuid.uuid4().hex[:8]}.jsonl"
+            content = "\n".join(json.dumps(record, ensure_ascii=False) for record in unit_records)
+            self.gcs_service.upload_text(name, content, content_type="application/x-ndjson")
+
+    def load(self, user_id: str, unit: str) -> List[Dict[str, Any]]:
+        records = []
+        for prefix in (self._unit_prefix(user_id, unit), self._unit_prefix(user_id, ALL_UNITS)):
+            try:
+                _, prefix_records = self._read_prefix(prefix)
+            except NotFound:
+                # Another session compacted the log while it was being read
+                _, prefix_records = self._read_prefix(prefix)
+            records.extend(prefix_records)
+        return sort_records(records)
+
+    def compact(self, user_id: str, unit: str):
+        for prefix in (self._unit_prefix(user_id, unit), self._unit_prefix(user_id, ALL_UNITS)):
+            try:
+                if sum(1 for _ in self.gcs_service.backend.list_objects(prefix)) <= PROGRESS_COMPACT_THRESHOLD:
+                    continue
+                names, records = self._read_prefix(prefix)
+            except Exception:
+                logger.warning("Failed to read progress log %s for compaction", prefix, exc_info=True)
+                continue
+            self._compact(prefix, names, records)
+
+    def _read_prefix(self, prefix: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Read all objects of a log.
+
+        Sessions loading at the same time may each compact the log, so a
+        record can be stored in several objects; it is returned once.
+
+        Args:
+            prefix: Object prefix of the log
+
+        Returns:
+            Tuple of (object names, unique records)
+        """
+        backend = self.gcs_service.backend
+        names = [info.name for info in backend.list_objects(prefix)]
+        records: Dict[Tuple[float, int], Dict[str, Any]] = {}
+        for name in names:
+            content, _ = backend.read_text(name)
+            for line in content.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    records.setdefault((record["ts"], record["seq"]), record)
+        return names, list(records.values())
+
+    def _compact(self, prefix: str, names: List[str], records: List[Dict[str, Any]]):
+        """Replace the given objects by a single merged object."""
+        try:
+            content = "\n".join(json.dumps(record, ensure_ascii=False) for record in sort_records(records))
+            self.gcs_service.upload_text(
+                f"{prefix}{time.time_ns()}-compacted.jsonl", content, content_type="application/x-ndjson"
+            )
+            for name in names:
+                self.gcs_service.backend.delete(name)
+        except Exception:
+            logger.warning("Failed to compact progress log %s", prefix, exc_info=True)
+
+class WriteBehindWriter:
+    """Batches progress records and writes them on a background thread."""
+
+    def __init__(
+        self,
+        store: ProgressStore,
+        flush_interval: float = PROGRESS_FLUSH_INTERVAL,
+        batch_size: int = PROGRESS_BATCH_SIZE
+    ):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: List[Tuple[str, Dict[str, Any]]] = []
+        self._in_flight: List[Tuple[str, Dict[str, Any]]] = []
+        # Logs loaded since the last pass, to be compacted off the script thread
+        self._compactions: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, user_id: str, record: Dict[str, Any]):
+        """
+        Queue a record for writing; never blocks on storage.
+
+        Args:
+            user_id: User the record belongs to
+            record: Progress record
+        """
+        with self._lock:
+            self._pending.append((user_id, record))
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def load(self, user_id: str, unit: str) -> List[Dict[str, Any]]:
+        """
+        Load a user's unit log including records not yet written.
+
+        The log is compacted afterwards on the writer thread.
+
+        Args:
+            user_id: User whose log to read
+            unit: Unit to read
+
+        Returns:
+            List of records in write order
+        """
+        records = self.store.load(user_id, unit)
+        stored = {(record["ts"], record["seq"]) for record in records}
+        with self._lock:
+            unwritten = [
+                record for owner, record in self._in_flight + self._pending
+                if owner == user_id and record["unit"] in (unit, ALL_UNITS)
+                and (record["ts"], record["seq"]) not in stored
+            ]
+            self._compactions.add((user_id, unit))
+        self._wakeup.set()
+        return sort_records(records + unwritten)
+
+    def flush(self):
+        """Write all queued records now."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._in_flight = batch
+            if not batch:
+                return
+            by_user: Dict[str, List[Dict[str, Any]]] = {}
+            for user_id, record in batch:
+                by_user.setdefault(user_id, []).append(record)
+            failed = []
+            for user_id, records in by_user.items():
+                try:
+                    self.store.append(user_id, records)
+                except Exception:
+                    logger.warning("Failed to write progress of a user, will retry", exc_info=True)
+                    failed.extend((user_id, record) for record in records)
+            with self._lock:
+                self._pending = failed + self._pending
+                self._in_flight = []
+
+    def _run(self):
+        """Flush periodically or when a batch is full."""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            self._compact()
+
+    def _compact(self):
+        """Compact the logs loaded since the last pass."""
+        with self._lock:
+            compactions, self._compactions = self._compactions, set()
+        for user_id, unit in compactions:
+            try:
+                self.store.compact(user_id, unit)
+            except Exception:
+                logger.warning("Failed to compact progress of a user", exc_info=True)
+
+def create_progress_writer(gcs_service: GCSService, backend: str = PROGRESS_BACKEND) -> Optional[WriteBehindWriter]:
+    """
+    Create the progress writer for the configured backend.
+
+    Args:
+        gcs_service: Storage service for the GCS backend
+        backend: 'none', 'sqlite' or 'gcs'
+
+    Returns:
+        Writer, or None if persistence is disabled
+    """
+    if backend == "sqlite":
+        directory = os.path.dirname(PROGRESS_SQLITE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return WriteBehindWriter(SQLiteProgressStore())
+    if backend == "gcs":
+        return WriteBehindWriter(GCSProgressStore(gcs_service))
+    return None
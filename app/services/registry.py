@@ -0,0 +1,102 @@
+"""
+Process-wide registry of shared service instances.
+"""
+import threading
+from typing import Any, Callable, Dict, Optional
+from services.gcs_service import GCSService
+from services.chat_session_cache import ChatSessionCache
+from services.progress_store import WriteBehindWriter, create_progress_writer
+from services.prefetcher import Prefetcher
+from services.governor import GeminiGovernor
+from utils.metrics import metrics
+
+_lock = threading.RLock()  # factories may request other shared instances
+_instances: Dict[str, Any] = {}
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Get a shared instance, creating it once per process.
+
+    Args:
+        name: Registry key of the instance
+        factory: Callable that builds the instance
+
+    Returns:
+        The shared instance
+    """
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = factory()
+                _instances[name] = instance
+    return instance
+
+def set_instance(name: str, instance: Any):
+    """
+    Install a shared instance, e.g. a service backed by fakes in benchmarks.
+
+    Args:
+        name: Registry key of the instance
+        instance: The instance to share
+    """
+    with _lock:
+        _instances[name] = instance
+
+def clear_instances():
+    """Drop all shared instances so they are created again on next use."""
+    with _lock:
+        _instances.clear()
+
+def _create_gcs_service() -> GCSService:
+    """Create the GCS service and export its cache stats."""
+    service = GCSService()
+    metrics.register_gauge("content_cache", service.cache.get_stats)
+    return service
+
+def get_gcs_service() -> GCSService:
+    """Get the GCS service shared by all sessions."""
+    return _get_or_create("gcs_service", _create_gcs_service)
+
+def get_chat_sessions() -> ChatSessionCache:
+    """Get the live chat cache shared by all sessions."""
+    return _get_or_create("chat_sessions", ChatSessionCache)
+
+def get_progress_writer() -> Optional[WriteBehindWriter]:
+    """Get the progress writer shared by all sessions, or None if persistence is disabled."""
+    # False marks the disabled backend as created, since None means "not created yet"
+    return _get_or_create("progress_writer", lambda: create_progress_writer(get_gcs_service()) or False) or None
+
+def _create_prefetcher() -> Prefetcher:
+    """Create the prefetcher and export its stats."""
+    prefetcher = Prefetcher(get_gcs_service(), get_ai_service)
+    metrics.register_gauge("prefetch", prefetcher.get_stats)
+    return prefetcher
+
+def get_prefetcher() -> Prefetcher:
+    """Get the background prefetcher shared by all sessions."""
+    return _get_or_create("prefetcher", _create_prefetcher)
+
+def _create_governor() -> GeminiGovernor:
+    """Create the Gemini governor and export its queue stats."""
+    governor = GeminiGovernor()
+    metrics.register_gauge("gemini_governor", governor.get_stats)
+    return governor
+
+def get_governor() -> GeminiGovernor:
+    """Get the admission controller shared by all Gemini calls of this process."""
+    return _get_or_create("governor", _create_governor)
+
+def get_ai_service():
+    """Get the AI service shared by all sessions."""
+    # Imported here so the login screen does not load the Gemini SDK
+    from services.ai_service import AIService
+
+    def create_ai_service() -> AIService:
+        service = AIService(chat_sessions=get_chat_sessions(), governor=get_governor())
+        metrics.register_gauge("response_cache", service.response_cache.get_stats)
+        metrics.register_gauge("context", service.context.get_stats)
+        metrics.register_gauge("ai_workers", service.turns.get_stats)
+        return service
+    return _get_or_create("ai_service", create_ai_service)
@@ -0,0 +1,104 @@
+"""
+Shared cache of AI replies to first-turn answer submissions.
+"""
+import dataclasses
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from models.tutor_reply import TutorReply
+from utils.persian_text import normalize_answer
+from config.settings import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL
+
+# Stands in for the student's name so one reply can be served to every student
+NAME_PLACEHOLDER = "\x00student\x00"
+
+class ResponseCache:
+    """Bounded TTL cache keyed by (sentence, normalized answer)."""
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        ttl_seconds: float = RESPONSE_CACHE_TTL,
+        enabled: bool = RESPONSE_CACHE_ENABLED
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, TutorReply]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, sentence: str, answer: str, student_name: str) -> Optional[TutorReply]:
+        """
+        Look up the reply to an answer.
+
+        Args:
+            sentence: The sentence being practiced
+            answer: The student's answer
+            student_name: Name to put into the reply
+
+        Returns:
+            Reply, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        key = (sentence, normalize_answer(answer))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or now - cached[0] >= self.ttl_seconds:
+                if cached is not None:
+                    del self._entries[key]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            response = cached[1]
+
+        return dataclasses.replace(response, text=response.text.replace(NAME_PLACEHOLDER, student_name))
+
+    @staticmethod
+    def _name_pattern(student_name: str) -> "re.Pattern[str]":
+        """Match the student's name as a whole word, so 'Ava' leaves 'Kavab' alone."""
+        return re.compile(rf"\b{re.escape(student_name)}\b")
+
+    def put(self, sentence: str, answer: str, student_name: str, response: TutorReply):
+        """
+        Store the reply to an answer.
+
+        Only replies that parsed as they arrived are stored; repaired or
+        retried ones could hand a truncated reply to every student.
+
+        Args:
+            sentence: The sentence being practiced
+            answer: The student's answer
+            student_name: Name used in the reply, replaced by a placeholder
+            response: Reply
+        """
+        if not self.enabled or response.outcome != "valid":
+            return
+        text = response.text
+        if student_name:
+            text = self._name_pattern(student_name).sub(NAME_PLACEHOLDER, text)
+        key = (sentence, normalize_answer(answer))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), dataclasses.replace(response, text=text))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get hit-rate counters.
+
+        Returns:
+            Dictionary with hits, misses, hit rate and entry count
+        """
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,244 @@
+"""
+Storage backends behind GCSService: a GCS bucket or a local directory.
+
+Both raise google.api_core's NotFound and NotModified, so callers handle
+them alike whichever backend is configured.
+"""
+import mmap
+from abc import ABC, abstractmethod
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from google.api_core.exceptions import NotFound, NotModified
+from config.settings import (
+    STORAGE_BACKEND,
+    LOCAL_STORAGE_ROOT,
+    GCS_BUCKET_NAME,
+    GCS_USER_PROJECT,
+    GCS_HTTP_POOL_SIZE,
+    CONTENT_CACHE_TTL
+)
+
+if TYPE_CHECKING:
+    from google.cloud import storage
+
+@dataclass
+class ObjectInfo:
+    """Name and generation of a stored object."""
+    name: str
+    generation: Optional[int]
+
+class StorageBackend(ABC):
+    """Interface of the object stores GCSService reads from and writes to."""
+
+    # Seconds cached content is trusted before it is revalidated
+    revalidate_after: float = CONTENT_CACHE_TTL
+
+    @abstractmethod
+    def read_text(self, path: str, if_generation_not_match: Optional[int] = None) -> Tuple[str, Optional[int]]:
+        """
+        Read an object's text.
+
+        Args:
+            path: Object path, e.g. sentences/<unit>.txt
+            if_generation_not_match: Raise NotModified if the object still has this generation
+
+        Returns:
+            Tuple of (content, generation)
+
+        Raises:
+            NotFound: If the object does not exist
+            NotModified: If the object has the given generation
+        """
+
+    @abstractmethod
+    def list_objects(self, prefix: str) -> List[ObjectInfo]:
+        """
+        List objects whose path starts with a prefix.
+
+        Args:
+            prefix: Path prefix, e.g. sentences/
+
+        Returns:
+            Objects in lexicographic order
+        """
+
+    @abstractmethod
+    def write_text(self, path: str, content: str, content_type: str = "text/plain"):
+        """
+        Create or replace an object.
+
+        Args:
+            path: Object path
+            content: Text to store
+            content_type: MIME type of the content
+        """
+
+    @abstractmethod
+    def exists(self, path: str) -> bool:
+        """Check if an object exists."""
+
+    @abstractmethod
+    def delete(self, path: str):
+        """Delete an object if it exists."""
+
+class GCSBackend(StorageBackend):
+    """Objects in a GCS bucket."""
+
+    def __init__(
+        self,
+        client: Optional["storage.Client"] = None,
+        bucket_name: str = GCS_BUCKET_NAME,
+        user_project: Optional[str] = GCS_USER_PROJECT
+    ):
+        self.bucket_name = bucket_name
+        self.user_project = user_project
+        self._client = client
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _create_client() -> "storage.Client":
+        """
+        Create a storage client backed by a pooled HTTP session.
+
+        The SDK is imported here, so screens that never touch GCS (like the
+        login screen) do not pay for loading it.
+
+        Returns:
+            Storage client whose connections are reused across threads
+        """
+        import google.auth
+        from google.auth.transport.requests import AuthorizedSession
+        from google.cloud import storage
+        from requests.adapters import HTTPAdapter
+
+        credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+        session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=GCS_HTTP_POOL_SIZE, pool_maxsize=GCS_HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        return storage.Client(project=project, credentials=credentials, _http=session)
+
+    def get_bucket(self):
+        """Get a handle to the bucket without fetching its metadata."""
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    client = self._client or self._create_client()
+                    self._bucket = client.bucket(self.bucket_name, user_project=self.user_project)
+        return self._bucket
+
+    def read_text(self, path: str, if_generation_not_match: Optional[int] = None) -> Tuple[str, Optional[int]]:
+        blob = self.get_bucket().blob(path)
+        content = blob.download_as_text(if_generation_not_match=if_generation_not_match)
+        return content, blob.generation
+
+    def list_objects(self, prefix: str) -> List[ObjectInfo]:
+        return [ObjectInfo(blob.name, blob.generation) for blob in self.get_bucket().list_blobs(prefix=prefix)]
+
+    def write_text(self, path: str, content: str, content_type: str = "text/plain"):
+        self.get_bucket().blob(path).upload_from_string(content, content_type=content_type)
+
+    def exists(self, path: str) -> bool:
+        return self.get_bucket().blob(path).exists()
+
+    def delete(self, path: str):
+        try:
+            self.get_bucket().blob(path).delete()
+        except NotFound:
+            pass
+
+class LocalBackend(StorageBackend):
+    """
+    Objects as files in a directory mirroring the bucket layout.
+
+    A file's generation is its modification time in nanoseconds, so checking
+    for changes costs one stat and unchanged files are never re-read. That
+    makes revalidation cheap enough to do on every read, and edits take
+    effect immediately.
+    """
+
+    revalidate_after = 0.0
+
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT):
+        self.root = os.path.realpath(root)
+
+    def _resolve(self, path: str) -> str:
+        """Map an object path to a file below the root."""
+        full_path = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, full_path]) != self.root:
+            raise NotFound(f"Path outside the storage root: {path}")
+        return full_path
+
+    def read_text(self, path: str, if_generation_not_match: Optional[int] = None) -> Tuple[str, Optional[int]]:
+        try:
+            f = open(self._resolve(path), "rb")
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            raise NotFound(f"No such file: {path}")
+        with f:
+            stat = os.fstat(f.fileno())
+            generation = stat.st_mtime_ns
+            if if_generation_not_match is not None and generation == if_generation_not_match:
+                raise NotModified(f"File {path} not modified")
+            if stat.st_size == 0:
+                return "", generation
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return str(mapped, "utf-8"), generation
+
+    def list_objects(self, prefix: str) -> List[ObjectInfo]:
+        # Only the directory holding the prefix needs to be walked
+        directory = self._resolve(os.path.dirname(prefix))
+        objects = []
+        for current, _, files in os.walk(directory):
+            for file_name in files:
+                full_path = os.path.join(current, file_name)
+                name = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                if not name.startswith(prefix):
+                    continue
+                try:
+                    objects.append(ObjectInfo(name, os.stat(full_path).st_mtime_ns))
+                except FileNotFoundError:
+                    continue  # deleted while listing
+        return sorted(objects, key=lambda info: info.name)
+
+    def write_text(self, path: str, content: str, content_type: str = "text/plain"):
+        full_path = self._resolve(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(full_path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def exists(self, path: str) -> bool:
+        try:
+            return os.path.isfile(self._resolve(path))
+        except NotFound:
+            return False
+
+    def delete(self, path: str):
+        try:
+            os.remove(self._resolve(path))
+        except (FileNotFoundError, NotFound):
+            pass
+
+def create_storage_backend(client: Optional["storage.Client"] = None, backend: str = STORAGE_BACKEND) -> StorageBackend:
+    """
+    Create the configured storage backend.
+
+    Args:
+        client: Storage client to use for the GCS backend (created if omitted)
+        backend: 'gcs' or 'local'
+
+    Returns:
+        Storage backend
+    """
+    if backend == "local":
+        return LocalBackend()
+    return GCSBackend(client)
@@ -0,0 +1,118 @@
+"""
+Cheap local classification of student messages, used to route each turn.
+
+Rules only look at the script, length and keywords of a message, so
+classifying costs microseconds and never calls the model.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from config.settings import TURN_ROUTES
+
+ANSWER_ATTEMPT = "answer_attempt"
+VOCABULARY_QUESTION = "vocabulary_question"
+GRAMMAR_QUESTION = "grammar_question"
+OFF_TOPIC = "off_topic"
+OTHER = "other"
+
+TURN_CLASSES = (ANSWER_ATTEMPT, VOCABULARY_QUESTION, GRAMMAR_QUESTION, OFF_TOPIC, OTHER)
+
+# Share of letters in Persian script above which a message is taken as a translation
+ANSWER_SCRIPT_SHARE = 0.5
+# Longer questions usually need more than a lookup
+MAX_VOCABULARY_QUESTION_LENGTH = 120
+
+_PERSIAN_LETTER = re.compile("[ؠ-يٱ-ۓۺ-ۿ]")
+_WORD = re.compile(r"\w+")
+
+def _keywords(*words: str) -> "re.Pattern[str]":
+    """Match any keyword at the start of a word, e.g. 'konjug' in 'Konjugation'."""
+    return re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + ")")
+
+_VOCABULARY = _keywords(
+    "heißt", "heisst", "bedeutet", "bedeutung", "wort", "wörter", "vokabel",
+    "wie sagt man", "was ist", "auf persisch", "auf farsi"
+)
+_GRAMMAR = _keywords(
+    "grammatik", "warum", "wieso", "weshalb", "verb", "endung", "ezafe", "plural",
+    "zeitform", "vergangenheit", "satzstellung", "reihenfolge", "präposition",
+    "konjug", "possessiv", "suffix", "präfix", "regel", "artikel"
+)
+_LESSON = _keywords("persisch", "farsi", "satz", "sätze", "übersetz", "lektion", "ava", "lernen")
+_OFF_TOPIC = _keywords(
+    "wetter", "fußball", "fussball", "witz", "rezept", "mathe", "programmier",
+    "politik", "bitcoin", "aktie", "film", "serie", "videospiel", "hausaufgaben in"
+)
+
+def persian_share(message: str) -> Tuple[int, float]:
+    """
+    Count the letters of a message and the share written in Persian script.
+
+    Args:
+        message: Student message
+
+    Returns:
+        Tuple of (letter count, share of Persian letters)
+    """
+    letters = sum(char.isalpha() for char in message)
+    if not letters:
+        return 0, 0.0
+    return letters, len(_PERSIAN_LETTER.findall(message)) / letters
+
+def classify_turn(message: str, sentence: str = "") -> str:
+    """
+    Classify a student message.
+
+    Messages mostly in Persian script are answer attempts. German messages
+    are grammar or vocabulary questions by their keywords. Only messages
+    that are neither, name an unrelated topic and do not refer to the
+    lesson are off-topic. Everything else is OTHER and keeps the default route.
+
+    Args:
+        message: Student message
+        sentence: Sentence being practiced, whose words count as lesson references
+
+    Returns:
+        One of TURN_CLASSES
+    """
+    letters, share = persian_share(message)
+    if letters and share >= ANSWER_SCRIPT_SHARE:
+        return ANSWER_ATTEMPT
+
+    lowered = message.casefold()
+    # Questions about a word are on topic even if the word names another topic
+    if _GRAMMAR.search(lowered):
+        return GRAMMAR_QUESTION
+    if _VOCABULARY.search(lowered) and len(message) <= MAX_VOCABULARY_QUESTION_LENGTH:
+        return VOCABULARY_QUESTION
+
+    sentence_words = {word for word in _WORD.findall(sentence.casefold()) if len(word) > 3}
+    about_lesson = (
+        share > 0
+        or _LESSON.search(lowered) is not None
+        or any(word in sentence_words for word in _WORD.findall(lowered))
+    )
+    if not about_lesson and _OFF_TOPIC.search(lowered):
+        return OFF_TOPIC
+    return OTHER
+
+@dataclass
+class TurnRoute:
+    """Model and thinking budget a kind of turn is sent with."""
+    turn_class: str
+    model: Optional[str] = None
+    thinking_budget: Optional[int] = None
+
+def get_route(turn_class: str, routes: Dict[str, Dict[str, Any]] = TURN_ROUTES) -> TurnRoute:
+    """
+    Look up the configured route of a kind of turn.
+
+    Args:
+        turn_class: One of TURN_CLASSES
+        routes: Route settings per kind of turn
+
+    Returns:
+        Route; unset fields keep the chat's defaults
+    """
+    settings = routes.get(turn_class) or {}
+    return TurnRoute(turn_class, settings.get("model"), settings.get("thinking_budget"))
@@ -0,0 +1,204 @@
+"""
+Bounded worker pool running AI calls with deadlines, retries and cancellation.
+"""
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Iterator
+from config.settings import (
+    AI_WORKER_POOL_SIZE,
+    AI_TURN_TIMEOUT,
+    AI_MAX_RETRIES,
+    AI_BACKOFF_BASE,
+    AI_BACKOFF_MAX
+)
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class TurnTimeoutError(Exception):
+    """Raised when an AI call does not finish before its deadline."""
+
+class TurnFailedError(Exception):
+    """Raised when an AI call fails with a non-retryable error or runs out of retries."""
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Check if an error is worth retrying.
+
+    Args:
+        error: Exception raised by the SDK
+
+    Returns:
+        True for rate limits, server errors and connection problems
+    """
+    # The SDK's transport; imported here as it is loaded with the SDK anyway
+    import httpx
+
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    # Dropped connections and read timeouts of httpx do not subclass the built-in errors
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+
+class TurnExecutor:
+    """Runs blocking and streaming AI calls off the script thread."""
+
+    def __init__(
+        self,
+        max_workers: int = AI_WORKER_POOL_SIZE,
+        timeout: float = AI_TURN_TIMEOUT,
+        max_retries: int = AI_MAX_RETRIES
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-turn")
+        self._lock = threading.Lock()
+        self._stats = {"active": 0, "calls": 0, "retries": 0, "timeouts": 0, "failures": 0, "cancelled": 0}
+
+    def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking call on the pool.
+
+        Args:
+            func: Callable performing the AI request
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The call's result
+
+        Raises:
+            TurnTimeoutError: If the deadline passes
+            TurnFailedError: If the call fails for good
+        """
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        self._count("calls")
+        while True:
+            future = self._executor.submit(self._tracked, func, *args, **kwargs)
+            try:
+                return future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                future.cancel()
+                self._count("timeouts")
+                raise TurnTimeoutError(f"AI call did not finish within {self.timeout:.0f}s")
+            except Exception as e:
+                attempt = self._backoff_or_raise(e, attempt, deadline)
+            except BaseException:
+                # The script was stopped or rerun while waiting
+                future.cancel()
+                self._count("cancelled")
+                raise
+
+    def stream(self, open_stream: Callable[[], Iterable[Any]]) -> Iterator[Any]:
+        """
+        Run a streaming call on the pool and yield its chunks.
+
+        The call is retried only while no chunk has been delivered yet. Closing
+        the returned generator (e.g. when Streamlit reruns the script) stops
+        the worker at the next chunk.
+
+        Args:
+            open_stream: Callable starting the streaming request
+
+        Yields:
+            Chunks of the stream
+
+        Raises:
+            TurnTimeoutError: If the deadline passes
+            TurnFailedError: If the call fails for good
+        """
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        delivered = False
+        self._count("calls")
+        while True:
+            chunks: "queue.Queue[tuple]" = queue.Queue()
+            cancel = threading.Event()
+            self._executor.submit(self._tracked, self._produce, open_stream, chunks, cancel)
+            try:
+                while True:
+                    try:
+                        kind, value = chunks.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        self._count("timeouts")
+                        raise TurnTimeoutError(f"AI call did not finish within {self.timeout:.0f}s")
+                    if kind == "chunk":
+                        delivered = True
+                        yield value
+                    elif kind == "done":
+                        return
+                    else:
+                        raise value
+            except TurnTimeoutError:
+                raise
+            except Exception as e:
+                if delivered:
+                    self._count("failures")
+                    raise TurnFailedError(str(e)) from e
+                attempt = self._backoff_or_raise(e, attempt, deadline)
+            except BaseException:
+                # Generator closed or script stopped while streaming
+                self._count("cancelled")
+                raise
+            finally:
+                cancel.set()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get pool occupancy and outcome counters.
+
+        Returns:
+            Dictionary with active workers, pool size and call outcomes
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_workers"] = self.max_workers
+        return stats
+
+    @staticmethod
+    def _produce(open_stream: Callable[[], Iterable[Any]], chunks: "queue.Queue[tuple]", cancel: threading.Event):
+        """Consume a stream on a worker thread and hand chunks to the consumer."""
+        try:
+            for chunk in open_stream():
+                if cancel.is_set():
+                    return
+                chunks.put(("chunk", chunk))
+            chunks.put(("done", None))
+        except Exception as e:
+            chunks.put(("error", e))
+
+    def _tracked(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a call while counting it as an occupied worker."""
+        with self._lock:
+            self._stats["active"] += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._stats["active"] -= 1
+
+    def _backoff_or_raise(self, error: Exception, attempt: int, deadline: float) -> int:
+        """Sleep with jittered exponential backoff before a retry, or give up."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            self._count("failures")
+            raise TurnFailedError(str(error)) from error
+        delay = random.uniform(0, min(AI_BACKOFF_MAX, AI_BACKOFF_BASE * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            self._count("timeouts")
+            raise TurnTimeoutError(f"AI call did not finish within {self.timeout:.0f}s") from error
+        logger.warning("Retrying AI call in %.2fs after: %s", delay, error)
+        self._count("retries")
+        time.sleep(delay)
+        return attempt + 1
+
+    def _count(self, event: str):
+        """Increment an outcome counter."""
+        with self._lock:
+            self._stats[event] += 1
@@ -0,0 +1,106 @@
+"""
+Compact index of all units, stored as one object next to the unit files.
+
+The manifest lists every unit in display order with its sentence count,
+content hash and blob generation, and optionally the sentences themselves.
+Loading it replaces listing the sentences/ prefix and downloading each unit.
+"""
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_VERSION = 1
+
+@dataclass(frozen=True)
+class UnitEntry:
+    """One unit of the manifest."""
+    name: str
+    path: str
+    order: int
+    sentence_count: int
+    sha256: str
+    generation: Optional[int]
+    sentences: Optional[Tuple[str, ...]] = None
+
+@dataclass(frozen=True)
+class UnitManifest:
+    """Parsed manifest with its units in display order."""
+    built_at: str
+    units: Tuple[UnitEntry, ...]
+
+    def get(self, path: str) -> Optional[UnitEntry]:
+        """Find a unit by its blob path."""
+        return next((unit for unit in self.units if unit.path == path), None)
+
+def content_hash(content: str) -> str:
+    """Hash a unit file's content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def compile_manifest(
+    units: Iterable[Tuple[str, str, str, Optional[int]]],
+    parse: Callable[[str], Iterable[str]],
+    include_sentences: bool = True,
+    order: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Build the manifest document of a set of units.
+
+    Args:
+        units: Tuples of (name, blob path, content, generation)
+        parse: Function turning a unit file's content into its sentences
+        include_sentences: Whether to store the sentences in the manifest
+        order: Unit names in display order; others follow by name
+
+    Returns:
+        JSON-serializable manifest
+    """
+    rank = {name: index for index, name in enumerate(order or [])}
+    ordered = sorted(units, key=lambda unit: (rank.get(unit[0], len(rank)), unit[0]))
+    entries = []
+    for index, (name, path, content, generation) in enumerate(ordered):
+        sentences = list(parse(content))
+        entry = {
+            "name": name,
+            "path": path,
+            "order": index,
+            "sentence_count": len(sentences),
+            "sha256": content_hash(content),
+            "generation": generation
+        }
+        if include_sentences:
+            entry["sentences"] = sentences
+        entries.append(entry)
+    return {
+        "version": MANIFEST_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "units": entries
+    }
+
+def parse_manifest(content: str) -> Optional[UnitManifest]:
+    """
+    Parse a manifest document.
+
+    Args:
+        content: Raw JSON content of the manifest
+
+    Returns:
+        UnitManifest, or None if it was written in an unsupported version
+    """
+    data = json.loads(content)
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    units = tuple(
+        UnitEntry(
+            name=entry["name"],
+            path=entry["path"],
+            order=entry.get("order", index),
+            sentence_count=entry.get("sentence_count", 0),
+            sha256=entry.get("sha256", ""),
+            generation=entry.get("generation"),
+            sentences=tuple(entry["sentences"]) if entry.get("sentences") is not None else None
+        )
+        for index, entry in enumerate(data.get("units", []))
+    )
+    return UnitManifest(data.get("built_at", ""), tuple(sorted(units, key=lambda unit: unit.order)))
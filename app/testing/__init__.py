@@ -0,0 +1,3 @@
+"""
+In-process fakes of external backends for offline runs and benchmarks.
+"""
@@ -0,0 +1,206 @@
+"""
+Offline stand-in for google.genai.Client.
+
+Only the parts of the SDK used by the app are implemented. Replies are JSON
+objects like the real model returns; call counts and simulated token usage
+are recorded for assertions and benchmarks.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PERSIAN_SCRIPT = re.compile(r"[؀-ۿ]")
+CHARS_PER_TOKEN = 4
+# Thought tokens reported for dynamic thinking; fixed budgets report up to their budget
+DYNAMIC_THOUGHT_TOKENS = 600
+
+def default_responder(message: str) -> Dict[str, Any]:
+    """
+    Build a plausible teacher reply.
+
+    Args:
+        message: Student message
+
+    Returns:
+        Reply payload; answers in Persian script count as correct
+    """
+    if PERSIAN_SCRIPT.search(message):
+        return {"text": "Sehr gut! Deine Übersetzung ist richtig.", "finished": True}
+    return {"text": "Gute Frage! Versuch doch, den Satz zu übersetzen.", "finished": False}
+
+@dataclass
+class FakeUsageMetadata:
+    """Token counts in the shape of the SDK's usage metadata."""
+    prompt_token_count: int = 0
+    cached_content_token_count: int = 0
+    candidates_token_count: int = 0
+    thoughts_token_count: int = 0
+    total_token_count: int = 0
+
+@dataclass
+class FakeResponse:
+    """A generated response or stream chunk."""
+    text: Optional[str]
+    usage_metadata: Optional[FakeUsageMetadata] = None
+
+@dataclass
+class FakePart:
+    text: Optional[str] = None
+
+@dataclass
+class FakeContent:
+    role: str
+    parts: List[FakePart] = field(default_factory=list)
+
+def _text_of(value: Any) -> str:
+    """Flatten SDK-like contents, parts or plain strings to text."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return "".join(_text_of(item) for item in value)
+    if getattr(value, "parts", None) is not None:
+        return _text_of(value.parts)
+    return getattr(value, "text", None) or ""
+
+def _split_turn(contents: Any) -> Tuple[str, str]:
+    """Split chat-style contents into the history text and the new message."""
+    if isinstance(contents, (list, tuple)):
+        return _text_of(contents[:-1]), _text_of(contents[-1:])
+    return "", _text_of(contents)
+
+class FakeGenaiClient:
+    """Drop-in replacement for genai.Client with configurable latency."""
+
+    def __init__(
+        self,
+        latency: Callable[[], float] = lambda: 0.0,
+        responder: Callable[[str], Dict[str, Any]] = default_responder,
+        chunk_size: int = 8
+    ):
+        self.latency = latency
+        self.responder = responder
+        self.chunk_size = chunk_size
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.chats = _FakeChats(self)
+        self.aio = _FakeAio(self)
+
+    def count(self, name: str):
+        """Count a call of an SDK method."""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def usage_for(self, config: Any, history_text: str, message: str, reply: str) -> FakeUsageMetadata:
+        """Estimate token usage the way the API would report it."""
+        system_text = _text_of(getattr(config, "system_instruction", None))
+        prompt_tokens = len(system_text + history_text + message) // CHARS_PER_TOKEN
+        output_tokens = len(reply) // CHARS_PER_TOKEN
+        thought_tokens = _thought_tokens(config)
+        return FakeUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            thoughts_token_count=thought_tokens,
+            total_token_count=prompt_tokens + output_tokens + thought_tokens
+        )
+
+class _FakeModels:
+    def __init__(self, client: FakeGenaiClient):
+        self._client = client
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        self._client.count("models.generate_content")
+        time.sleep(self._client.latency())
+        if getattr(config, "response_mime_type", None) == "application/json":
+            history, message = _split_turn(contents)
+            reply = json.dumps(self._client.responder(message), ensure_ascii=False)
+            return FakeResponse(reply, self._client.usage_for(config, history, message, reply))
+        message = _text_of(contents)
+        reply = "- Zusammenfassung: " + message[:200]
+        return FakeResponse(reply, self._client.usage_for(config, "", message, reply))
+
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[FakeResponse]:
+        self._client.count("models.generate_content_stream")
+        time.sleep(self._client.latency())
+        history, message = _split_turn(contents)
+        reply = json.dumps(self._client.responder(message), ensure_ascii=False)
+        yield from _chunked(reply, self._client.chunk_size, self._client.usage_for(config, history, message, reply))
+
+class _FakeAsyncModels:
+    def __init__(self, client: FakeGenaiClient):
+        self._client = client
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        self._client.count("aio.models.generate_content")
+        await asyncio.sleep(self._client.latency())
+        message = _text_of(contents)
+        reply = json.dumps(self._client.responder(message), ensure_ascii=False)
+        return FakeResponse(reply, self._client.usage_for(config, "", message, reply))
+
+class _FakeAio:
+    def __init__(self, client: FakeGenaiClient):
+        self.models = _FakeAsyncModels(client)
+
+class _FakeChats:
+    def __init__(self, client: FakeGenaiClient):
+        self._client = client
+
+    def create(self, model: str, config: Any = None, history: Optional[List[Any]] = None) -> "FakeChat":
+        self._client.count("chats.create")
+        return FakeChat(self._client, model, config, list(history or []))
+
+class FakeChat:
+    """Chat session that records history like the SDK chat."""
+
+    def __init__(self, client: FakeGenaiClient, model: str, config: Any, history: List[Any]):
+        self._client = client
+        self.model = model
+        self.config = config
+        self._history = history
+
+    def get_history(self, curated: bool = False) -> List[Any]:
+        return list(self._history)
+
+    def send_message(self, message: str, config: Any = None) -> FakeResponse:
+        self._client.count("chat.send_message")
+        time.sleep(self._client.latency())
+        reply = json.dumps(self._client.responder(message), ensure_ascii=False)
+        usage = self._client.usage_for(config or self.config, _text_of(self._history), message, reply)
+        self._record(message, reply)
+        return FakeResponse(reply, usage)
+
+    def send_message_stream(self, message: str, config: Any = None) -> Iterator[FakeResponse]:
+        self._client.count("chat.send_message_stream")
+        time.sleep(self._client.latency())
+        reply = json.dumps(self._client.responder(message), ensure_ascii=False)
+        usage = self._client.usage_for(config or self.config, _text_of(self._history), message, reply)
+        yield from _chunked(reply, self._client.chunk_size, usage)
+        self._record(message, reply)
+
+    def record_history(self, user_input: Any, model_output: List[Any], is_valid: bool):
+        self._history.append(user_input)
+        self._history.extend(model_output)
+
+    def _record(self, message: str, reply: str):
+        self._history.append(FakeContent("user", [FakePart(message)]))
+        self._history.append(FakeContent("model", [FakePart(reply)]))
+
+def _chunked(reply: str, size: int, usage: FakeUsageMetadata) -> Iterator[FakeResponse]:
+    """Split a reply into stream chunks, the last one carrying the usage."""
+    for start in range(0, len(reply), size):
+        last = start + size >= len(reply)
+        yield FakeResponse(reply[start:start + size], usage if last else None)
+
+def _thought_tokens(config: Any) -> int:
+    """Simulate the thought tokens of a config's thinking budget."""
+    thinking_config = getattr(config, "thinking_config", None)
+    budget = getattr(thinking_config, "thinking_budget", None)
+    if budget is None or budget < 0:
+        return DYNAMIC_THOUGHT_TOKENS
+    return min(budget, DYNAMIC_THOUGHT_TOKENS)
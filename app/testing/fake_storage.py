@@ -0,0 +1,109 @@
+"""
+Offline stand-in for google.cloud.storage.Client.
+
+Objects live in memory and carry generations like real GCS objects, so
+conditional downloads behave as in production. Every backend call is
+counted and can be given a simulated latency.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from google.api_core.exceptions import NotFound, NotModified
+
+class FakeStorageClient:
+    """Drop-in replacement for storage.Client with configurable latency."""
+
+    def __init__(self, objects: Optional[Dict[str, str]] = None, latency: Callable[[], float] = lambda: 0.0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._objects: Dict[str, Tuple[str, int]] = {}
+        self._generation = 0
+        for name, content in (objects or {}).items():
+            self.put(name, content)
+
+    def count(self, name: str):
+        """Count a call of a storage method and wait for the simulated latency."""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        delay = self.latency()
+        if delay:
+            time.sleep(delay)
+
+    def put(self, name: str, content: str) -> int:
+        """
+        Store an object, giving it a new generation.
+
+        Args:
+            name: Object name
+            content: Text content
+
+        Returns:
+            Generation of the stored object
+        """
+        with self._lock:
+            self._generation += 1
+            self._objects[name] = (content, self._generation)
+            return self._generation
+
+    def get(self, name: str) -> Optional[Tuple[str, int]]:
+        """Get an object's content and generation, or None if it does not exist."""
+        with self._lock:
+            return self._objects.get(name)
+
+    def delete(self, name: str):
+        """Delete an object."""
+        with self._lock:
+            self._objects.pop(name, None)
+
+    def names(self, prefix: str = "") -> list:
+        """List object names with a prefix in lexicographic order."""
+        with self._lock:
+            return sorted(name for name in self._objects if name.startswith(prefix))
+
+    def bucket(self, bucket_name: str, user_project: Optional[str] = None) -> "FakeBucket":
+        return FakeBucket(self, bucket_name)
+
+class FakeBucket:
+    def __init__(self, client: FakeStorageClient, name: str):
+        self.client = client
+        self.name = name
+
+    def blob(self, blob_name: str) -> "FakeBlob":
+        return FakeBlob(self.client, blob_name)
+
+    def list_blobs(self, prefix: str = "") -> Iterator["FakeBlob"]:
+        self.client.count("bucket.list_blobs")
+        for name in self.client.names(prefix):
+            stored = self.client.get(name)
+            if stored is not None:
+                yield FakeBlob(self.client, name, generation=stored[1])
+
+class FakeBlob:
+    def __init__(self, client: FakeStorageClient, name: str, generation: Optional[int] = None):
+        self.client = client
+        self.name = name
+        self.generation = generation
+
+    def download_as_text(self, if_generation_not_match: Optional[int] = None) -> str:
+        self.client.count("blob.download_as_text")
+        stored = self.client.get(self.name)
+        if stored is None:
+            raise NotFound(f"No such object: {self.name}")
+        content, generation = stored
+        if if_generation_not_match is not None and generation == if_generation_not_match:
+            raise NotModified(f"Object {self.name} not modified")
+        self.generation = generation
+        return content
+
+    def upload_from_string(self, data: str, content_type: str = "text/plain"):
+        self.client.count("blob.upload_from_string")
+        self.generation = self.client.put(self.name, data)
+
+    def exists(self) -> bool:
+        self.client.count("blob.exists")
+        return self.client.get(self.name) is not None
+
+    def delete(self):
+        self.client.count("blob.delete")
+        self.client.delete(self.name)
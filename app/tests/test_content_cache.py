@@ -0,0 +1,85 @@
+"""
+Tests of the content cache: size accounting and per-key locks.
+"""
+import threading
+import time
+from services.content_cache import ContentCache, estimate_size
+from services.unit_manifest import UnitEntry, UnitManifest
+
+def make_manifest(units: int, sentences: int) -> UnitManifest:
+    """Build a manifest whose units carry their sentences."""
+    return UnitManifest("2026-01-01T00:00:00Z", tuple(
+        UnitEntry(
+            name=f"Unit {index}",
+            path=f"sentences/unit{index}.txt",
+            order=index,
+            sentence_count=sentences,
+            sha256="0" * 64,
+            generation=index,
+            sentences=tuple(f"Satz {index}.{number}: " + "x" * 100 for number in range(sentences))
+        )
+        for index in range(units)
+    ))
+
+def test_size_includes_nested_strings():
+    text = "x" * 10_000
+
+    assert estimate_size({"pack": [{"translation": text}]}) > len(text)
+    assert estimate_size(make_manifest(10, 20)) > 10 * 20 * 100
+
+def test_shared_and_cyclic_references_are_counted_once():
+    text = "x" * 10_000
+    cyclic = {"text": text}
+    cyclic["self"] = cyclic
+
+    assert estimate_size([text, text]) < 2 * len(text)
+    assert estimate_size(cyclic) < 2 * len(text)
+
+def test_byte_limit_bounds_cached_manifests():
+    manifest = make_manifest(10, 20)
+    cache = ContentCache(max_bytes=int(estimate_size(manifest) * 1.5))
+    cache.put("first", manifest, 1)
+    cache.put("second", make_manifest(10, 20), 1)
+
+    assert cache.get("first") is None
+    assert cache.get("second") is not None
+
+def test_evicting_a_key_keeps_its_reload_single_flight():
+    cache = ContentCache(max_entries=1)
+    cache.put("a", "old", 1)
+    loading = threading.Event()
+    finish = threading.Event()
+    active = []
+    overlaps = []
+
+    def reload():
+        with cache.key_lock("a"):
+            overlaps.append(len(active))
+            active.append(1)
+            loading.set()
+            finish.wait(5)
+            active.pop()
+
+    first = threading.Thread(target=reload)
+    first.start()
+    assert loading.wait(5)
+    # Evicts "a" while its reload holds the key lock
+    cache.put("b", "other", 1)
+    second = threading.Thread(target=reload)
+    second.start()
+    time.sleep(0.05)
+    finish.set()
+    first.join(5)
+    second.join(5)
+
+    assert overlaps == [0, 0]
+
+def test_key_locks_are_dropped_once_unused():
+    cache = ContentCache(max_entries=1)
+    with cache.key_lock("a"):
+        cache.put("a", "value", 1)
+    cache.put("b", "other", 1)
+    with cache.key_lock("missing"):
+        pass
+
+    assert cache._key_locks == {}
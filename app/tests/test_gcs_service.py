@@ -0,0 +1,42 @@
+"""
+Tests of loading sentence packs.
+"""
+import json
+import logging
+import pytest
+from services.gcs_service import GCSService
+from testing.fake_storage import FakeStorageClient
+
+def make_service(pack_content=None) -> GCSService:
+    """Build a service whose bucket holds the pack of unit 'U', if given."""
+    service = GCSService(client=FakeStorageClient())
+    if pack_content is not None:
+        service.backend.write_text(service.get_pack_path("U"), pack_content)
+    return service
+
+def test_pack_entries_are_loaded():
+    entries = {"Das Buch.": {"translation": "کتاب"}}
+
+    assert make_service(json.dumps({"entries": entries})).load_sentence_pack("U") == entries
+
+def test_missing_pack_is_no_pack(caplog):
+    with caplog.at_level(logging.WARNING):
+        assert make_service().load_sentence_pack("U") is None
+    assert not caplog.records
+
+@pytest.mark.parametrize("content", ['{"entries": {"Das Buch.": ', '["not", "a", "pack"]', '{"entries": []}'])
+def test_malformed_pack_is_logged(caplog, content):
+    with caplog.at_level(logging.WARNING):
+        assert make_service(content).load_sentence_pack("U") is None
+    assert "malformed" in caplog.text
+
+def test_storage_errors_are_logged(caplog, monkeypatch):
+    service = make_service()
+
+    def fail(*args, **kwargs):
+        raise PermissionError("forbidden")
+
+    monkeypatch.setattr(service.backend, "read_text", fail)
+    with caplog.at_level(logging.WARNING):
+        assert service.load_sentence_pack("U") is None
+    assert "Could not load the sentence pack" in caplog.text
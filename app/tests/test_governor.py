@@ -0,0 +1,112 @@
+"""
+Tests of the Gemini admission controller.
+"""
+import threading
+import time
+from typing import List
+import pytest
+import services.governor as governor_module
+from services.governor import GeminiGovernor, GovernorBusyError, QuotaExceededError
+from testing.fake_genai import FakeUsageMetadata
+
+DAY = 24 * 3600
+
+def make_governor(**overrides) -> GeminiGovernor:
+    """Build a governor without rate limits, so only the tested limit applies."""
+    settings = {
+        "max_concurrent": 1,
+        "requests_per_minute": 0,
+        "tokens_per_minute": 0,
+        "daily_user_tokens": 0,
+        "max_queue": 10,
+        "max_wait": 5
+    }
+    settings.update(overrides)
+    return GeminiGovernor(**settings)
+
+def wait_until_queued(governor: GeminiGovernor, count: int):
+    """Wait until the given number of calls is waiting for admission."""
+    deadline = time.monotonic() + 5
+    while governor.get_stats()["queued"] < count:
+        assert time.monotonic() < deadline, "call was never queued"
+        time.sleep(0.001)
+
+def queue_call(governor: GeminiGovernor, user_id: str, admitted: List[str]) -> threading.Thread:
+    """Start a call that records its user once admitted and then finishes."""
+    def call():
+        with governor.admit(user_id):
+            admitted.append(user_id)
+    queued = governor.get_stats()["queued"]
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    wait_until_queued(governor, queued + 1)
+    return thread
+
+def test_waiting_calls_are_admitted_round_robin_across_users():
+    governor = make_governor()
+    admitted: List[str] = []
+    running = governor.admit("busy")
+    threads = [queue_call(governor, user_id, admitted) for user_id in ("a", "a", "a", "b", "c")]
+
+    running.release()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert admitted == ["a", "b", "c", "a", "a"]
+    assert governor.get_stats()["admitted"] == 6
+
+def test_call_is_turned_away_when_the_queue_is_full():
+    governor = make_governor(max_queue=1)
+    admitted: List[str] = []
+    running = governor.admit("a")
+    waiting = queue_call(governor, "b", admitted)
+
+    with pytest.raises(GovernorBusyError):
+        governor.admit("c")
+
+    running.release()
+    waiting.join(timeout=5)
+    assert admitted == ["b"]
+    assert governor.get_stats()["busy"] == 1
+
+def test_call_is_turned_away_after_the_wait_limit():
+    governor = make_governor(max_wait=0.05)
+    running = governor.admit("a")
+
+    with pytest.raises(GovernorBusyError):
+        governor.admit("b")
+
+    running.release()
+    assert governor.get_stats()["queued"] == 0
+
+def test_user_over_the_daily_quota_is_refused():
+    governor = make_governor(daily_user_tokens=1000)
+    with governor.admit("a", estimated_tokens=100) as admission:
+        admission.usage_metadata = FakeUsageMetadata(total_token_count=1500)
+
+    assert governor.usage_today("a") == 1500
+    with pytest.raises(QuotaExceededError):
+        governor.admit("a")
+    # Other users keep their own quota
+    governor.admit("b").release()
+    assert governor.get_stats()["over_quota"] == 1
+
+def test_estimate_is_charged_without_usage_metadata():
+    governor = make_governor(daily_user_tokens=1000)
+    governor.admit("a", estimated_tokens=400).release()
+
+    assert governor.usage_today("a") == 400
+
+def test_quota_resets_at_the_utc_day_boundary(monkeypatch):
+    gmtime = time.gmtime
+    now = [100 * DAY - 1]
+    monkeypatch.setattr(governor_module.time, "gmtime", lambda *args: gmtime(now[0]))
+    governor = make_governor(daily_user_tokens=1000)
+    with governor.admit("a") as admission:
+        admission.usage_metadata = FakeUsageMetadata(total_token_count=1000)
+    with pytest.raises(QuotaExceededError):
+        governor.admit("a")
+
+    now[0] += 1
+    assert governor.usage_today("a") == 0
+    governor.admit("a").release()
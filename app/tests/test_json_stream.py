@@ -0,0 +1,104 @@
+"""
+Tests of streamed reply parsing and the repair of damaged replies.
+"""
+import json
+from typing import Iterable, List
+import pytest
+from models.tutor_reply import TutorReply, parse_reply
+from services.ai_service import StreamedReply
+from testing.fake_genai import FakeResponse
+from utils.json_stream import JsonFieldStreamParser, repair_json
+
+def stream(chunks: Iterable[str], field: str = "text") -> List[str]:
+    """Feed chunks to a parser and collect the deltas it returns."""
+    parser = JsonFieldStreamParser(field)
+    return [parser.feed(chunk) for chunk in chunks]
+
+def split(document: str, size: int) -> List[str]:
+    """Cut a document into chunks of a fixed size."""
+    return [document[start:start + size] for start in range(0, len(document), size)]
+
+@pytest.mark.parametrize("raw", [
+    '```json\n{"text": "ok", "finished": true}\n```',
+    '```\n{"text": "ok", "finished": true}```',
+    'Here you go: {"text": "ok", "finished": true} Bye!'
+])
+def test_repair_strips_fences_and_surrounding_text(raw):
+    assert repair_json(raw) == {"text": "ok", "finished": True}
+
+@pytest.mark.parametrize("raw, expected", [
+    ('{"text": "Gut gem', {"text": "Gut gem"}),
+    ('```json\n{"text": "ok", "fin', {"text": "ok", "fin": None}),
+    ('{"text": "ok", "finished":', {"text": "ok", "finished": None}),
+    ('{"text": "ok",', {"text": "ok"}),
+    ('{"text": "Sal\\u0', {"text": "Sal"}),
+    ('{"text": "a\\', {"text": "a"}),
+    ('{"items": [1, {"b": "x', {"items": [1, {"b": "x"}]})
+])
+def test_repair_closes_truncated_documents(raw, expected):
+    assert repair_json(raw) == expected
+
+@pytest.mark.parametrize("raw", ['', 'no json here', '{"text": "ok", "finished": tr'])
+def test_repair_gives_up_on_unusable_text(raw):
+    with pytest.raises(json.JSONDecodeError):
+        repair_json(raw)
+
+def test_parse_reply_accepts_valid_json_without_repair():
+    assert parse_reply('{"text": "ok", "finished": true}') == (TutorReply("ok", True), False)
+
+def test_parse_reply_reports_repaired_replies():
+    assert parse_reply('```json\n{"text": "ok", "finished": "true"}\n```') == (TutorReply("ok", True), True)
+
+def test_parse_reply_rejects_a_cut_off_flag():
+    assert parse_reply('{"text": "ok", "finished": tr') == (None, False)
+
+def test_parse_reply_rejects_replies_without_text():
+    assert parse_reply('{"finished": true}') == (None, False)
+    assert parse_reply(None) == (None, False)
+
+def test_parse_reply_rejects_a_reply_beyond_repair_even_with_text():
+    assert parse_reply('{"text": "ok", "finished": true, "x": tr') == (None, False)
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_stream_parser_is_independent_of_chunk_boundaries(size):
+    text = 'Sehr gut, "Mina"!\nسلام \\ ä \U0001F600'
+    document = json.dumps({"finished": False, "text": text, "note": "not streamed"})
+
+    parser = JsonFieldStreamParser("text")
+    streamed = "".join(parser.feed(chunk) for chunk in split(document, size))
+
+    assert streamed == text
+    assert parser.result()["text"] == text
+    assert parser.get_raw() == document
+
+def test_stream_parser_joins_surrogate_pairs_split_across_chunks():
+    deltas = stream(['{"text": "a\\ud8', '3d\\u', 'de0', '0b"}'])
+
+    assert "".join(deltas) == "a\U0001F600b"
+    assert deltas[1] == ""
+
+def test_stream_parser_ignores_nested_fields_and_other_strings():
+    document = '{"meta": {"text": "inner"}, "label": "text", "text": "outer"}'
+
+    assert "".join(stream(split(document, 4))) == "outer"
+
+def test_stream_parser_skips_escaped_quotes_in_other_strings():
+    assert "".join(stream(['{"a\\"b": "x\\"", "text": "ok"}'])) == "ok"
+
+def test_stream_parser_yields_text_of_a_truncated_reply():
+    parser = JsonFieldStreamParser("text")
+    streamed = "".join(parser.feed(chunk) for chunk in ['{"text": "Gut', ' gem'])
+
+    assert streamed == "Gut gem"
+    with pytest.raises(json.JSONDecodeError):
+        parser.result()
+    assert parse_reply(parser.get_raw()) == (TutorReply("Gut gem"), True)
+
+def test_streamed_reply_beyond_repair_is_retried():
+    chunks = [FakeResponse('{"text": "Gut'), FakeResponse(' gem", "finished": tr')]
+    retried = TutorReply("Gut gemacht!", True)
+    reply = StreamedReply(iter(chunks), retry=lambda: retried)
+
+    assert "".join(reply) == "Gut gem\n\nGut gemacht!"
+    assert reply.response == retried
+    assert reply.outcome == "retried"
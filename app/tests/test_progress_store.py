@@ -0,0 +1,64 @@
+"""
+Tests of the progress log and its compaction.
+"""
+import time
+import pytest
+from services.gcs_service import GCSService
+from services.progress_store import GCSProgressStore, ProgressStore, WriteBehindWriter, make_record
+from config.settings import PROGRESS_COMPACT_THRESHOLD
+from testing.fake_storage import FakeStorageClient
+
+def make_store(parts: int):
+    """Build a GCS progress store whose log of unit 'U' has the given number of objects."""
+    client = FakeStorageClient()
+    store = GCSProgressStore(GCSService(client=client))
+    for index in range(parts):
+        store.append("user", [make_record("message", "U", "s", role="user", text=str(index))])
+    return client, store, store._unit_prefix("user", "U")
+
+def texts(records):
+    """Get the message texts of records."""
+    return [record["text"] for record in records]
+
+def test_backend_without_its_methods_cannot_be_created():
+    class Incomplete(ProgressStore):
+        def append(self, user_id, records):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_load_does_not_write():
+    parts = PROGRESS_COMPACT_THRESHOLD + 2
+    client, store, prefix = make_store(parts)
+
+    assert texts(store.load("user", "U")) == [str(index) for index in range(parts)]
+    assert len(client.names(prefix)) == parts
+
+def test_writer_compacts_a_loaded_log_in_the_background():
+    parts = PROGRESS_COMPACT_THRESHOLD + 2
+    client, store, prefix = make_store(parts)
+    writer = WriteBehindWriter(store, flush_interval=60)
+
+    assert len(writer.load("user", "U")) == parts
+    deadline = time.monotonic() + 5
+    while len(client.names(prefix)) != 1:
+        assert time.monotonic() < deadline, "log was not compacted"
+        time.sleep(0.01)
+    assert texts(store.load("user", "U")) == [str(index) for index in range(parts)]
+
+def test_small_logs_are_not_compacted():
+    client, store, prefix = make_store(2)
+    store.compact("user", "U")
+
+    assert len(client.names(prefix)) == 2
+
+def test_records_of_concurrent_compactions_are_returned_once():
+    parts = PROGRESS_COMPACT_THRESHOLD + 2
+    client, store, prefix = make_store(parts)
+    names, records = store._read_prefix(prefix)
+    store._compact(prefix, names, records)
+    store._compact(prefix, names, records)
+
+    assert len(client.names(prefix)) == 2
+    assert texts(store.load("user", "U")) == [str(index) for index in range(parts)]
@@ -0,0 +1,22 @@
+"""
+Tests of the storage backend interface.
+"""
+import pytest
+from services.storage_backend import GCSBackend, LocalBackend, StorageBackend
+from config.settings import CONTENT_CACHE_TTL
+
+def test_backend_without_all_methods_cannot_be_created():
+    class ReadOnly(StorageBackend):
+        def read_text(self, path, if_generation_not_match=None):
+            return "", None
+
+    with pytest.raises(TypeError):
+        ReadOnly()
+
+@pytest.mark.parametrize("backend", [GCSBackend, LocalBackend])
+def test_backends_implement_the_interface(backend):
+    assert not backend.__abstractmethods__
+    assert backend.revalidate_after >= 0
+
+def test_revalidation_interval_defaults_to_the_cache_ttl():
+    assert StorageBackend.revalidate_after == CONTENT_CACHE_TTL
@@ -0,0 +1,58 @@
+"""
+Tests of retries in the AI worker pool.
+"""
+import httpx
+import pytest
+from services import turn_executor
+from services.turn_executor import TurnExecutor, TurnFailedError, is_retryable
+
+class StatusError(Exception):
+    """An SDK error carrying an HTTP status code."""
+
+    def __init__(self, code: int):
+        super().__init__(f"status {code}")
+        self.code = code
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("connection refused"),
+    httpx.ReadError("connection reset"),
+    httpx.ReadTimeout("read timed out"),
+    httpx.RemoteProtocolError("server disconnected"),
+    ConnectionResetError(),
+    TimeoutError(),
+    StatusError(429),
+    StatusError(503)
+])
+def test_transient_errors_are_retryable(error):
+    assert is_retryable(error)
+
+@pytest.mark.parametrize("error", [StatusError(400), StatusError(403), ValueError("bad request")])
+def test_client_errors_are_not_retryable(error):
+    assert not is_retryable(error)
+
+def test_dropped_connection_is_retried(monkeypatch):
+    monkeypatch.setattr(turn_executor, "AI_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(turn_executor, "AI_BACKOFF_MAX", 0.001)
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise httpx.ReadError("connection reset")
+        return "ok"
+
+    executor = TurnExecutor(max_workers=1, timeout=5, max_retries=2)
+    assert executor.run(call) == "ok"
+    assert executor.get_stats()["retries"] == 2
+
+def test_non_retryable_error_fails_at_once():
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise StatusError(400)
+
+    executor = TurnExecutor(max_workers=1, timeout=5, max_retries=2)
+    with pytest.raises(TurnFailedError):
+        executor.run(call)
+    assert len(calls) == 1
@@ -0,0 +1,228 @@
+"""
+Precompute reference translations for every unit and store them as sentence packs.
+
+For each sentences/<unit>.txt a compact sentences/<unit>.pack.json is written with
+the Persian translation, transliteration and key vocabulary of every sentence.
+Finished sentences are checkpointed locally, so an interrupted run resumes
+where it stopped.
+
+Usage (from the app directory):
+    GEMINI_API_KEY="<your key>" python -m tools.build_sentence_packs [--units A B] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List
+from google import genai
+from google.genai import types
+from services.gcs_service import GCSService
+from config.prompts import get_pack_prompt
+from config.settings import (
+    PACK_BUILDER_MODEL,
+    PACK_BUILDER_CONCURRENCY,
+    PACK_BUILDER_RETRIES,
+    PACK_CHECKPOINT_DIR,
+    get_gemini_api_key,
+    validate_environment
+)
+
+PACK_VERSION = 1
+
+REFERENCE_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "translation": types.Schema(type=types.Type.STRING),
+        "transliteration": types.Schema(type=types.Type.STRING),
+        "vocabulary": types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "persian": types.Schema(type=types.Type.STRING),
+                    "transliteration": types.Schema(type=types.Type.STRING),
+                    "german": types.Schema(type=types.Type.STRING)
+                },
+                required=["persian", "transliteration", "german"]
+            )
+        )
+    },
+    required=["translation", "transliteration", "vocabulary"]
+)
+
+class Checkpoint:
+    """Append-only local record of the finished sentences of one unit."""
+
+    def __init__(self, directory: str, unit: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, unit.replace(os.sep, "_") + ".jsonl")
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Load the entries finished by earlier runs.
+
+        Returns:
+            Mapping of sentence to reference entry
+        """
+        entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # last line of an interrupted run
+                    entries[record["sentence"]] = record["entry"]
+        return entries
+
+    def append(self, sentence: str, entry: Dict[str, Any]):
+        """
+        Record a finished sentence.
+
+        Args:
+            sentence: The sentence
+            entry: Its reference entry
+        """
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"sentence": sentence, "entry": entry}, ensure_ascii=False) + "\n")
+
+    def remove(self):
+        """Delete the checkpoint once the pack is written."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+async def generate_entry(client: genai.Client, model: str, sentence: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """
+    Generate the reference entry of one sentence, retrying with backoff.
+
+    Args:
+        client: Gemini client
+        model: Model name
+        sentence: The sentence
+        semaphore: Bounds the number of concurrent requests
+
+    Returns:
+        Reference entry with translation, transliteration and vocabulary
+    """
+    config = types.GenerateContentConfig(
+        temperature=0.2,
+        response_mime_type="application/json",
+        response_schema=REFERENCE_SCHEMA
+    )
+    for attempt in range(PACK_BUILDER_RETRIES):
+        try:
+            async with semaphore:
+                response = await client.aio.models.generate_content(
+                    model=model,
+                    contents=get_pack_prompt(sentence),
+                    config=config
+                )
+            return json.loads(response.text)
+        except Exception:
+            if attempt == PACK_BUILDER_RETRIES - 1:
+                raise
+            await asyncio.sleep(2 ** attempt)
+
+async def build_unit(
+    client: genai.Client,
+    gcs_service: GCSService,
+    unit: str,
+    semaphore: asyncio.Semaphore,
+    model: str,
+    checkpoint_dir: str
+) -> bool:
+    """
+    Build and upload the sentence pack of one unit.
+
+    Args:
+        client: Gemini client
+        gcs_service: Storage service
+        unit: Unit name
+        semaphore: Bounds the number of concurrent requests
+        model: Model name
+        checkpoint_dir: Directory for resume checkpoints
+
+    Returns:
+        True if the pack was written, False if sentences failed
+    """
+    sentences = gcs_service.load_sentences_for_unit(unit)
+    if not sentences:
+        print(f"{unit}: no sentences, skipped")
+        return False
+
+    checkpoint = Checkpoint(checkpoint_dir, unit)
+    entries = checkpoint.load()
+    todo = [sentence for sentence in dict.fromkeys(sentences) if sentence not in entries]
+    failures: List[str] = []
+
+    async def run(sentence: str):
+        try:
+            entry = await generate_entry(client, model, sentence, semaphore)
+        except Exception as e:
+            failures.append(sentence)
+            print(f"{unit}: failed on '{sentence}': {e}")
+            return
+        entries[sentence] = entry
+        checkpoint.append(sentence, entry)
+
+    print(f"{unit}: {len(entries)} sentences from checkpoint, {len(todo)} to generate")
+    await asyncio.gather(*(run(sentence) for sentence in todo))
+    if failures:
+        print(f"{unit}: {len(failures)} sentences failed, pack not written (rerun to resume)")
+        return False
+
+    pack = {
+        "version": PACK_VERSION,
+        "unit": unit,
+        "model": model,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "entries": {sentence: entries[sentence] for sentence in dict.fromkeys(sentences)}
+    }
+    gcs_service.upload_text(
+        gcs_service.get_pack_path(unit),
+        json.dumps(pack, ensure_ascii=False, separators=(",", ":")),
+        content_type="application/json"
+    )
+    checkpoint.remove()
+    print(f"{unit}: pack written with {len(pack['entries'])} sentences")
+    return True
+
+async def build_packs(units: List[str], concurrency: int, model: str, checkpoint_dir: str) -> bool:
+    """
+    Build the packs of several units concurrently.
+
+    Args:
+        units: Unit names (all units if empty)
+        concurrency: Maximum number of concurrent Gemini requests
+        model: Model name
+        checkpoint_dir: Directory for resume checkpoints
+
+    Returns:
+        True if all packs were written
+    """
+    validate_environment()
+    client = genai.Client(api_key=get_gemini_api_key())
+    gcs_service = GCSService()
+    units = units or gcs_service.list_unit_files()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(
+        build_unit(client, gcs_service, unit, semaphore, model, checkpoint_dir) for unit in units
+    ))
+    return all(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute reference translations as sentence packs.")
+    parser.add_argument("--units", nargs="*", default=[], help="Units to build (default: all)")
+    parser.add_argument("--concurrency", type=int, default=PACK_BUILDER_CONCURRENCY)
+    parser.add_argument("--model", default=PACK_BUILDER_MODEL)
+    parser.add_argument("--checkpoint-dir", default=PACK_CHECKPOINT_DIR)
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    ok = asyncio.run(build_packs(args.units, args.concurrency, args.model, args.checkpoint_dir))
+    print(f"Finished in {time.perf_counter() - started_at:.1f}s")
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
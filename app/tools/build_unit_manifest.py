@@ -0,0 +1,105 @@
+"""
+Compile all units into one manifest object that the app loads instead of listing them.
+
+For every sentences/<unit>.txt the manifest records the display order, sentence
+count, content hash and generation, and by default the sentences themselves.
+Rebuild it whenever units are added, changed or removed. Until then the app
+notices changed or deleted units and falls back to listing.
+
+Usage (from the app directory):
+    python -m tools.build_unit_manifest [--order order.txt] [--no-sentences] [--dry-run]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from services.gcs_service import GCSService, parse_lines, unit_name
+from services.unit_manifest import compile_manifest
+from config.settings import SENTENCES_PREFIX, GCS_HTTP_POOL_SIZE, UNIT_MANIFEST_INCLUDE_SENTENCES
+
+def collect_units(
+    gcs_service: GCSService,
+    sentences_prefix: str = SENTENCES_PREFIX,
+    workers: int = GCS_HTTP_POOL_SIZE
+) -> List[Tuple[str, str, str, Optional[int]]]:
+    """
+    Download every unit file below a prefix.
+
+    Args:
+        gcs_service: Storage service
+        sentences_prefix: Prefix path of the unit files
+        workers: Number of concurrent downloads
+
+    Returns:
+        Tuples of (name, blob path, content, generation)
+    """
+    paths = {}
+    for info in gcs_service.backend.list_objects(sentences_prefix):
+        name = unit_name(info.name, sentences_prefix)
+        if name:
+            paths[info.name] = name
+
+    def download(path: str) -> Tuple[str, str, str, Optional[int]]:
+        content, generation = gcs_service.backend.read_text(path)
+        return paths[path], path, content, generation
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as executor:
+        return list(executor.map(download, paths))
+
+def build_manifest(
+    gcs_service: GCSService,
+    include_sentences: bool = UNIT_MANIFEST_INCLUDE_SENTENCES,
+    order: Optional[List[str]] = None,
+    sentences_prefix: str = SENTENCES_PREFIX,
+    upload: bool = True
+) -> Dict[str, Any]:
+    """
+    Build the manifest of all units and store it next to them.
+
+    Args:
+        gcs_service: Storage service
+        include_sentences: Whether to store the sentences in the manifest
+        order: Unit names in display order; others follow by name
+        sentences_prefix: Prefix path of the unit files
+        upload: Whether to store the manifest
+
+    Returns:
+        The manifest document
+    """
+    manifest = compile_manifest(collect_units(gcs_service, sentences_prefix), parse_lines, include_sentences, order)
+    if upload:
+        gcs_service.upload_text(
+            gcs_service.get_manifest_path(sentences_prefix),
+            json.dumps(manifest, ensure_ascii=False, separators=(",", ":")),
+            content_type="application/json"
+        )
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--order", help="Text file with unit names in display order, one per line")
+    parser.add_argument("--no-sentences", action="store_true", help="Only index the units, without their sentences")
+    parser.add_argument("--dry-run", action="store_true", help="Print a summary without storing the manifest")
+    args = parser.parse_args()
+
+    order = None
+    if args.order:
+        with open(args.order, encoding="utf-8") as f:
+            order = list(parse_lines(f.read()))
+    started_at = time.perf_counter()
+    manifest = build_manifest(
+        GCSService(),
+        include_sentences=not args.no_sentences and UNIT_MANIFEST_INCLUDE_SENTENCES,
+        order=order,
+        upload=not args.dry_run
+    )
+    size = len(json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    sentences = sum(unit["sentence_count"] for unit in manifest["units"])
+    print(
+        f"{'Built' if args.dry_run else 'Stored'} manifest with {len(manifest['units'])} units and "
+        f"{sentences} sentences ({size / 1024:.1f} KiB) in {time.perf_counter() - started_at:.1f}s"
+    )
+
+if __name__ == "__main__":
+    main()
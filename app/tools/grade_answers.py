@@ -0,0 +1,431 @@
+"""
+Grade translations collected outside the app with the same teacher as the chat.
+
+Reads a CSV or JSONL file of (student, unit, sentence, answer) rows as a
+stream and sends every answer as the student's first reply in a lesson, with
+the app's prompts, config and sentence pack references. Rows are graded
+concurrently on a bounded pool of async workers under a request rate limit.
+Results are appended to the output as they arrive, and a checkpoint next to
+the output lets an interrupted run resume. Only a bounded window of rows is
+held in memory, however long the input.
+
+Usage (from the app directory):
+    GEMINI_API_KEY="<your key>" python -m tools.grade_answers answers.csv graded.jsonl [--concurrency 16] [--rpm 600]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+from models.chat_message import ChatMessage
+from models.tutor_reply import TutorReply, parse_reply
+from services.ai_service import AIService
+from services.turn_executor import is_retryable
+from config.prompts import get_initial_message
+from config.settings import (
+    AI_TURN_TIMEOUT,
+    GRADER_CONCURRENCY,
+    GRADER_REQUESTS_PER_MINUTE,
+    GRADER_RETRIES,
+    GRADER_WINDOW,
+    GRADER_CHECKPOINT_INTERVAL,
+    GRADER_PROGRESS_INTERVAL
+)
+
+INPUT_FIELDS = ("student", "unit", "sentence", "answer")
+OUTPUT_FIELDS = INPUT_FIELDS + ("row", "correct", "feedback", "error", "seconds")
+
+def file_format(path: str, override: Optional[str] = None) -> str:
+    """Get 'csv' or 'jsonl' from an explicit choice or the file extension."""
+    if override:
+        return override
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def iter_rows(path: str, fmt: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Stream the rows of an input file.
+
+    Args:
+        path: CSV file with a header row, or JSONL file with one object per line
+        fmt: 'csv' or 'jsonl'
+
+    Yields:
+        Tuples of (row index, row); unparsable JSONL lines yield an empty row
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from enumerate(csv.DictReader(f))
+            return
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = {}
+            yield index, row if isinstance(row, dict) else {}
+            index += 1
+
+class RateLimiter:
+    """Spaces out request starts to stay under a per-minute limit."""
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until the next request may start."""
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class CompletionTracker:
+    """
+    Tracks finished rows as a watermark plus the finished rows above it.
+
+    Rows are read in order and may finish out of order. Reading pauses while
+    a row is `window` rows ahead of the oldest unfinished one, which bounds
+    both the rows in flight and the size of the set.
+    """
+
+    def __init__(self, window: int, watermark: int = 0, done: Optional[Set[int]] = None):
+        self.window = window
+        self.watermark = watermark
+        self.done = set(done or ())
+        self._advance()
+        self._room = asyncio.Condition()
+
+    def is_done(self, index: int) -> bool:
+        """Check if a row was finished, e.g. by an earlier run."""
+        return index < self.watermark or index in self.done
+
+    async def wait_for_room(self, index: int):
+        """Wait until a row is within the window of the oldest unfinished row."""
+        async with self._room:
+            await self._room.wait_for(lambda: index - self.watermark < self.window)
+
+    async def mark_done(self, index: int):
+        """Record a finished row."""
+        self.done.add(index)
+        self._advance()
+        async with self._room:
+            self._room.notify_all()
+
+    def _advance(self):
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+class ResultWriter:
+    """Appends results to a CSV or JSONL file and reports a resumable offset."""
+
+    def __init__(self, path: str, fmt: str, offset: int = 0):
+        self.fmt = fmt
+        self.file = open(path, "a+", encoding="utf-8", newline="")
+        # Results written after the last checkpoint are graded again, so drop them
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.csv_writer = csv.DictWriter(self.file, OUTPUT_FIELDS, extrasaction="ignore") if fmt == "csv" else None
+        if self.csv_writer is not None and offset == 0:
+            self.csv_writer.writeheader()
+
+    def write(self, result: Dict[str, Any]):
+        """Append one result."""
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(result)
+        else:
+            self.file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    def offset(self) -> int:
+        """Flush and get the current end of the file."""
+        self.file.flush()
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+class GradingCheckpoint:
+    """Resume state of a run, stored as JSON next to the output file."""
+
+    def __init__(self, output_path: str, input_path: str):
+        self.path = output_path + ".checkpoint.json"
+        self.input_path = os.path.abspath(input_path)
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Load the state of an interrupted run.
+
+        Returns:
+            State with watermark, done rows above it, output offset and counts;
+            empty if there is nothing to resume
+
+        Raises:
+            SystemExit: If the checkpoint belongs to a different input file
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("input") != self.input_path:
+            raise SystemExit(f"{self.path} belongs to {state.get('input')}; use --restart to start over")
+        return state
+
+    def save(self, tracker: CompletionTracker, offset: int, counts: Dict[str, int]):
+        """Write the state atomically."""
+        state = {
+            "input": self.input_path,
+            "watermark": tracker.watermark,
+            "done": sorted(tracker.done),
+            "output_offset": offset,
+            "counts": counts
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        """Delete the checkpoint once the run is complete."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class Grader:
+    """Grades answers with the lesson prompt and config of the app."""
+
+    def __init__(self, ai_service: AIService, rate_limiter: RateLimiter, retries: int, use_references: bool):
+        self.ai_service = ai_service
+        self.rate_limiter = rate_limiter
+        self.retries = retries
+        self.use_references = use_references
+        self._references: Dict[str, Optional[Dict[str, Dict[str, Any]]]] = {}
+        self.tokens = {"prompt": 0, "cached": 0, "output": 0}
+        # Replies beyond repair that were asked for again
+        self.malformed = 0
+
+    async def reference_for(self, unit: str, sentence: str) -> Optional[Dict[str, Any]]:
+        """Get the sentence pack entry of a sentence, loading each unit's pack once."""
+        if not self.use_references or not unit:
+            return None
+        if unit not in self._references:
+            from services.registry import get_gcs_service
+            self._references[unit] = await asyncio.to_thread(get_gcs_service().load_sentence_pack, unit)
+        pack = self._references[unit]
+        return pack.get(sentence) if pack else None
+
+    async def grade(self, row: Dict[str, Any]) -> TutorReply:
+        """
+        Grade one answer, retrying rate limits and server errors with backoff.
+
+        A malformed reply that cannot be repaired is asked for once more.
+
+        Args:
+            row: Input row with student, unit, sentence and answer
+
+        Returns:
+            Parsed teacher reply
+
+        Raises:
+            ValueError: If the reply is malformed twice
+        """
+        student = row.get("student") or "Student"
+        sentence, answer = row["sentence"], row["answer"]
+        history = [
+            ChatMessage(role="assistant", text=get_initial_message(student, sentence)),
+            ChatMessage(role="user", text=answer)
+        ]
+        reference = await self.reference_for(row.get("unit", ""), sentence)
+        config, contents = self.ai_service.build_chat_request(student, sentence, history, reference=reference)
+        reply, _ = parse_reply(await self._generate(config, contents))
+        if reply is None:
+            self.malformed += 1
+            reply, _ = parse_reply(await self._generate(config, contents))
+        if reply is None:
+            raise ValueError("malformed reply")
+        return reply
+
+    async def _generate(self, config: Any, contents: Any) -> Optional[str]:
+        """Send one grading request, counting its tokens, and return the reply text."""
+        for attempt in range(self.retries):
+            await self.rate_limiter.acquire()
+            try:
+                response = await asyncio.wait_for(
+                    self.ai_service.client.aio.models.generate_content(
+                        model=self.ai_service.model,
+                        contents=contents,
+                        config=config
+                    ),
+                    timeout=AI_TURN_TIMEOUT
+                )
+                break
+            except Exception as e:
+                if attempt == self.retries - 1 or not (isinstance(e, asyncio.TimeoutError) or is_retryable(e)):
+                    raise
+                await asyncio.sleep(2 ** attempt)
+        usage = getattr(response, "usage_metadata", None)
+        for kind, field in (
+            ("prompt", "prompt_token_count"),
+            ("cached", "cached_content_token_count"),
+            ("output", "candidates_token_count")
+        ):
+            self.tokens[kind] += getattr(usage, field, None) or 0
+        return response.text
+
+async def grade_file(
+    input_path: str,
+    output_path: str,
+    grader: Grader,
+    concurrency: int,
+    window: int,
+    input_format: Optional[str] = None,
+    restart: bool = False
+) -> Dict[str, Any]:
+    """
+    Grade every row of an input file into an output file.
+
+    Args:
+        input_path: CSV or JSONL input
+        output_path: CSV or JSONL output, appended to
+        grader: Grader to use
+        concurrency: Number of concurrent workers
+        window: Maximum rows read ahead of the oldest unfinished row
+        input_format: 'csv' or 'jsonl' (default: from the extension)
+        restart: Ignore an existing checkpoint and start over
+
+    Returns:
+        Counts, duration and throughput of this run
+    """
+    checkpoint = GradingCheckpoint(output_path, input_path)
+    if restart:
+        checkpoint.remove()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    state = checkpoint.load()
+    if state:
+        print(f"Resuming after row {state['watermark']} ({state['counts'].get('graded', 0)} graded before)")
+    tracker = CompletionTracker(window, state.get("watermark", 0), set(state.get("done", [])))
+    writer = ResultWriter(output_path, file_format(output_path), state.get("output_offset", 0))
+    counts = {"graded": 0, "correct": 0, "failed": 0, **state.get("counts", {})}
+    run_counts = {"graded": 0, "failed": 0}
+    queue: "asyncio.Queue[Optional[Tuple[int, Dict[str, Any]]]]" = asyncio.Queue(maxsize=concurrency * 2)
+    started_at = time.perf_counter()
+    last_checkpoint = time.monotonic()
+
+    async def produce():
+        for index, row in iter_rows(input_path, file_format(input_path, input_format)):
+            if tracker.is_done(index):
+                continue
+            await tracker.wait_for_room(index)
+            await queue.put((index, row))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        nonlocal last_checkpoint
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, row = item
+            result = {field: row.get(field, "") for field in INPUT_FIELDS}
+            result["row"] = index
+            row_started_at = time.perf_counter()
+            missing = [field for field in ("sentence", "answer") if not row.get(field)]
+            try:
+                if missing:
+                    raise ValueError(f"missing {', '.join(missing)}")
+                reply = await grader.grade(row)
+                result.update(correct=reply.finished, feedback=reply.text)
+                counts["correct"] += result["correct"]
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+                counts["failed"] += 1
+                run_counts["failed"] += 1
+            result["seconds"] = round(time.perf_counter() - row_started_at, 3)
+            writer.write(result)
+            counts["graded"] += 1
+            run_counts["graded"] += 1
+            await tracker.mark_done(index)
+            if time.monotonic() - last_checkpoint >= GRADER_CHECKPOINT_INTERVAL:
+                checkpoint.save(tracker, writer.offset(), counts)
+                last_checkpoint = time.monotonic()
+
+    async def report():
+        while True:
+            await asyncio.sleep(GRADER_PROGRESS_INTERVAL)
+            elapsed = time.perf_counter() - started_at
+            print(
+                f"{run_counts['graded']} rows graded in {elapsed:.0f}s "
+                f"({run_counts['graded'] / elapsed:.1f} rows/s), {run_counts['failed']} failed",
+                flush=True
+            )
+
+    reporter = asyncio.create_task(report())
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        reporter.cancel()
+        # Keep what finished, also when interrupted
+        checkpoint.save(tracker, writer.offset(), counts)
+        writer.close()
+    checkpoint.remove()
+
+    duration = time.perf_counter() - started_at
+    return {
+        **counts,
+        "graded_this_run": run_counts["graded"],
+        "seconds": round(duration, 1),
+        "rows_per_second": round(run_counts["graded"] / duration, 2) if duration else 0.0,
+        "tokens": dict(grader.tokens),
+        "malformed_retried": grader.malformed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="CSV or JSONL with student, unit, sentence and answer")
+    parser.add_argument("output", help="CSV or JSONL file the results are appended to")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"], help="Default: from the file extension")
+    parser.add_argument("--concurrency", type=int, default=GRADER_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=GRADER_REQUESTS_PER_MINUTE, help="Requests per minute, 0 for no limit")
+    parser.add_argument("--retries", type=int, default=GRADER_RETRIES)
+    parser.add_argument("--window", type=int, default=GRADER_WINDOW, help="Rows read ahead of the oldest unfinished row")
+    parser.add_argument("--no-references", action="store_true", help="Do not load sentence packs from storage")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and output and start over")
+    parser.add_argument("--fake", action="store_true", help="Grade with the offline fake Gemini client")
+    args = parser.parse_args()
+
+    client = None
+    if args.fake:
+        from testing.fake_genai import FakeGenaiClient
+        client = FakeGenaiClient()
+    grader = Grader(AIService(client=client), RateLimiter(args.rpm), args.retries, not args.no_references)
+    summary = asyncio.run(grade_file(
+        args.input,
+        args.output,
+        grader,
+        args.concurrency,
+        max(args.window, args.concurrency),
+        args.input_format,
+        args.restart
+    ))
+    print(
+        f"Graded {summary['graded_this_run']} rows in {summary['seconds']}s "
+        f"({summary['rows_per_second']} rows/s); {summary['graded']} in total, "
+        f"{summary['correct']} correct, {summary['failed']} failed, "
+        f"{summary['malformed_retried']} malformed replies asked for again"
+    )
+    print(f"Tokens: {summary['tokens']['prompt']} prompt ({summary['tokens']['cached']} cached), {summary['tokens']['output']} output")
+    raise SystemExit(1 if summary["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
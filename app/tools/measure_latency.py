@@ -0,0 +1,124 @@
+"""
+Compare time-to-first-visible-token of blocking and streaming AI replies.
+
+With --by-class, send one typical message per turn class with and without
+turn routing and compare reply latency and tokens per class.
+
+Usage (from the app directory):
+    GEMINI_API_KEY="<your key>" python -m tools.measure_latency --runs 5 [--by-class]
+"""
+import argparse
+import statistics
+import time
+from typing import Optional, Tuple
+from services.ai_service import AIService
+from services.governor import used_tokens
+from services.turn_classifier import ANSWER_ATTEMPT, VOCABULARY_QUESTION, GRAMMAR_QUESTION, OFF_TOPIC, OTHER
+from config.prompts import get_initial_message
+from models.chat_message import ChatMessage
+
+# A typical student message per turn class, for the default sentence
+CLASS_SAMPLES = {
+    ANSWER_ATTEMPT: "این کتاب مال برادر دوستم است.",
+    VOCABULARY_QUESTION: "Was heißt 'Freundin' auf Persisch?",
+    GRAMMAR_QUESTION: "Warum steht das Verb am Ende des Satzes?",
+    OFF_TOPIC: "Wie wird das Wetter morgen in Berlin?",
+    OTHER: "Ok, danke!"
+}
+
+def measure(ai_service: AIService, sentence: str, answer: str, streaming: bool) -> float:
+    """
+    Measure the time until the first reply text could be shown.
+
+    Args:
+        ai_service: AI service to use
+        sentence: Sentence to practice
+        answer: Student answer to send
+        streaming: Whether to use the streaming API
+
+    Returns:
+        Seconds until the first visible text
+    """
+    history = [ChatMessage(role="assistant", text=get_initial_message("Student", sentence))]
+    chat = ai_service.create_chat("Student", sentence, history)
+    started_at = time.perf_counter()
+    if streaming:
+        reply = ai_service.send_message_stream(chat, answer)
+        for _ in reply:
+            pass
+        return reply.first_token_latency or reply.total_latency
+    ai_service.send_message(chat, answer)
+    return time.perf_counter() - started_at
+
+def measure_turn(ai_service: AIService, sentence: str, message: str) -> Tuple[float, Optional[int]]:
+    """
+    Measure one streamed turn until its reply is complete.
+
+    Args:
+        ai_service: AI service to use
+        sentence: Sentence to practice
+        message: Student message to send
+
+    Returns:
+        Tuple of (seconds until the full reply, tokens used; 0 if answered locally)
+    """
+    history = [ChatMessage(role="assistant", text=get_initial_message("Student", sentence))]
+    chat = ai_service.create_chat("Student", sentence, history)
+    reply = ai_service.send_message_stream(chat, message)
+    for _ in reply:
+        pass
+    tokens = used_tokens(reply.usage_metadata) if reply.op != "local_reply" else 0
+    return reply.total_latency, tokens
+
+def compare_classes(client, sentence: str, runs: int):
+    """
+    Print latency and token savings of turn routing per turn class.
+
+    Args:
+        client: Gemini client shared by the routed and unrouted service
+        sentence: Sentence to practice
+        runs: Turns per class and setting
+    """
+    services = {"unrouted": AIService(client=client, routing=False), "routed": AIService(client=client, routing=True)}
+    print(f"{'class':>20} {'route':>8} {'median s':>9} {'tokens':>7}")
+    for turn_class, message in CLASS_SAMPLES.items():
+        results = {}
+        for label, ai_service in services.items():
+            samples = [measure_turn(ai_service, sentence, message) for _ in range(runs)]
+            seconds = statistics.median(sample[0] for sample in samples)
+            counted = [sample[1] for sample in samples if sample[1] is not None]
+            tokens = statistics.median(counted) if counted else None
+            results[label] = (seconds, tokens)
+            print(f"{turn_class:>20} {label:>8} {seconds:>9.2f} {tokens if tokens is not None else '?':>7}")
+        (before, before_tokens), (after, after_tokens) = results["unrouted"], results["routed"]
+        saved_tokens = before_tokens - after_tokens if None not in (before_tokens, after_tokens) else "?"
+        print(f"{turn_class:>20} {'saved':>8} {before - after:>9.2f} {saved_tokens:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--sentence", default="Dieses Buch gehört dem Bruder meiner Freundin.")
+    parser.add_argument("--answer", default="این کتاب مال برادر دوستم است.")
+    parser.add_argument("--by-class", action="store_true", help="Compare routed and unrouted turns per turn class")
+    parser.add_argument("--fake", action="store_true", help="Use the offline fake Gemini client")
+    args = parser.parse_args()
+
+    client = None
+    if args.fake:
+        from testing.fake_genai import FakeGenaiClient
+        client = FakeGenaiClient()
+    if args.by_class:
+        compare_classes(client, args.sentence, args.runs)
+        return
+
+    ai_service = AIService(client=client)
+    for streaming in (False, True):
+        samples = [measure(ai_service, args.sentence, args.answer, streaming) for _ in range(args.runs)]
+        label = "streaming" if streaming else "blocking"
+        print(
+            f"{label:>9}: median {statistics.median(samples):.2f}s, "
+            f"min {min(samples):.2f}s, max {max(samples):.2f}s"
+        )
+
+if __name__ == "__main__":
+    main()
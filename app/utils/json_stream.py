@@ -0,0 +1,218 @@
+"""
+Incremental extraction of a string field from a streamed JSON object, and
+repair of JSON documents that arrived fenced or truncated.
+"""
+import json
+import re
+from typing import Any, List, Optional
+
+# A Markdown code fence around a document, closing fence optional (the reply may be cut off)
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*(.*?)\s*(?:```)?$", re.DOTALL)
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t"
+}
+
+def repair_json(raw: str) -> Any:
+    """
+    Parse a JSON object, repairing common damage first.
+
+    Strips Markdown code fences and text around the object, closes an
+    unterminated string and missing brackets of a truncated document, and
+    drops a dangling comma or key.
+
+    Args:
+        raw: Text that should hold one JSON object
+
+    Returns:
+        The decoded JSON value
+
+    Raises:
+        json.JSONDecodeError: If the text cannot be repaired
+    """
+    text = raw.strip()
+    fenced = _FENCE.match(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    if start > 0:
+        text = text[start:]
+    try:
+        # raw_decode ignores text after the object
+        return json.JSONDecoder().raw_decode(text)[0]
+    except json.JSONDecodeError:
+        pass
+
+    closers: List[str] = []
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+    if in_string:
+        # A cut-off escape sequence cannot be completed
+        text = re.sub(r"\\(u[0-9a-fA-F]{0,3})?$", "", text) + '"'
+    text = text.rstrip()
+    if text.endswith(":"):
+        text += " null"
+    text = text.rstrip(",")
+    closing = "".join(reversed(closers))
+    try:
+        return json.loads(text + closing)
+    except json.JSONDecodeError:
+        # The document may have been cut off right after a key
+        return json.loads(text + ": null" + closing)
+
+class JsonFieldStreamParser:
+    """
+    Streams the characters of one top-level string field while JSON arrives.
+
+    Chunks are fed in order; each call returns the newly decoded characters of
+    the field. The complete document is parsed once at the end.
+    """
+
+    def __init__(self, field: str = "text"):
+        self.field = field
+        self._raw: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None
+        self._expect_key = False
+        self._current_key: Optional[str] = None
+        self._streaming = False
+        self._field_done = False
+        self._unicode_digits: Optional[List[str]] = None
+        self._high_surrogate: Optional[int] = None
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume the next chunk of JSON.
+
+        Args:
+            chunk: Raw JSON text as received
+
+        Returns:
+            Newly decoded characters of the field (may be empty)
+        """
+        self._raw.append(chunk)
+        output = []
+        for char in chunk:
+            if self._streaming:
+                self._feed_field_char(char, output)
+            elif self._in_string:
+                self._feed_string_char(char)
+            else:
+                self._feed_structure_char(char)
+        return "".join(output)
+
+    def result(self) -> Any:
+        """
+        Parse the complete document.
+
+        Returns:
+            The decoded JSON value
+
+        Raises:
+            json.JSONDecodeError: If the document is not valid JSON
+        """
+        return json.loads("".join(self._raw))
+
+    def get_raw(self) -> str:
+        """Get all JSON text received so far."""
+        return "".join(self._raw)
+
+    def _feed_structure_char(self, char: str):
+        """Track nesting, keys and value starts outside of strings."""
+        if char in "{[":
+            self._depth += 1
+            if self._depth == 1 and char == "{":
+                self._expect_key = True
+        elif char in "}]":
+            self._depth -= 1
+        elif char == '"':
+            if self._depth == 1 and self._expect_key:
+                self._key_chars = []
+                self._in_string = True
+            elif self._depth == 1 and self._current_key == self.field and not self._field_done:
+                self._streaming = True
+            else:
+                self._in_string = True
+        elif self._depth == 1 and char == ":":
+            self._expect_key = False
+        elif self._depth == 1 and char == ",":
+            self._expect_key = True
+            self._current_key = None
+
+    def _feed_string_char(self, char: str):
+        """Skip over a string that is not the streamed field, collecting keys."""
+        if self._escape:
+            self._escape = False
+            if self._key_chars is not None:
+                self._key_chars.append(_ESCAPES.get(char, char))
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            if self._key_chars is not None:
+                self._current_key = "".join(self._key_chars)
+                self._key_chars = None
+        elif self._key_chars is not None:
+            self._key_chars.append(char)
+
+    def _feed_field_char(self, char: str, output: List[str]):
+        """Decode one character of the streamed field value."""
+        if self._unicode_digits is not None:
+            self._unicode_digits.append(char)
+            if len(self._unicode_digits) == 4:
+                code = int("".join(self._unicode_digits), 16)
+                self._unicode_digits = None
+                self._emit_code_point(code, output)
+        elif self._escape:
+            self._escape = False
+            if char == "u":
+                self._unicode_digits = []
+            else:
+                self._emit(_ESCAPES.get(char, char), output)
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._streaming = False
+            self._field_done = True
+        else:
+            self._emit(char, output)
+
+    def _emit_code_point(self, code: int, output: List[str]):
+        """Emit a \\u escape, joining UTF-16 surrogate pairs."""
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+        output.append(chr(code))
+
+    def _emit(self, text: str, output: List[str]):
+        """Emit decoded text, flushing a dangling high surrogate first."""
+        if self._high_surrogate is not None:
+            output.append(chr(self._high_surrogate))
+            self._high_surrogate = None
+        output.append(text)
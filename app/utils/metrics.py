@@ -0,0 +1,290 @@
+"""
+In-process metrics for the hot path: latency histograms, counters and token usage.
+
+Metrics are off unless METRICS_ENABLED is set. While off, `timed` returns
+the decorated function unchanged and `span` a shared no-op context, so
+instrumented code runs as if it were not instrumented. While on, metrics
+are served in Prometheus text format on METRICS_PORT and logged as JSON
+lines every METRICS_LOG_INTERVAL seconds.
+"""
+import contextlib
+import functools
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from config.settings import METRICS_ENABLED, METRICS_PORT, METRICS_LOG_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_NOOP_SPAN = contextlib.nullcontext()
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Add a sample."""
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Thread-safe store of counters, histograms and gauge callbacks."""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        """
+        Increase a counter.
+
+        Args:
+            name: Metric name
+            value: Amount to add
+            **labels: Metric labels
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        """
+        Add a latency sample to a histogram.
+
+        Args:
+            name: Metric name
+            seconds: Observed latency
+            **labels: Metric labels
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def register_gauge(self, name: str, read: Callable[[], Dict[str, float]]):
+        """
+        Register stats read on every export, e.g. a cache's get_stats.
+
+        Args:
+            name: Metric name; each stat becomes a `stat` label
+            read: Callable returning numeric stats
+        """
+        with self._lock:
+            self._gauges[name] = read
+
+    @contextlib.contextmanager
+    def span(self, name: str, **labels: str) -> Iterator[None]:
+        """Time a block into the `<name>_seconds` histogram, counting errors."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(f"{name}_errors", **labels)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started_at, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get all metrics as plain data.
+
+        Returns:
+            Dictionary with counters, histogram summaries and gauges
+        """
+        with self._lock:
+            counters = {_format_name(name, labels): value for (name, labels), value in self._counters.items()}
+            histograms = {
+                _format_name(name, labels): {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0.0
+                }
+                for (name, labels), histogram in self._histograms.items()
+            }
+            gauges = dict(self._gauges)
+        return {
+            "counters": counters,
+            "histograms": histograms,
+            "gauges": {name: _read_gauge(read) for name, read in gauges.items()}
+        }
+
+    def render_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            Exposition text
+        """
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{_format_name(name + '_total', labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{_format_name(name + '_bucket', labels + (('le', le),))} {cumulative}")
+                lines.append(f"{_format_name(name + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{_format_name(name + '_count', labels)} {histogram.count}")
+            gauges = dict(self._gauges)
+        for name, read in sorted(gauges.items()):
+            for stat, value in sorted(_read_gauge(read).items()):
+                lines.append(f"{_format_name(name, (('stat', stat),))} {value}")
+        return "\n".join(lines) + "\n"
+
+def _format_name(name: str, labels: Labels) -> str:
+    """Format a metric name with Prometheus labels."""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+def _read_gauge(read: Callable[[], Dict[str, float]]) -> Dict[str, float]:
+    """Read a gauge's numeric stats, ignoring a failing callback."""
+    try:
+        return {key: value for key, value in read().items() if isinstance(value, (int, float))}
+    except Exception:
+        logger.warning("Failed to read gauge", exc_info=True)
+        return {}
+
+metrics = MetricsRegistry()
+
+def span(name: str, **labels: str):
+    """
+    Time a block of code.
+
+    Args:
+        name: Histogram name, recorded as `<name>_seconds`
+        **labels: Metric labels
+
+    Returns:
+        Context manager; a shared no-op if metrics are disabled
+    """
+    if not metrics.enabled:
+        return _NOOP_SPAN
+    return metrics.span(name, **labels)
+
+def timed(name: str, **labels: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorate a function to time its calls.
+
+    Args:
+        name: Histogram name, recorded as `<name>_seconds`
+        **labels: Metric labels
+
+    Returns:
+        Decorator; returns the function unchanged if metrics are disabled
+    """
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        if not metrics.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with metrics.span(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def record_usage(usage_metadata: Any, call: str, **labels: str):
+    """
+    Count the tokens reported for a Gemini call.
+
+    Args:
+        usage_metadata: The response's usage_metadata, may be None
+        call: Kind of call, e.g. 'turn' or 'summary'
+        **labels: Further metric labels, e.g. the turn class
+    """
+    if not metrics.enabled or usage_metadata is None:
+        return
+    for kind, field in (
+        ("prompt", "prompt_token_count"),
+        ("cached", "cached_content_token_count"),
+        ("thoughts", "thoughts_token_count"),
+        ("output", "candidates_token_count")
+    ):
+        count = getattr(usage_metadata, field, None)
+        if count:
+            metrics.inc("gemini_tokens", count, call=call, kind=kind, **labels)
+
+def log_event(event: str, **fields: Any):
+    """
+    Write a structured JSON log line.
+
+    Args:
+        event: Event name
+        **fields: JSON-serializable event fields
+    """
+    if metrics.enabled:
+        logger.info(json.dumps({"event": event, **fields}, default=str))
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any):
+        pass  # scrapes would flood the app log
+
+_exporters_lock = threading.Lock()
+_exporters_started = False
+
+def start_exporters(port: Optional[int] = METRICS_PORT, log_interval: float = METRICS_LOG_INTERVAL):
+    """
+    Start the scrape endpoint and the periodic JSON log, once per process.
+
+    Does nothing while metrics are disabled.
+
+    Args:
+        port: Port of the /metrics endpoint (0 or None to skip it)
+        log_interval: Seconds between metric snapshots in the log (0 to skip)
+    """
+    global _exporters_started
+    if not metrics.enabled or _exporters_started:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        if port:
+            try:
+                server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            except OSError:
+                logger.warning("Metrics endpoint could not bind port %s", port, exc_info=True)
+            else:
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        if log_interval:
+            threading.Thread(target=_log_periodically, args=(log_interval,), name="metrics-log", daemon=True).start()
+
+def _log_periodically(interval: float):
+    """Log a metrics snapshot at a fixed interval."""
+    while True:
+        time.sleep(interval)
+        log_event("metrics", **metrics.snapshot())
@@ -0,0 +1,45 @@
+"""
+Normalization of Persian text for comparing student answers.
+"""
+import re
+import unicodedata
+
+# Arabic code points that students' keyboards often produce instead of the Persian ones
+_CHARACTER_MAP = str.maketrans({
+    "\u064a": "\u06cc",  # ARABIC YEH -> FARSI YEH
+    "\u0649": "\u06cc",  # ALEF MAKSURA -> FARSI YEH
+    "\u0643": "\u06a9",  # ARABIC KAF -> KEHEH
+    "\u0640": None,      # TATWEEL
+    "\u200b": "\u200c",  # ZERO WIDTH SPACE -> ZWNJ
+    "\u200d": "\u200c",  # ZERO WIDTH JOINER -> ZWNJ
+    "\u00a0": " "        # NO-BREAK SPACE
+})
+
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670\u06d6-\u06ed]")
+_ZWNJ_RUNS = re.compile("\u200c{2,}")
+_ZWNJ_AT_SPACE = re.compile(" ?\u200c ?")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_answer(text: str) -> str:
+    """
+    Normalize an answer so that equivalent spellings compare equal.
+
+    Unifies Arabic and Persian yeh and kaf, strips diacritics and tatweel,
+    normalizes ZWNJ variants, drops punctuation and collapses whitespace.
+
+    Args:
+        text: Raw student answer
+
+    Returns:
+        Normalized answer
+    """
+    text = unicodedata.normalize("NFKC", text).translate(_CHARACTER_MAP)
+    text = _DIACRITICS.sub("", text)
+    text = "".join(
+        " " if unicodedata.category(char).startswith("P") else char
+        for char in text
+    )
+    text = _WHITESPACE.sub(" ", text).strip()
+    text = _ZWNJ_RUNS.sub("\u200c", text)
+    text = _ZWNJ_AT_SPACE.sub(lambda match: " " if " " in match.group(0) else "\u200c", text)
+    return text.strip("\u200c ").casefold()
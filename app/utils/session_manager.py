@@ -1,20 +1,41 @@
 """
 Session state management utilities for the Streamlit app.
 """
-import json
+import uuid
 import streamlit as st
-from typing import List, Optional, Any
+from typing import Callable, Dict, List, Any, Optional, Set
+from models.chat_message import ChatMessage
+from services.progress_store import make_record
+from services.registry import get_progress_writer
 from config.settings import (
     get_messages_key, 
-    get_sentences_key, 
-    get_sentence_index_key
+    get_sentence_index_key,
+    get_sentence_labels_key,
+    SESSION_TOKEN_KEY,
+    COMPLETED_SENTENCES_KEY,
+    COMPLETION_VERSION_KEY,
+    PROGRESS_USER_KEY,
+    LOADED_UNITS_KEY,
+    LOGGED_GREETINGS_KEY
 )
 
 class SessionManager:
     """Manages Streamlit session state for the application."""
     
     @staticmethod
-    def get_or_create_messages(sentence: str, initial_message: str) -> List[dict]:
+    def get_session_token() -> str:
+        """
+        Get a random token identifying this browser session.
+        
+        Returns:
+            Session token, created on first use
+        """
+        if SESSION_TOKEN_KEY not in st.session_state:
+            st.session_state[SESSION_TOKEN_KEY] = uuid.uuid4().hex
+        return st.session_state[SESSION_TOKEN_KEY]
+    
+    @staticmethod
+    def get_or_create_messages(sentence: str, initial_message: str) -> List[ChatMessage]:
         """
         Get or create message history for a sentence.
         
@@ -23,61 +44,193 @@ class SessionManager:
             initial_message: Initial message to add if creating new session
             
         Returns:
-            List of message dictionaries
+            List of chat messages
         """
         session_key = get_messages_key(sentence)
         
         if session_key not in st.session_state:
-            st.session_state[session_key] = []
-            st.session_state[session_key].append({
-                "role": "assistant", 
-                "content": initial_message
-            })
+            st.session_state[session_key] = [
+                ChatMessage(role="assistant", text=initial_message)
+            ]
         
         return st.session_state[session_key]
     
     @staticmethod
-    def add_message(sentence: str, role: str, content: str):
+    def peek_messages(sentence: str, initial_message: str) -> List[ChatMessage]:
+        """
+        Get a copy of a sentence's history without creating it in session state.
+        
+        Args:
+            sentence: The sentence
+            initial_message: Initial message of a history that does not exist yet
+            
+        Returns:
+            Copy of the history, or a new history with only the initial message
+        """
+        messages = st.session_state.get(get_messages_key(sentence))
+        if messages is None:
+            return [ChatMessage(role="assistant", text=initial_message)]
+        return list(messages)
+    
+    @staticmethod
+    def add_message(sentence: str, message: ChatMessage):
         """
         Add a message to the session history.
         
         Args:
             sentence: The sentence being practiced
-            role: Message role ('user' or 'assistant')
-            content: Message content
+            message: Parsed chat message
         """
         session_key = get_messages_key(sentence)
         if session_key in st.session_state:
-            st.session_state[session_key].append({
-                "role": role,
-                "content": content
-            })
+            messages = st.session_state[session_key]
+            logged_greetings = st.session_state.setdefault(LOGGED_GREETINGS_KEY, set())
+            if sentence not in logged_greetings:
+                # The greeting is only stored once the conversation starts, and
+                # stays stored when that first turn is retracted
+                SessionManager._log_progress("message", sentence, **messages[0].to_dict())
+                logged_greetings.add(sentence)
+            messages.append(message)
+            SessionManager._log_progress("message", sentence, **message.to_dict())
+            if message.finished:
+                SessionManager.mark_sentence_completed(sentence)
+    
+    @staticmethod
+    def remove_last_message(sentence: str):
+        """
+        Remove the most recent message, e.g. a prompt that got no reply.
+        
+        Args:
+            sentence: The sentence being practiced
+        """
+        session_key = get_messages_key(sentence)
+        if len(st.session_state.get(session_key, [])) > 1:
+            st.session_state[session_key].pop()
+            SessionManager._log_progress("retract", sentence)
+    
+    @staticmethod
+    def get_completed_sentences() -> Set[str]:
+        """
+        Get the completion index of the current session.
+        
+        Returns:
+            Set of completed sentences
+        """
+        return st.session_state.setdefault(COMPLETED_SENTENCES_KEY, set())
     
     @staticmethod
-    def get_cached_sentences(unit: str) -> Optional[List[str]]:
+    def mark_sentence_completed(sentence: str):
         """
-        Get cached sentences for a unit.
+        Record a sentence as completed in the completion index.
+        
+        Args:
+            sentence: The completed sentence
+        """
+        completed = SessionManager.get_completed_sentences()
+        if sentence not in completed:
+            completed.add(sentence)
+            st.session_state[COMPLETION_VERSION_KEY] = st.session_state.get(COMPLETION_VERSION_KEY, 0) + 1
+    
+    @staticmethod
+    def get_sentence_labels(
+        unit: str, 
+        sentences: List[str], 
+        label_builder: Callable[[List[str], Set[str]], List[str]]
+    ) -> List[str]:
+        """
+        Get sentence labels for a unit, rebuilding them only when completion state changes.
         
         Args:
             unit: Unit name
+            sentences: Sentences of the unit
+            label_builder: Function building labels from sentences and completed sentences
             
         Returns:
-            List of sentences or None if not cached
+            List of sentence labels
+        """
+        session_key = get_sentence_labels_key(unit)
+        version = st.session_state.get(COMPLETION_VERSION_KEY, 0)
+        sentences_key = tuple(sentences)
+        
+        cached = st.session_state.get(session_key)
+        if cached is not None and cached[0] == version and cached[1] == sentences_key:
+            return cached[2]
+        
+        labels = label_builder(sentences, SessionManager.get_completed_sentences())
+        st.session_state[session_key] = (version, sentences_key, labels)
+        return labels
+    
+    @staticmethod
+    def clear_progress(user_id: Optional[str] = None):
+        """
+        Clear chat histories, the completion index and cached labels.
+        
+        Args:
+            user_id: User whose stored progress is reset as well
         """
-        session_key = get_sentences_key(unit)
-        return st.session_state.get(session_key)
+        for key in list(st.session_state.keys()):
+            if key.startswith(("messages_", "sentence_labels_", "history_revealed_")):
+                del st.session_state[key]
+        # A new token keeps shared chats and summaries of the old history from being reused
+        st.session_state.pop(SESSION_TOKEN_KEY, None)
+        st.session_state[COMPLETED_SENTENCES_KEY] = set()
+        st.session_state[LOGGED_GREETINGS_KEY] = set()
+        st.session_state[COMPLETION_VERSION_KEY] = st.session_state.get(COMPLETION_VERSION_KEY, 0) + 1
+        SessionManager._log_progress("reset", user_id=user_id)
     
     @staticmethod
-    def cache_sentences(unit: str, sentences: List[str]):
+    def ensure_unit_loaded(user_id: Optional[str], unit: str):
         """
-        Cache sentences for a unit.
+        Restore a unit's stored chat histories into the session, once per session.
+        
+        Histories already present in the session are kept as they are.
         
         Args:
+            user_id: The logged-in user's email
             unit: Unit name
-            sentences: List of sentences to cache
         """
-        session_key = get_sentences_key(unit)
-        st.session_state[session_key] = sentences
+        st.session_state[PROGRESS_USER_KEY] = user_id
+        loaded_units = st.session_state.setdefault(LOADED_UNITS_KEY, set())
+        writer = get_progress_writer()
+        if writer is None or not user_id or unit in loaded_units:
+            return
+        loaded_units.add(unit)
+        
+        histories: Dict[str, List[ChatMessage]] = {}
+        for record in writer.load(user_id, unit):
+            if record["kind"] == "reset":
+                histories.clear()
+            elif record["kind"] == "retract":
+                history = histories.get(record["sentence"])
+                if history:
+                    history.pop()
+            elif record["kind"] == "message":
+                history = histories.setdefault(record["sentence"], [])
+                message = ChatMessage.from_dict(record)
+                # Older logs repeat the greeting after a retracted first turn
+                if len(history) == 1 and message == history[0]:
+                    continue
+                history.append(message)
+        
+        logged_greetings = st.session_state.setdefault(LOGGED_GREETINGS_KEY, set())
+        for sentence, messages in histories.items():
+            session_key = get_messages_key(sentence)
+            if not messages or session_key in st.session_state:
+                continue
+            st.session_state[session_key] = messages
+            logged_greetings.add(sentence)
+            if any(message.finished for message in messages):
+                SessionManager.mark_sentence_completed(sentence)
+    
+    @staticmethod
+    def _log_progress(kind: str, sentence: Optional[str] = None, user_id: Optional[str] = None, **fields: Any):
+        """Queue a progress record for the durable store, if one is configured."""
+        writer = get_progress_writer()
+        user_id = user_id or st.session_state.get(PROGRESS_USER_KEY)
+        if writer is None or not user_id:
+            return
+        unit = st.session_state.get("selected_unit") if sentence is not None else None
+        writer.submit(user_id, make_record(kind, unit, sentence, **fields))
     
     @staticmethod
     def get_selected_sentence_index(unit: str) -> int:
@@ -116,22 +269,7 @@ class SessionManager:
         Returns:
             True if completed, False otherwise
         """
-        session_key = get_messages_key(sentence)
-        
-        if session_key not in st.session_state:
-            return False
-        
-        messages = st.session_state[session_key]
-        for message in messages:
-            if message["role"] == "assistant":
-                try:
-                    msg_json = json.loads(message["content"])
-                    if isinstance(msg_json, dict) and msg_json.get("finished", False):
-                        return True
-                except (json.JSONDecodeError, TypeError):
-                    continue
-        
-        return False
+        return sentence in SessionManager.get_completed_sentences()
     
     @staticmethod
     def set_session_value(key: str, value: Any):
@@ -158,6 +296,20 @@ class SessionManager:
         """
         return st.session_state.get(key, default)
     
+    @staticmethod
+    def pop_session_value(key: str, default: Any = None) -> Any:
+        """
+        Remove a value from session state and return it.
+        
+        Args:
+            key: Session state key
+            default: Default value if key doesn't exist
+            
+        Returns:
+            Removed value or default
+        """
+        return st.session_state.pop(key, default)
+    
     @staticmethod
     def clear_completion_flag():
         """Clear the 'just_finished' flag."""
@@ -9,4 +9,4 @@ gcloud run deploy "$SERVICE_NAME" \
   --region=$GCP_REGION \
   --platform=managed  \
   --project=$GCP_PROJECT \
-  --set-env-vars=GCP_PROJECT=$GCP_PROJECT,GCP_REGION=$GCP_REGION,GEMINI_API_KEY=$GEMINI_API_KEY
+  --set-env-vars=GCP_PROJECT=$GCP_PROJECT,GCP_REGION=$GCP_REGION,GEMINI_API_KEY=$GEMINI_API_KEY,PREWARM_ON_START=1